@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Batch Builder
+# Description: Builds many .mpb profiles at once, with a bounded number of
+#              PyInstaller processes supervised from one event loop. Every
+#              build gets its own log file and exit code, and the run ends
+#              with an aggregate summary.
+
+
+import os
+import time
+import asyncio
+
+from builder_core import STATE_DIR, profile_name, available_memory
+from build_engine import BuildEngine, STARTED
+from core_budget import default_budget
+from profile_model import load_profiles
+
+
+LOG_DIR = os.path.join(STATE_DIR, 'batch_logs')
+# Rough peak RSS of a PyInstaller run on a large GUI application
+MEMORY_PER_BUILD = 1536 * 1024 * 1024
+
+
+def default_worker_count(memory_per_build=MEMORY_PER_BUILD):
+    """ Size the pool to the core budget and the memory currently available """
+    workers = default_budget().total
+    memory = available_memory()
+    if memory:
+        workers = min(workers, memory // memory_per_build)
+    return max(1, int(workers))
+
+
+class BatchResult:
+    """ Outcome of one profile build within a batch """
+
+    def __init__(self, profile_path, name, log_path):
+        self.profile_path = profile_path
+        self.name = name
+        self.log_path = log_path
+        self.return_code = None
+        self.cached = False
+        self.elapsed = 0.0
+        self.error = None
+
+    @property
+    def succeeded(self):
+        return self.return_code == 0
+
+    def to_dict(self):
+        return {
+            'profile': self.profile_path,
+            'name': self.name,
+            'log': self.log_path,
+            'return_code': self.return_code,
+            'cached': self.cached,
+            'elapsed': round(self.elapsed, 3),
+            'error': self.error,
+        }
+
+
+class BatchBuilder:
+    """
+    Run the builds of several profiles in parallel on one BuildEngine.
+    on_progress(name, message) is called from the engine's thread for status lines.
+    """
+
+    def __init__(self, profile_paths, max_workers=None, log_dir=LOG_DIR,
+                 use_cache=True, on_progress=None, timeout=None):
+        self.profile_paths = list(profile_paths)
+        self.max_workers = max_workers or default_worker_count()
+        self.log_dir = log_dir
+        self.use_cache = use_cache
+        self.on_progress = on_progress
+        self.timeout = timeout
+        self.engine = BuildEngine(max_concurrent=self.max_workers, on_event=self._on_event)
+        self.cancelled = False
+        self._names = {}
+
+    def _report(self, name, message):
+        if self.on_progress:
+            self.on_progress(name, message)
+
+    def _on_event(self, event):
+        if event.kind == STARTED:
+            self._report(self._names[event.key], "started")
+
+    def _log_path(self, index, name):
+        # Index prefix keeps log names unique when two profiles share a name
+        return os.path.join(self.log_dir, f"{index:03d}_{name}.log")
+
+    async def build_one(self, index, profile_path, profile):
+        """
+        Build a single profile, writing its output to a dedicated log.
+        profile is the resolved Profile, or the error that prevented resolving it.
+        """
+        name = self._names[index] = profile_name(None, profile_path)
+        result = BatchResult(profile_path, name, self._log_path(index, name))
+
+        if isinstance(profile, Exception):
+            result.return_code = 1
+            result.error = str(profile)
+            with open(result.log_path, 'w', encoding='utf-8') as log:
+                log.write(f"An error occurred: {result.error}\n")
+            self._report(name, f"failed ({result.error})")
+            return result
+
+        with open(result.log_path, 'w', encoding='utf-8') as log:
+            def write_log(line):
+                log.write(line + "\n")
+
+            outcome = await self.engine.build(index, profile.to_dict(), on_line=write_log,
+                                              use_cache=self.use_cache, timeout=self.timeout)
+
+        result.return_code = outcome.return_code
+        result.cached = outcome.cached
+        result.elapsed = outcome.elapsed
+        if outcome.timed_out:
+            result.error = "timed out"
+        elif outcome.cancelled:
+            result.error = "Batch cancelled"
+        else:
+            result.error = outcome.error or None
+
+        if result.cached:
+            self._report(name, "cache hit")
+        else:
+            self._report(name, "succeeded" if result.succeeded else f"failed (exit code {result.return_code})")
+        return result
+
+    async def _run(self):
+        # Resolve everything first so shared base profiles are read once and
+        # broken profiles are reported before any build starts
+        profiles = load_profiles(self.profile_paths)
+        return await asyncio.gather(*(self.build_one(index, path, profile) for index, (path, profile)
+                                      in enumerate(zip(self.profile_paths, profiles))))
+
+    def run(self):
+        """ Build every profile and return the aggregate summary dict """
+        os.makedirs(self.log_dir, exist_ok=True)
+        start_time = time.time()
+
+        results = asyncio.run(self._run())
+
+        return {
+            'total': len(results),
+            'succeeded': sum(1 for r in results if r.succeeded),
+            'failed': sum(1 for r in results if not r.succeeded),
+            'cached': sum(1 for r in results if r.cached),
+            'workers': self.max_workers,
+            'elapsed': round(time.time() - start_time, 3),
+            'results': [r.to_dict() for r in results],
+        }
+
+    def cancel(self):
+        """ Stop queued builds from starting and kill the running ones with their child processes """
+        self.cancelled = True
+        self.engine.cancel_all(range(len(self.profile_paths)))
+
+
+def format_summary(summary):
+    """ Render a batch summary as plain text lines """
+    lines = [f"{'Profile':<30} {'Result':<10} {'Code':>5} {'Time':>9}  Log"]
+    for r in summary['results']:
+        status = 'CACHED' if r['cached'] else ('OK' if r['return_code'] == 0 else 'FAILED')
+        lines.append(f"{r['name'][:30]:<30} {status:<10} {r['return_code']:>5} {r['elapsed']:>8.1f}s  {r['log']}")
+    lines.append(
+        f"{summary['total']} profiles, {summary['succeeded']} succeeded "
+        f"({summary['cached']} from cache), {summary['failed']} failed, "
+        f"{summary['workers']} workers, {summary['elapsed']:.1f}s total"
+    )
+    return lines
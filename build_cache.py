@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Build Cache
+# Description: Content-addressed store for PyInstaller outputs. A build is keyed
+#              on the exact PyInstaller command, the interpreter and the
+#              versions of every installed distribution, plus the contents of
+#              every input (script, local imports, included files/folders,
+#              icon), so an unchanged build can be restored from the store
+#              instead of running PyInstaller again. Artifacts are copied (or
+#              cloned copy-on-write) both ways, never hardlinked, so editing a
+#              restored file in place cannot change the cached copy.
+
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+
+from import_graph import find_local_imports
+from hash_engine import default_engine, walk_files
+
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.python_builder', 'cache')
+DEFAULT_MAX_SIZE = 5 * 1024 * 1024 * 1024   # 5 GiB
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60         # 30 days
+
+# ioctl(2) request that makes a file share another's blocks copy-on-write (Linux)
+_FICLONE = 0x40049409
+
+_environment = None
+
+
+def collect_inputs(script_path, files=(), folders=(), icon_path=''):
+    """ Return a sorted list of every file that feeds into a build """
+    inputs = {os.path.abspath(script_path)}
+    inputs.update(find_local_imports(script_path))
+    inputs.update(os.path.abspath(f) for f in files)
+    for folder in folders:
+        inputs.update(os.path.abspath(path) for path, _ in walk_files(folder))
+    if icon_path:
+        inputs.add(os.path.abspath(icon_path))
+    return sorted(inputs)
+
+
+def hash_file(file_path):
+    """ Return the SHA-256 hex digest of a file's contents (cached by size and mtime) """
+    return default_engine().hash_file(file_path)
+
+
+def _tree_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+
+def _clone_or_copy(src, dst):
+    """
+    Copy a file so the store and dist never share it: signing or packing a
+    dist file in place must not alter the cached artifact. Where the file
+    system supports it (btrfs, XFS), the copy is a near-instant reflink.
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            import fcntl
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst)
+            return dst
+        except OSError:
+            pass # Not supported here: copy the data
+    shutil.copy2(src, dst)
+    return dst
+
+
+def environment_fingerprint():
+    """
+    The interpreter and the name==version of every installed distribution.
+    Bundles contain the libraries the script imports, so upgrading any of
+    them must change the cache key. Computed once per process.
+    """
+    global _environment
+    if _environment is None:
+        import importlib.metadata
+        distributions = set()
+        for dist in importlib.metadata.distributions():
+            name = dist.metadata['Name']
+            if name:
+                distributions.add(f"{name.lower()}=={dist.version}")
+        _environment = "\n".join([sys.executable, sys.version] + sorted(distributions))
+    return _environment
+
+
+def _remove_path(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def _option_value(command, option):
+    """ Return the value following an option in a command list, or None """
+    try:
+        return command[command.index(option) + 1]
+    except (ValueError, IndexError):
+        return None
+
+
+def artifact_names(command):
+    """ Return (dist_path, artifact_name) for a PyInstaller command """
+    dist_path = _option_value(command, '--distpath') or 'dist'
+    name = _option_value(command, '--name')
+    if not name:
+        name = os.path.splitext(os.path.basename(command[-1]))[0]
+    return dist_path, name
+
+
+class BuildCache:
+    """
+    Local artifact store keyed on a hash of the build command and its inputs.
+    Entries are evicted least-recently-used once the store exceeds max_size,
+    and unconditionally once unused for longer than max_age seconds.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_size=DEFAULT_MAX_SIZE, max_age=DEFAULT_MAX_AGE):
+        self.root = root
+        self.max_size = max_size
+        self.max_age = max_age
+
+    def compute_key(self, command, input_paths):
+        """ Hash the command, the toolchain and the content of every input """
+        digest = hashlib.sha256()
+        digest.update(json.dumps(command).encode('utf-8'))
+        tool = shutil.which(command[0]) if command else None
+        if tool:
+            # A PyInstaller upgrade must not serve stale artifacts
+            stat = os.stat(tool)
+            digest.update(f"{tool}|{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8'))
+        digest.update(environment_fingerprint().encode('utf-8'))
+        engine = default_engine()
+        digests = engine.hash_files(input_paths)
+        for path in input_paths:
+            digest.update(path.encode('utf-8'))
+            digest.update(digests[path].encode('ascii') if digests[path] else b'<missing>')
+        engine.save()
+        return digest.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def _read_meta(self, entry_dir):
+        try:
+            with open(os.path.join(entry_dir, 'meta.json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, entry_dir, meta):
+        tmp_path = os.path.join(entry_dir, 'meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, indent=4)
+        os.replace(tmp_path, os.path.join(entry_dir, 'meta.json'))
+
+    def lookup(self, key):
+        """ Return the metadata of a cached build, or None on a miss """
+        entry_dir = self._entry_dir(key)
+        meta = self._read_meta(entry_dir)
+        if meta is None or not os.path.isdir(os.path.join(entry_dir, 'artifacts')):
+            return None
+        return meta
+
+    def restore(self, key, command):
+        """ Place the cached artifacts into the command's dist path. Returns True on a hit """
+        meta = self.lookup(key)
+        if meta is None:
+            return False
+        entry_dir = self._entry_dir(key)
+        artifacts_dir = os.path.join(entry_dir, 'artifacts')
+        dist_path, _ = artifact_names(command)
+        os.makedirs(dist_path, exist_ok=True)
+
+        for entry in meta.get('artifacts', []):
+            src = os.path.join(artifacts_dir, entry)
+            dst = os.path.join(dist_path, entry)
+            _remove_path(dst)
+            if os.path.isdir(src):
+                shutil.copytree(src, dst, copy_function=_clone_or_copy, symlinks=True)
+            else:
+                _clone_or_copy(src, dst)
+
+        meta['last_used'] = time.time()
+        meta['hits'] = meta.get('hits', 0) + 1
+        self._write_meta(entry_dir, meta)
+        return True
+
+    def store(self, key, command):
+        """ Copy the artifacts produced by a successful build into the store """
+        dist_path, name = artifact_names(command)
+        if not os.path.isdir(dist_path):
+            return False
+        artifacts = [e for e in os.listdir(dist_path)
+                     if e == name or os.path.splitext(e)[0] == name]
+        if not artifacts:
+            return False
+
+        entry_dir = self._entry_dir(key)
+        tmp_dir = entry_dir + f".tmp{os.getpid()}"
+        _remove_path(tmp_dir)
+        os.makedirs(os.path.join(tmp_dir, 'artifacts'))
+        try:
+            for entry in artifacts:
+                src = os.path.join(dist_path, entry)
+                dst = os.path.join(tmp_dir, 'artifacts', entry)
+                if os.path.isdir(src):
+                    shutil.copytree(src, dst, copy_function=_clone_or_copy, symlinks=True)
+                else:
+                    _clone_or_copy(src, dst)
+            now = time.time()
+            self._write_meta(tmp_dir, {
+                'command': command,
+                'artifacts': artifacts,
+                'size': _tree_size(os.path.join(tmp_dir, 'artifacts')),
+                'created': now,
+                'last_used': now,
+                'hits': 0,
+                'python': sys.version.split()[0],
+            })
+            _remove_path(entry_dir)
+            os.replace(tmp_dir, entry_dir)
+        except Exception:
+            _remove_path(tmp_dir)
+            raise
+
+        self.evict()
+        return True
+
+    def entries(self):
+        """ Return a list of (key, meta) for every complete cache entry """
+        result = []
+        if not os.path.isdir(self.root):
+            return result
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                if '.tmp' in key:
+                    continue
+                meta = self._read_meta(os.path.join(prefix_dir, key))
+                if meta is not None:
+                    result.append((key, meta))
+        return result
+
+    def evict(self):
+        """ Drop expired entries, then least-recently-used ones until under max_size """
+        now = time.time()
+        entries = sorted(self.entries(), key=lambda item: item[1].get('last_used', 0))
+        total = sum(meta.get('size', 0) for _, meta in entries)
+        removed = []
+
+        for key, meta in entries:
+            expired = now - meta.get('last_used', 0) > self.max_age
+            if expired or total > self.max_size:
+                _remove_path(self._entry_dir(key))
+                total -= meta.get('size', 0)
+                removed.append(key)
+        return removed
+
+    def clear(self):
+        _remove_path(self.root)
@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Build Engine
+# Description: Runs PyInstaller builds as asyncio subprocesses so a single
+#              event loop can supervise many of them at once. Output is read
+#              without blocking a thread per build and handed to consumers
+#              through a bounded event queue: a slow consumer stops the
+#              engine from reading, which in turn pauses PyInstaller instead
+#              of buffering unbounded output. Builds can time out and be
+#              cancelled; either way the whole process tree is killed. Each
+#              running PyInstaller holds one core of the shared core budget,
+#              so concurrent builds never outnumber the budget's cores. New
+#              builds wait while the host is short of memory, and each runs
+#              under its profile's CPU, I/O and memory limits. Every build's
+#              output is also streamed into the log archive. Cancelled builds
+#              are not recorded in the profile library or the build timings.
+
+
+import sys
+import time
+import asyncio
+import inspect
+import subprocess
+
+from builder_core import process_group_kwargs, kill_process_tree
+from build_pipeline import prepare_build, complete_build
+from core_budget import default_budget
+from log_archive import BuildLog, LOG_ARCHIVE_DIR
+from resource_governor import ResourcePolicy, ProcessLimits, default_admission
+
+
+STARTED = 'started'
+SPAWNED = 'spawned' # PyInstaller process launched; event.pid is its process group
+OUTPUT = 'output'
+FINISHED = 'finished'
+
+# Events (mostly output lines) buffered before readers are paused
+MAX_PENDING_EVENTS = 2000
+# Longest output line read in one piece; longer lines are split
+LINE_LIMIT = 1024 * 1024
+
+
+class BuildResult:
+    """ Outcome of one build run by the engine """
+
+    def __init__(self, key):
+        self.key = key
+        self.return_code = None
+        self.cached = False
+        self.timed_out = False
+        self.cancelled = False
+        self.error = ''
+        self.started = time.time()
+        self.elapsed = 0.0
+        self.log_id = None # Id of the build's log in the log archive
+
+    @property
+    def succeeded(self):
+        return self.return_code == 0
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+class BuildEvent:
+    """ Something that happened to a build: it started, printed a line, or finished """
+
+    def __init__(self, kind, key, line=None, result=None, pid=None):
+        self.kind = kind
+        self.key = key
+        self.line = line
+        self.result = result
+        self.pid = pid
+        self.handled = None # Future resolved once consumers have seen the event
+
+
+class BuildEngine:
+    """
+    Supervises PyInstaller builds from one asyncio event loop.
+
+    build() is a coroutine; run up to max_concurrent of them together with
+    run_all() or asyncio.gather(). on_event(event) and each build's on_line
+    callback are called in order from the loop, for every line and state
+    change. An on_line that returns an awaitable is awaited before the next
+    event, so a consumer can hold back the output. cancel() may be called
+    from any thread and never blocks. Output is archived in log_archive_dir,
+    unless it is None.
+    """
+
+    def __init__(self, max_concurrent=None, on_event=None, max_pending_events=MAX_PENDING_EVENTS,
+                 log_archive_dir=LOG_ARCHIVE_DIR):
+        self.max_concurrent = max_concurrent
+        self.on_event = on_event
+        self.max_pending_events = max_pending_events
+        self.log_archive_dir = log_archive_dir
+        self.processes = {}
+        self.plans = {}
+        self._line_handlers = {}
+        self._archives = {}
+        self._cancelled = set()
+        self._failed_consumers = set()
+        self._events = None
+        self._dispatcher = None
+        self._semaphore = None
+        self._loop = None
+
+    # --- EVENTS ---
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use on this loop (asyncio.run creates a new one each time)
+            self._loop = loop
+            self._events = asyncio.Queue(self.max_pending_events)
+            self._semaphore = asyncio.Semaphore(self.max_concurrent) if self.max_concurrent else None
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        while True:
+            event = await self._events.get()
+            try:
+                if event.kind == OUTPUT:
+                    archive = self._archives.get(event.key)
+                    if archive:
+                        archive.write(event.line)
+                    handler = self._line_handlers.get(event.key)
+                    if handler:
+                        outcome = handler(event.line)
+                        if inspect.isawaitable(outcome):
+                            await outcome
+                if self.on_event:
+                    self.on_event(event)
+            except Exception as e:
+                # A failing consumer must not stall every build
+                self._report_consumer_error(event.key, e)
+            finally:
+                self._events.task_done()
+                if event.handled is not None:
+                    event.handled.set_result(None)
+
+    def _report_consumer_error(self, key, error):
+        """ Note a failing consumer once per build, in its archived log and on stderr """
+        if key in self._failed_consumers:
+            return
+        self._failed_consumers.add(key)
+        message = f"Build output consumer failed: {error!r}"
+        archive = self._archives.get(key)
+        if archive:
+            try:
+                archive.write(message)
+            except Exception:
+                pass
+        print(f"{key}: {message}", file=sys.stderr)
+
+    async def _emit(self, event):
+        # Blocks while the queue is full: this is the output backpressure
+        await self._events.put(event)
+
+    def _threadsafe_log(self, key):
+        """ A log function for the pre/post-build steps, which run on worker threads """
+        loop = self._loop
+
+        def log(message):
+            future = asyncio.run_coroutine_threadsafe(self._emit(BuildEvent(OUTPUT, key, message.rstrip())), loop)
+            future.result()
+        return log
+
+    def _open_archive(self, key, profile, result):
+        if self.log_archive_dir is None:
+            return
+        try:
+            archive = BuildLog(profile, key, self.log_archive_dir)
+        except OSError:
+            return # The build matters more than its archived log
+        self._archives[key] = archive
+        result.log_id = archive.id
+
+    def _close_archive(self, key, result):
+        archive = self._archives.pop(key, None)
+        if archive:
+            try:
+                archive.close(result)
+            except OSError:
+                pass
+
+    # --- BUILDS ---
+
+    async def _read_output(self, key, process, plan):
+        continued = False
+        while True:
+            try:
+                line = await process.stdout.readuntil(b'\n')
+            except asyncio.IncompleteReadError as e:
+                # Last line without a newline
+                line = e.partial
+            except asyncio.LimitOverrunError as e:
+                # Line longer than LINE_LIMIT: consume what is buffered as one
+                # piece and keep reading the rest of the line
+                line = await process.stdout.readexactly(e.consumed)
+                continued = True
+            else:
+                if continued:
+                    continued = False
+                    if line == b'\n':
+                        # Newline that ended an over-long line already emitted
+                        continue
+            if not line:
+                break
+            text = line.decode('utf-8', errors='replace').rstrip()
+            plan.timer.feed(text)
+            await self._emit(BuildEvent(OUTPUT, key, text))
+
+    async def _run_process(self, key, plan, result, timeout):
+        admission = default_admission()
+        await admission.admit(cancelled=lambda: key in self._cancelled,
+                              log=lambda message: self._emit(BuildEvent(OUTPUT, key, message)))
+        budget = default_budget()
+        try:
+            await budget.acquire_async(1)
+            try:
+                if key in self._cancelled:
+                    # Cancelled while waiting for memory or a core
+                    return 1
+                return await self._supervise(key, plan, result, timeout)
+            finally:
+                budget.release(1)
+        finally:
+            admission.release()
+
+    async def _supervise(self, key, plan, result, timeout):
+        loop = asyncio.get_running_loop()
+        policy = ResourcePolicy.from_profile(plan.profile)
+        limits = ProcessLimits(policy) if policy.limited else None
+        notes = limits.prepare() if limits else []
+        # PyInstaller starts behind a launcher that takes the limits on first,
+        # so nothing PyInstaller starts runs without them
+        command = limits.wrap(plan.command) if limits else plan.command
+        popen_kwargs = limits.popen_kwargs(process_group_kwargs()) if limits else process_group_kwargs()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                limit=LINE_LIMIT,
+                **popen_kwargs
+            )
+        except BaseException:
+            if limits:
+                limits.release()
+            raise
+        self.processes[key] = process
+        self.plans[key] = plan
+        if limits:
+            notes += limits.started(process.pid)
+        plan.timer.start(process.pid)
+        try:
+            for note in notes:
+                await self._emit(BuildEvent(OUTPUT, key, note))
+            await self._emit(BuildEvent(SPAWNED, key, pid=process.pid))
+            if key in self._cancelled:
+                # Cancelled while the process was being launched
+                await loop.run_in_executor(None, kill_process_tree, process.pid)
+                return await process.wait()
+            await asyncio.wait_for(self._read_output(key, process, plan), timeout or None)
+            return await process.wait()
+        except asyncio.TimeoutError:
+            result.timed_out = True
+            await self._emit(BuildEvent(OUTPUT, key, f"Build timed out after {timeout:.0f}s, stopping it."))
+            await loop.run_in_executor(None, kill_process_tree, process.pid)
+            return await process.wait()
+        except asyncio.CancelledError:
+            # The awaiting task was cancelled (e.g. Ctrl+C): leave nothing running
+            await loop.run_in_executor(None, kill_process_tree, process.pid)
+            await process.wait()
+            raise
+        finally:
+            self.processes.pop(key, None)
+            self.plans.pop(key, None)
+            if limits:
+                await loop.run_in_executor(None, limits.release)
+                result.error = result.error or limits.error()
+
+    async def _build(self, key, profile, result, use_cache, timeout):
+        loop = asyncio.get_running_loop()
+        log = self._threadsafe_log(key)
+        # Cache lookup and input hashing are blocking; keep them off the loop
+        plan = await loop.run_in_executor(None, prepare_build, profile, log, use_cache)
+        if plan.cached:
+            result.cached = True
+            result.return_code = 0
+        elif key in self._cancelled:
+            result.cancelled = True
+            result.return_code = 1
+            return
+        else:
+            await self._emit(BuildEvent(OUTPUT, key, subprocess.list2cmdline(plan.command)))
+            result.return_code = await self._run_process(key, plan, result, timeout)
+            if key in self._cancelled:
+                # Stopped on request: not a failure of the profile, so it
+                # is neither recorded in the library nor timed
+                result.cancelled = True
+                await self._emit(BuildEvent(OUTPUT, key, "Build cancelled."))
+                return
+        await loop.run_in_executor(None, complete_build, plan, result.return_code, log)
+
+    async def build(self, key, profile, on_line=None, use_cache=True, timeout=None):
+        """
+        Build one profile and return its BuildResult. timeout (seconds)
+        defaults to the profile's build_timeout; 0 or None means no limit.
+        """
+        self._ensure_started()
+        if timeout is None:
+            timeout = profile.get('build_timeout') or None
+        result = BuildResult(key)
+        if on_line:
+            self._line_handlers[key] = on_line
+        self._open_archive(key, profile, result)
+
+        try:
+            if self._semaphore:
+                await self._semaphore.acquire()
+            try:
+                result.started = time.time()
+                await self._emit(BuildEvent(STARTED, key))
+                await self._build(key, profile, result, use_cache, timeout)
+            finally:
+                if self._semaphore:
+                    self._semaphore.release()
+        except asyncio.CancelledError:
+            # The caller gave up on the build; its processes are already gone
+            self._line_handlers.pop(key, None)
+            self._cancelled.discard(key)
+            self._failed_consumers.discard(key)
+            result.cancelled = True
+            self._close_archive(key, result)
+            raise
+        except FileNotFoundError as e:
+            result.return_code = 1
+            result.error = f"'pyinstaller' not found: {e}" if e.filename == 'pyinstaller' else str(e)
+        except Exception as e:
+            result.return_code = 1
+            result.error = str(e)
+
+        if result.error:
+            await self._emit(BuildEvent(OUTPUT, key, f"An error occurred: {result.error}"))
+        result.elapsed = time.time() - result.started
+        finished = BuildEvent(FINISHED, key, result=result)
+        finished.handled = asyncio.get_running_loop().create_future()
+        await self._emit(finished)
+        # Every line of this build has been consumed once FINISHED has
+        await finished.handled
+        self._line_handlers.pop(key, None)
+        self._cancelled.discard(key)
+        self._failed_consumers.discard(key)
+        # Closing also prunes the archive: keep the directory scan off the loop
+        await asyncio.get_running_loop().run_in_executor(None, self._close_archive, key, result)
+        return result
+
+    async def run_all(self, builds):
+        """ Run several (key, profile, on_line) builds concurrently; return their results in order """
+        return await asyncio.gather(*(self.build(key, profile, on_line) for key, profile, on_line in builds))
+
+    def cancel(self, key):
+        """
+        Stop a build (queued or running) and every process it started.
+        Returns at once: the process tree is killed on the loop's executor.
+        """
+        self._cancelled.add(key)
+        self._call_on_loop(self._kill, [key])
+
+    def cancel_all(self, keys=()):
+        """ Cancel the given builds and everything currently running """
+        self._cancelled.update(keys)
+        self._call_on_loop(self._kill, None)
+
+    def _call_on_loop(self, callback, *args):
+        loop = self._loop
+        if loop is None:
+            return # Nothing has run yet
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            pass # The loop is closed, so none of its builds is running
+
+    def _kill(self, keys):
+        """ Runs on the loop: kill the running processes of keys (None for all) """
+        if keys is None:
+            keys = list(self.processes)
+            self._cancelled.update(keys)
+        for key in keys:
+            process = self.processes.get(key)
+            if process is not None and process.returncode is None:
+                # Escalating to SIGKILL can take seconds: wait off the loop
+                self._loop.run_in_executor(None, kill_process_tree, process.pid)
+
+    def current_phase(self, key):
+        plan = self.plans.get(key)
+        return plan.timer.current if plan else None
+
+
+def run_build(profile, on_line=None, use_cache=True, timeout=None):
+    """ Build one profile on a fresh event loop and return its BuildResult """
+    return asyncio.run(BuildEngine().build('build', profile, on_line, use_cache, timeout))
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Build Pipeline
+# Description: The steps that run before and after PyInstaller for a single
+#              profile (build cache lookup, work directory validation, data
+#              staging, version resource, import time profile, phase timing,
+#              bundle size report, cache store, ZIP deployment, profile
+#              library status, freshness manifest). Their thread pools draw from the shared
+#              core budget, capped at the profile's "cores" setting.
+#              Shared by the window, the batch builder and the command line so
+#              every front-end builds a profile the same way.
+
+
+import os
+
+from builder_core import build_command, profile_inputs
+from build_cache import BuildCache
+from work_cache import WorkpathManager
+from bundle_report import report_build, format_report, find_artifact, format_size
+from zip_deploy import deploy_zip
+from build_timing import PhaseTimer, save_timing, format_phases, find_regressions, \
+    format_regressions, load_history
+from profile_library import record_build_result
+from freshness import snapshot_inputs, write_manifest
+from data_staging import uses_staging, stage_data, format_staging_report
+from version_resource import write_version_file
+from import_profile import profile_imports, format_import_profile
+from core_budget import core_limit, profile_cores
+
+
+class BuildPlan:
+    """ Everything a front-end needs to run and finish one profile build """
+
+    def __init__(self, profile, command):
+        self.profile = profile
+        self.command = command
+        self.cache_key = None
+        self.cached = False
+        self.workpath = None
+        # Input sizes/mtimes before the build, for the freshness manifest
+        self.input_snapshot = None
+        # Front-ends call timer.start(pid) after launching PyInstaller and
+        # timer.feed(line) for every output line
+        self.timer = PhaseTimer()
+
+
+def prepare_build(profile, log=print, use_cache=True):
+    """
+    Run the pre-build steps for a profile and return a BuildPlan.
+    When plan.cached is True the artifacts were restored from the build cache
+    and PyInstaller must not be run.
+    """
+    with core_limit(profile_cores(profile)):
+        return _prepare_build(profile, log, use_cache)
+
+
+def _prepare_build(profile, log, use_cache):
+    command = build_command(profile)
+    if not command:
+        raise ValueError("Profile has no script_path")
+    plan = BuildPlan(profile, command)
+
+    try:
+        plan.input_snapshot = snapshot_inputs(profile)
+    except Exception as e:
+        log(f"Failed to snapshot build inputs: {e}")
+
+    if use_cache and profile.get('use_cache', True):
+        build_cache = BuildCache()
+        inputs = list(plan.input_snapshot) if plan.input_snapshot is not None else profile_inputs(profile)
+        plan.cache_key = build_cache.compute_key(command, inputs)
+        if build_cache.restore(plan.cache_key, command):
+            plan.cached = True
+            log(f"Build cache hit ({plan.cache_key[:12]}), "
+                "restored previous output without running PyInstaller.")
+            return plan
+
+    if profile.get('profile_imports'):
+        try:
+            for line in format_import_profile(profile_imports(profile['script_path']), top=10):
+                log(line)
+        except Exception as e:
+            log(f"Failed to profile imports: {e}")
+
+    if profile.get('incremental', True):
+        plan.workpath = WorkpathManager(profile)
+        invalid = plan.workpath.prepare()
+        if invalid:
+            log(f"Inputs changed, rebuilding stages: {', '.join(invalid)}")
+        elif os.path.isdir(plan.workpath.target_dir):
+            log(f"Reusing PyInstaller work directory: {plan.workpath.workpath}")
+
+    if uses_staging(profile):
+        # PyInstaller reads the data from the staging tree, so this must not fail silently
+        for line in format_staging_report(stage_data(profile)):
+            log(line)
+
+    # build_command() only names the version file; PyInstaller needs it written
+    write_version_file(profile)
+
+    return plan
+
+
+def deployment_path(plan):
+    """ Return where the ZIP deployment of a build is written """
+    artifact = find_artifact(plan.command)
+    if artifact is None:
+        return None, None
+    name = os.path.splitext(os.path.basename(artifact))[0]
+    return artifact, os.path.join(os.path.dirname(os.path.dirname(artifact)), f"{name}.zip")
+
+
+def deploy_build(plan, log=print):
+    """ Pack the build output into <output>/<name>.zip """
+    artifact, zip_path = deployment_path(plan)
+    if artifact is None:
+        log("ZIP deployment skipped: build output not found.")
+        return None
+    profile = plan.profile
+    log(f"Creating ZIP deployment ({profile.get('zip_method', 'lzma')}, level {profile.get('zip_level')})...")
+    result = deploy_zip(artifact, zip_path, method=profile.get('zip_method', 'lzma'),
+                        level=profile.get('zip_level'))
+    ratio = result['output_size'] / result['input_size'] * 100 if result['input_size'] else 100
+    log(f"ZIP deployment written to: {zip_path} ({result['members']} members, "
+        f"{format_size(result['output_size'])}, {ratio:.0f}% of original, "
+        f"{result['elapsed']:.1f}s on {result['workers']} threads)")
+    return result
+
+
+def record_timing(plan, return_code, log=print):
+    """ Store the phase breakdown of a PyInstaller run and report regressions """
+    record = plan.timer.finish()
+    record['return_code'] = return_code
+    save_timing(plan.profile, record)
+    log(format_phases(record))
+    regressions = find_regressions(load_history(plan.profile))
+    if regressions:
+        log("Slower than recent builds:")
+        for line in format_regressions(regressions):
+            log(line)
+    return record
+
+
+def complete_build(plan, return_code, log=print):
+    """ Run the post-build steps once PyInstaller exited with return_code """
+    with core_limit(profile_cores(plan.profile)):
+        _complete_build(plan, return_code, log)
+
+
+def _complete_build(plan, return_code, log):
+    if plan.timer.started is not None:
+        try:
+            record_timing(plan, return_code, log)
+        except Exception as e:
+            log(f"Failed to record build timing: {e}")
+
+    try:
+        record_build_result(plan.profile, return_code)
+    except Exception as e:
+        log(f"Failed to update the profile library: {e}")
+
+    if return_code != 0:
+        return
+
+    if plan.input_snapshot is not None:
+        try:
+            write_manifest(plan.profile, plan.command, plan.input_snapshot)
+        except Exception as e:
+            log(f"Failed to write the freshness manifest: {e}")
+
+    if plan.cached:
+        # An existing archive may come from a different build than the one
+        # just restored, so always repack the restored output
+        if plan.profile.get('deploy_zip'):
+            try:
+                deploy_build(plan, log)
+            except Exception as e:
+                log(f"ZIP deployment failed: {e}")
+        return
+
+    if plan.workpath:
+        plan.workpath.commit()
+
+    try:
+        report, previous = report_build(plan.profile, plan.command)
+        if report:
+            for line in format_report(report, previous, top=10):
+                log(line)
+    except Exception as e:
+        log(f"Failed to analyze bundle size: {e}")
+
+    if plan.cache_key:
+        try:
+            BuildCache().store(plan.cache_key, plan.command)
+            log(f"Build output stored in cache ({plan.cache_key[:12]}).")
+        except Exception as e:
+            log(f"Failed to store build in cache: {e}")
+
+    if plan.profile.get('deploy_zip'):
+        try:
+            deploy_build(plan, log)
+        except Exception as e:
+            log(f"ZIP deployment failed: {e}")
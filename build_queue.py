@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Build Queue
+# Description: Persistent, prioritized queue of profile builds. Jobs (with a
+#              snapshot of their profile) live in a JSON file guarded by a
+#              file lock, so the window and the command line can share one
+#              queue. Cancelling a job kills PyInstaller's whole process tree,
+#              and jobs left queued or running when the app exited are picked
+#              up again on the next start.
+
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import threading
+from contextlib import contextmanager
+
+from builder_core import STATE_DIR, profile_name, kill_process_tree, pid_alive
+from build_engine import BuildEngine, SPAWNED
+
+
+QUEUE_PATH = os.path.join(STATE_DIR, 'queue.json')
+QUEUE_LOG_DIR = os.path.join(STATE_DIR, 'queue_logs')
+QUEUE_VERSION = 1
+# Finished jobs kept for display; older ones are dropped
+MAX_FINISHED_JOBS = 100
+POLL_INTERVAL = 1.0
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class BuildJob:
+    """ One queued build and its outcome """
+
+    def __init__(self, profile, name, priority=0, job_id=None, seq=0):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.seq = seq
+        self.profile = profile
+        self.name = name
+        self.priority = priority
+        self.state = QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.return_code = None
+        self.attempts = 0
+        self.owner = None # pid of the queue runner building this job
+        self.pid = None   # pid of the PyInstaller process group
+        self.log_path = os.path.join(QUEUE_LOG_DIR, f"{self.id}.log")
+        self.error = ''
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data['profile'], data['name'], data.get('priority', 0), data['id'], data.get('seq', 0))
+        job.__dict__.update(data)
+        return job
+
+    @property
+    def elapsed(self):
+        if not self.started:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+@contextmanager
+def _file_lock(path):
+    """ Exclusive inter-process lock held on a companion .lock file """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'a+') as lock_file:
+        if sys.platform == 'win32':
+            import msvcrt
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass # LK_LOCK gives up after ten seconds; keep waiting
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class BuildQueue:
+    """
+    Builds jobs one at a time, highest priority first and in submission
+    order within a priority. All state changes go straight to disk.
+    """
+
+    def __init__(self, path=QUEUE_PATH, log_dir=QUEUE_LOG_DIR):
+        self.path = path
+        self.log_dir = log_dir
+        self.engine = BuildEngine(on_event=self._on_engine_event)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    # --- PERSISTENCE ---
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == QUEUE_VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+        return {'version': QUEUE_VERSION, 'next_seq': 0, 'jobs': []}
+
+    def _save(self, data):
+        finished = [j for j in data['jobs'] if j['state'] in FINISHED_STATES]
+        if len(finished) > MAX_FINISHED_JOBS:
+            drop = {j['id'] for j in sorted(finished, key=lambda j: j['finished'] or 0)[:-MAX_FINISHED_JOBS]}
+            data['jobs'] = [j for j in data['jobs'] if j['id'] not in drop]
+        tmp_path = f"{self.path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+    @contextmanager
+    def _transaction(self):
+        """ Load the queue under the file lock and save it afterwards """
+        with self._lock, _file_lock(self.path):
+            data = self._load()
+            yield data
+            self._save(data)
+
+    def _update(self, job_id, **changes):
+        with self._transaction() as data:
+            for entry in data['jobs']:
+                if entry['id'] == job_id:
+                    entry.update(changes)
+                    return BuildJob.from_dict(entry)
+        return None
+
+    # --- QUEUE OPERATIONS ---
+
+    def jobs(self):
+        """ Return every job: running, then queued in run order, then finished newest first """
+        with self._lock, _file_lock(self.path):
+            jobs = [BuildJob.from_dict(entry) for entry in self._load()['jobs']]
+        running = [j for j in jobs if j.state == RUNNING]
+        queued = sorted((j for j in jobs if j.state == QUEUED), key=lambda j: (-j.priority, j.seq))
+        finished = sorted((j for j in jobs if j.state in FINISHED_STATES),
+                          key=lambda j: j.finished or 0, reverse=True)
+        return running + queued + finished
+
+    def pending_count(self):
+        return sum(1 for job in self.jobs() if job.state in (QUEUED, RUNNING))
+
+    def submit(self, profile, priority=0, name=None):
+        """ Add a build of profile to the queue and return the job """
+        with self._transaction() as data:
+            job = BuildJob(dict(profile), name or profile_name(profile), priority, seq=data['next_seq'])
+            job.log_path = os.path.join(self.log_dir, f"{job.id}.log")
+            data['next_seq'] += 1
+            data['jobs'].append(job.to_dict())
+        self._wake_event.set()
+        return job
+
+    def set_priority(self, job_id, priority):
+        return self._update(job_id, priority=priority)
+
+    def cancel(self, job_id, wait=False):
+        """
+        Cancel a queued job, or stop a running one and its child processes.
+        Returns without waiting for them to exit unless wait is True, so it
+        can be called from a GUI slot.
+        """
+        with self._transaction() as data:
+            entry = next((e for e in data['jobs'] if e['id'] == job_id), None)
+            if entry is None or entry['state'] in FINISHED_STATES:
+                return False
+            running = entry['state'] == RUNNING
+            own = running and entry['owner'] == os.getpid()
+            pid = entry['pid'] if running and not own else None
+            entry.update(state=CANCELLED, finished=time.time())
+        if own:
+            # Also stops a job that has not launched PyInstaller yet; the
+            # engine escalates the kill on its own executor
+            self.engine.cancel(job_id)
+        elif pid:
+            # Run by another process: the group pid is all we need
+            if wait:
+                kill_process_tree(pid)
+            else:
+                threading.Thread(target=kill_process_tree, args=(pid,), daemon=True).start()
+        return True
+
+    def clear_finished(self):
+        with self._transaction() as data:
+            data['jobs'] = [e for e in data['jobs'] if e['state'] not in FINISHED_STATES]
+
+    def recover(self):
+        """
+        Return jobs whose runner died (app closed or crashed) to the queue,
+        stopping any PyInstaller process they left behind.
+        """
+        recovered = []
+        with self._transaction() as data:
+            for entry in data['jobs']:
+                if entry['state'] != RUNNING:
+                    continue
+                if entry['owner'] != os.getpid() and pid_alive(entry['owner']):
+                    continue # Being built by another live runner
+                if entry['id'] in self.engine.processes:
+                    continue
+                if entry['pid'] and pid_alive(entry['pid']):
+                    kill_process_tree(entry['pid'])
+                entry.update(state=QUEUED, owner=None, pid=None, started=None)
+                recovered.append(BuildJob.from_dict(entry))
+        return recovered
+
+    def _claim_next(self):
+        """ Mark the next queued job as running for this process and return it """
+        with self._transaction() as data:
+            queued = [e for e in data['jobs'] if e['state'] == QUEUED]
+            if not queued:
+                return None
+            entry = min(queued, key=lambda e: (-e['priority'], e['seq']))
+            entry.update(state=RUNNING, owner=os.getpid(), started=time.time(), finished=None,
+                         return_code=None, error='', attempts=entry['attempts'] + 1)
+            return BuildJob.from_dict(entry)
+
+    # --- RUNNING ---
+
+    def _on_engine_event(self, event):
+        if event.kind == SPAWNED:
+            # Lets other processes cancel the job and a restart clean up after it
+            self._update(event.key, pid=event.pid)
+
+    def run_job(self, job, on_line=None):
+        """ Build one claimed job, writing its output to job.log_path. Returns its BuildResult """
+        os.makedirs(os.path.dirname(job.log_path), exist_ok=True)
+        with open(job.log_path, 'w', encoding='utf-8') as log:
+            def write_log(message):
+                log.write(message + "\n")
+                log.flush()
+                if on_line:
+                    on_line(message)
+
+            return asyncio.run(self.engine.build(job.id, job.profile, on_line=write_log))
+
+    def _finish(self, job, return_code, error=''):
+        """ Record the outcome unless the job was cancelled or requeued meanwhile """
+        with self._transaction() as data:
+            entry = next((e for e in data['jobs'] if e['id'] == job.id), None)
+            if entry is None:
+                return None
+            if entry['state'] == RUNNING and entry['owner'] == os.getpid():
+                entry.update(state=SUCCEEDED if return_code == 0 else FAILED)
+            entry.update(return_code=return_code, pid=None, error=error,
+                         finished=entry['finished'] or time.time())
+            if entry['state'] == QUEUED:
+                entry['finished'] = None
+            return BuildJob.from_dict(entry)
+
+    def run(self, on_line=None, on_event=None, wait=False):
+        """
+        Build queued jobs until the queue is empty, or with wait=True until
+        stop() is called. on_event(job) is called when a job starts and ends.
+        """
+        self._stop_event.clear()
+        self.recover()
+        while not self._stop_event.is_set():
+            job = self._claim_next()
+            if job is None:
+                if not wait:
+                    break
+                # Also picks up jobs submitted by other processes
+                self._wake_event.wait(POLL_INTERVAL)
+                self._wake_event.clear()
+                continue
+
+            if on_event:
+                on_event(job)
+            try:
+                result = self.run_job(job, on_line)
+                return_code = result.return_code
+                error = "timed out" if result.timed_out else result.error
+            except OSError as e:
+                return_code = 1
+                error = str(e)
+                if on_line:
+                    on_line(f"An error occurred: {error}")
+            job = self._finish(job, return_code, error)
+            if on_event and job:
+                on_event(job)
+
+    def stop(self, requeue=True):
+        """
+        Stop the runner. Running jobs are killed and, with requeue=True, put
+        back in the queue so the next run() resumes them.
+        """
+        self._stop_event.set()
+        self._wake_event.set()
+        for job_id in list(self.engine.processes):
+            if requeue:
+                self._update(job_id, state=QUEUED, owner=None, pid=None, started=None)
+            self.engine.cancel(job_id)
+
+
+def format_jobs(jobs):
+    """ Render jobs as plain text lines """
+    lines = [f"{'ID':<14}{'State':<11}{'Prio':>5}  {'Time':>7}  Profile"]
+    for job in jobs:
+        elapsed = f"{job.elapsed:.1f}s" if job.started else '-'
+        lines.append(f"{job.id:<14}{job.state:<11}{job.priority:>5}  {elapsed:>7}  {job.name}")
+    return lines
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Build Timing
+# Description: Splits a PyInstaller run into its phases (startup, analysis,
+#              hooks, PYZ, PKG, EXE, COLLECT) by watching its INFO lines,
+#              samples the peak resident memory of the PyInstaller process
+#              tree, and keeps a per-profile history so slow or memory-hungry
+#              builds can be traced to the phase that regressed.
+
+
+import os
+import re
+import sys
+import json
+import time
+import statistics
+import threading
+
+from builder_core import STATE_DIR, profile_id
+
+
+TIMING_DIR = os.path.join(STATE_DIR, 'timings')
+MAX_HISTORY_PER_PROFILE = 200
+
+PHASES = ['startup', 'analysis', 'hooks', 'pyz', 'pkg', 'exe', 'collect']
+
+# First matching pattern decides the phase an output line starts
+PHASE_PATTERNS = [
+    ('hooks', re.compile(r"INFO: (Processing (standard |pre-find |pre-safe-import-)?module hook|"
+                         r"Processing module hooks|Loading module hook|Processing pre-)")),
+    ('analysis', re.compile(r"INFO: (checking Analysis|Analyzing |Caching module dependency graph|"
+                            r"Performing binary vs\. data|Looking for ctypes DLLs|"
+                            r"Looking for dynamic libraries|Creating base_library\.zip)")),
+    ('pyz', re.compile(r"INFO: checking PYZ")),
+    ('pkg', re.compile(r"INFO: checking PKG")),
+    ('exe', re.compile(r"INFO: checking EXE")),
+    ('collect', re.compile(r"INFO: checking COLLECT")),
+    (None, re.compile(r"INFO: Build complete!")),
+]
+
+SAMPLE_INTERVAL = 0.5
+
+# A phase regressed when it is this much slower than its recent median...
+REGRESSION_RATIO = 1.25
+# ...and the difference is large enough to matter
+REGRESSION_MIN_SECONDS = 2.0
+REGRESSION_MIN_RSS = 50 * 1024 * 1024
+BASELINE_RUNS = 10
+
+
+# --- PROCESS TREE MEMORY ---
+
+def linux_tree_rss(root_pid):
+    """ Resident bytes of a process and all its descendants, from /proc """
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as f:
+                # The command name may contain spaces; fields resume after the last ')'
+                ppid = int(f.read().rsplit(b')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        try:
+            with open(f'/proc/{pid}/statm', 'rb') as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            pass
+        pending.extend(children.get(pid, ()))
+    return total
+
+
+def _windows_peak_rss(root_pid):
+    """ Peak working set of the root process (children are not included) """
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    handle = ctypes.windll.kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, root_pid)
+    if not handle:
+        return 0
+    try:
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+        return 0
+    finally:
+        ctypes.windll.kernel32.CloseHandle(handle)
+
+
+class RssSampler(threading.Thread):
+    """ Polls the memory of a process tree in the background and keeps the peak """
+
+    def __init__(self, pid, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+        if sys.platform.startswith('linux'):
+            self._measure = linux_tree_rss
+        elif sys.platform == 'win32':
+            self._measure = _windows_peak_rss
+        else:
+            self._measure = None
+
+    @property
+    def supported(self):
+        return self._measure is not None
+
+    def sample(self):
+        try:
+            self.peak = max(self.peak, self._measure(self.pid))
+        except Exception:
+            self._measure = None
+
+    def run(self):
+        while self._measure and not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+
+
+# --- PHASE TIMER ---
+
+class PhaseTimer:
+    """
+    Attributes the wall time of a PyInstaller run to its phases. Feed it every
+    output line; a phase may recur (analysis and hooks interleave) and its
+    durations add up.
+    """
+
+    def __init__(self):
+        self.started = None
+        self.current = None
+        self.phases = {}
+        self._phase_start = None
+        self._sampler = None
+
+    def start(self, pid=None, now=None):
+        """ Begin timing a PyInstaller process (pid is sampled for peak memory) """
+        self.started = now or time.time()
+        self.current = 'startup'
+        self._phase_start = self.started
+        if pid:
+            self._sampler = RssSampler(pid)
+            if self._sampler.supported:
+                self._sampler.start()
+            else:
+                self._sampler = None
+
+    def _switch(self, phase, now):
+        if self.current is not None:
+            self.phases[self.current] = self.phases.get(self.current, 0.0) + (now - self._phase_start)
+        self.current = phase
+        self._phase_start = now
+
+    def feed(self, line, now=None):
+        if self.started is None or 'INFO: ' not in line:
+            return
+        for phase, pattern in PHASE_PATTERNS:
+            if pattern.search(line):
+                if phase != self.current:
+                    self._switch(phase, now or time.time())
+                return
+
+    def finish(self, now=None):
+        """ Stop timing and return a history record """
+        now = now or time.time()
+        self._switch(None, now)
+        peak_rss = None
+        if self._sampler:
+            self._sampler.stop()
+            peak_rss = self._sampler.peak or None
+        return {
+            'created': now,
+            'total': now - self.started,
+            'phases': {phase: round(self.phases[phase], 3) for phase in PHASES if phase in self.phases},
+            'peak_rss': peak_rss,
+        }
+
+
+# --- HISTORY ---
+
+def _history_path(profile):
+    return os.path.join(TIMING_DIR, f"{profile_id(profile)}.jsonl")
+
+
+def load_history(profile):
+    """ Return the recorded runs of a profile, oldest first """
+    try:
+        with open(_history_path(profile), 'r') as f:
+            lines = f.readlines()
+    except OSError:
+        return []
+    history = []
+    for line in lines:
+        try:
+            history.append(json.loads(line))
+        except ValueError:
+            pass # A run interrupted mid-write
+    return history
+
+
+def save_timing(profile, record):
+    """ Append a run to the profile's history, keeping the newest MAX_HISTORY_PER_PROFILE """
+    path = _history_path(profile)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + "\n")
+
+    history = load_history(profile)
+    if len(history) > MAX_HISTORY_PER_PROFILE:
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for entry in history[-MAX_HISTORY_PER_PROFILE:]:
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, path)
+    return path
+
+
+def _metric(record, name):
+    if name == 'total' or name == 'peak_rss':
+        return record.get(name)
+    return record.get('phases', {}).get(name, 0.0)
+
+
+def find_regressions(history, index=-1):
+    """
+    Compare one run with the median of the successful runs before it.
+    Returns {metric: (value, baseline)} for total, every phase and peak_rss.
+    """
+    index = index % len(history) if history else 0
+    if not history or history[index].get('return_code', 0) != 0:
+        return {}
+    baseline_runs = [r for r in history[:index] if r.get('return_code', 0) == 0][-BASELINE_RUNS:]
+    if len(baseline_runs) < 3:
+        return {}
+
+    run = history[index]
+    regressions = {}
+    for name in ['total'] + PHASES + ['peak_rss']:
+        value = _metric(run, name)
+        values = [v for v in (_metric(r, name) for r in baseline_runs) if v is not None]
+        if value is None or not values:
+            continue
+        baseline = statistics.median(values)
+        minimum = REGRESSION_MIN_RSS if name == 'peak_rss' else REGRESSION_MIN_SECONDS
+        if value - baseline >= minimum and value >= baseline * REGRESSION_RATIO:
+            regressions[name] = (value, baseline)
+    return regressions
+
+
+def format_seconds(seconds):
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m{seconds:02d}s"
+
+
+def format_rss(num_bytes):
+    return f"{num_bytes / (1024 * 1024):.0f} MB" if num_bytes else '-'
+
+
+def format_phases(record):
+    """ One-line summary of a single run """
+    parts = [f"{phase} {format_seconds(record['phases'][phase])}" for phase in PHASES if phase in record['phases']]
+    line = f"Build time {format_seconds(record['total'])}: {', '.join(parts)}"
+    if record.get('peak_rss'):
+        line += f"; peak memory {format_rss(record['peak_rss'])}"
+    return line
+
+
+def _format_metric(name, value):
+    return format_rss(value) if name == 'peak_rss' else format_seconds(value)
+
+
+def format_regressions(regressions):
+    return [f"  {name}: {_format_metric(name, value)} (usually {_format_metric(name, baseline)})"
+            for name, (value, baseline) in regressions.items()]
+
+
+def format_history(history, last=15):
+    """ Render the most recent runs as a table, followed by regressions of the latest one """
+    if not history:
+        return ["No builds recorded for this profile yet."]
+    header = f"{'Date':<17}{'Total':>8}" + ''.join(f"{phase:>10}" for phase in PHASES) + f"{'Peak RSS':>10}"
+    lines = [header]
+    for record in history[-last:]:
+        row = time.strftime('%Y-%m-%d %H:%M', time.localtime(record['created'])).ljust(17)
+        row += f"{format_seconds(record['total']):>8}"
+        for phase in PHASES:
+            value = record['phases'].get(phase)
+            row += f"{format_seconds(value) if value is not None else '-':>10}"
+        row += f"{format_rss(record.get('peak_rss')):>10}"
+        if record.get('return_code', 0) != 0:
+            row += "  failed"
+        lines.append(row)
+
+    regressions = find_regressions(history)
+    if regressions:
+        lines.append("Regressions in the latest build:")
+        lines.extend(format_regressions(regressions))
+    return lines
@@ -0,0 +1,804 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Build Workers
+# Description: Fans profile builds out to other machines. A worker daemon
+#              accepts builds over TCP or a Unix socket and runs them on its
+#              own BuildEngine. The coordinator ships each profile's inputs
+#              content-addressed (files a worker already holds are not sent
+#              again), streams the build log back, and unpacks the artifact
+#              into the profile's dist folder, where a local build would have
+#              put it. Each build goes to the worker with the most idle cores.
+#
+# Protocol:    One JSON object per line, and raw bytes after "blob" and
+#              "finished" messages that announce a size.
+#                -> hello {version, token}       <- status {host, cores, slots, running, load, ...}
+#                -> build {key, profile, files}  <- need {digests}
+#                -> blob {digest, size} + bytes  (once per needed digest)
+#                <- output {line} ...            -> cancel (optional)
+#                <- finished {result, status, artifact_size} + tar bytes
+#              A worker answers error {message} instead when it refuses.
+
+
+import os
+import re
+import sys
+import json
+import hmac
+import time
+import shutil
+import socket
+import asyncio
+import hashlib
+import tarfile
+import tempfile
+
+from builder_core import (STATE_DIR, PROFILE_DEFAULTS, build_command, profile_id, profile_inputs,
+                          profile_name, usable_cores)
+from build_cache import artifact_names
+from build_engine import BuildEngine
+from build_pipeline import BuildPlan, deploy_build
+from batch_builder import BatchResult, default_worker_count
+from bundle_report import find_artifact
+from freshness import snapshot_inputs, write_manifest
+from hash_engine import default_engine, walk_files
+from profile_library import record_build_result
+from profile_model import Profile, load_profiles
+
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 7321
+# The token may come from the environment to keep it out of process lists
+TOKEN_ENV = 'PYTHON_BUILDER_TOKEN'
+
+WORKER_DIR = os.path.join(STATE_DIR, 'worker')
+BLOB_DIR = os.path.join(WORKER_DIR, 'blobs')
+JOB_DIR = os.path.join(WORKER_DIR, 'jobs')
+REMOTE_LOG_DIR = os.path.join(STATE_DIR, 'remote_logs')
+
+# Longest protocol line (a build request lists every input file)
+MESSAGE_LIMIT = 64 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+CONNECT_TIMEOUT = 10.0
+# A coordinator that takes longer than this to accept more output is dropped
+SEND_TIMEOUT = 60.0
+
+# Limits chosen for the coordinator's machine; the worker applies its own defaults
+MACHINE_FIELDS = ['cores', 'nice', 'io_priority', 'memory_limit_mb']
+
+_DIGEST = re.compile(r'[0-9a-f]{64}')
+_KEY = re.compile(r'[0-9a-f]{8,64}')
+
+
+class RemoteBuildError(Exception):
+    """ A worker refused a build or broke the protocol """
+
+
+# --- PROTOCOL ---
+
+def parse_address(address):
+    """
+    Return ('tcp', host, port) for "host:port" (or a bare host), or
+    ('unix', path) for "unix:/path" and anything that looks like a path.
+    """
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    if '/' in address or os.sep in address or address.endswith('.sock'):
+        return 'unix', address
+    if ':' not in address:
+        return 'tcp', address, DEFAULT_PORT
+    host, _, port = address.rpartition(':')
+    if not port.isdigit():
+        raise ValueError(f"Invalid worker address '{address}' (expected host:port or a socket path)")
+    return 'tcp', host.strip('[]') or '127.0.0.1', int(port)
+
+
+async def open_connection(address):
+    target = parse_address(address)
+    if target[0] == 'unix':
+        if not hasattr(asyncio, 'open_unix_connection'):
+            raise ValueError("Unix sockets are not supported on this platform, use host:port")
+        connect = asyncio.open_unix_connection(target[1], limit=MESSAGE_LIMIT)
+    else:
+        connect = asyncio.open_connection(target[1], target[2], limit=MESSAGE_LIMIT)
+    return await asyncio.wait_for(connect, CONNECT_TIMEOUT)
+
+
+def _encode(message):
+    return json.dumps(message).encode('utf-8') + b'\n'
+
+
+async def send_message(writer, message):
+    writer.write(_encode(message))
+    await writer.drain()
+
+
+async def read_message(reader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed")
+    try:
+        message = json.loads(line)
+    except ValueError:
+        raise RemoteBuildError("Malformed message")
+    if not isinstance(message, dict):
+        raise RemoteBuildError("Malformed message")
+    return message
+
+
+async def send_file(writer, path, size):
+    """ Send exactly size bytes of a file (it must not have changed since it was measured) """
+    remaining = size
+    with open(path, 'rb') as f:
+        while remaining:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise RemoteBuildError(f"{path} changed while it was being sent")
+            writer.write(chunk)
+            remaining -= len(chunk)
+            await writer.drain()
+
+
+async def receive_file(reader, path, size, digest=None):
+    """ Write the next size bytes to path; with digest, verify their SHA-256 """
+    checksum = hashlib.sha256() if digest else None
+    remaining = size
+    with open(path, 'wb') as f:
+        while remaining:
+            chunk = await reader.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise ConnectionError("Connection closed during a transfer")
+            f.write(chunk)
+            if checksum:
+                checksum.update(chunk)
+            remaining -= len(chunk)
+    if checksum and checksum.hexdigest() != digest:
+        raise RemoteBuildError("Received data does not match its digest")
+
+
+# --- PACKING (coordinator side) ---
+
+class PackedProfile:
+    """ A profile with its paths made relative, and the files a worker needs to build it """
+
+    def __init__(self, key, profile, files, sources):
+        self.key = key
+        self.profile = profile   # Paths relative to the source root, '/'-separated
+        self.files = files       # {relative path: [digest, size]}
+        self.sources = sources   # {digest: absolute path}
+
+
+def _hidden_local_modules(profile):
+    """ Local modules only named as hidden imports, which the import scan cannot see """
+    root = os.path.dirname(os.path.abspath(profile['script_path']))
+    found = []
+    for module in profile.get('included_modules', []):
+        base = os.path.join(root, *module.split('.'))
+        for candidate in (base + '.py', os.path.join(base, '__init__.py')):
+            if os.path.isfile(candidate):
+                found.append(candidate)
+        package_dir = os.path.dirname(base)
+        while package_dir.startswith(root + os.sep):
+            init_file = os.path.join(package_dir, '__init__.py')
+            if os.path.isfile(init_file):
+                found.append(init_file)
+            package_dir = os.path.dirname(package_dir)
+    return found
+
+
+def pack_profile(profile):
+    """ Hash a profile's inputs and describe them relative to their common folder """
+    inputs = sorted(set(profile_inputs(profile)) | set(_hidden_local_modules(profile)))
+    folders = [os.path.abspath(f) for f in profile.get('included_folders', [])]
+    # Anchoring on a folder's parent keeps its name, which becomes its name in the bundle
+    try:
+        root = os.path.commonpath(inputs + [os.path.dirname(f) for f in folders])
+    except ValueError:
+        raise ValueError("The profile's inputs are on different drives and cannot be sent to a worker")
+    if os.path.isfile(root):
+        root = os.path.dirname(root)
+
+    def relative(path):
+        return os.path.relpath(os.path.abspath(path), root).replace(os.sep, '/') if path else ''
+
+    engine = default_engine()
+    stats = {path: os.stat(path) for path in inputs}
+    digests = engine.hash_files(list(stats.items()))
+    engine.save()
+    files = {}
+    sources = {}
+    for path, digest in digests.items():
+        if digest is None:
+            raise FileNotFoundError(f"Cannot read build input: {path}")
+        files[relative(path)] = [digest, stats[path].st_size]
+        sources[digest] = path
+
+    remote = dict(profile)
+    remote['script_path'] = relative(profile['script_path'])
+    remote['icon_path'] = relative(profile.get('icon_path', ''))
+    remote['included_files'] = [relative(f) for f in profile.get('included_files', [])]
+    remote['included_folders'] = [relative(f) for f in profile.get('included_folders', [])]
+    remote['output_dir'] = ''
+    # Stable per coordinator and profile, so workers reuse their work directories
+    key = hashlib.sha1(f"{socket.gethostname()}|{profile_id(profile)}".encode('utf-8')).hexdigest()[:16]
+    return PackedProfile(key, remote, files, sources)
+
+
+def unpack_artifact(tar_path, command):
+    """ Replace the artifact in the command's dist folder with the one in tar_path """
+    dist_path, name = artifact_names(command)
+    names = (name, name + '.exe', name + '.app')
+    os.makedirs(dist_path, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.remote-', dir=dist_path)
+    try:
+        with tarfile.open(tar_path, 'r:') as tar:
+            for member in tar.getmembers():
+                parts = member.name.split('/')
+                if parts[0] not in names or '..' in parts or os.path.isabs(member.name) or \
+                        not (member.isfile() or member.isdir() or member.issym()):
+                    raise RemoteBuildError(f"Unexpected entry in the artifact: {member.name}")
+                if member.issym():
+                    target = os.path.normpath(os.path.join(os.path.dirname(member.name), member.linkname))
+                    if os.path.isabs(member.linkname) or \
+                            not target.replace(os.sep, '/').startswith(parts[0] + '/'):
+                        raise RemoteBuildError(f"Artifact link points outside of it: {member.name}")
+            if hasattr(tarfile, 'data_filter'):
+                tar.extractall(staging, filter='data')
+            else:
+                tar.extractall(staging)
+        for candidate in names:
+            old = os.path.join(dist_path, candidate)
+            if os.path.isdir(old) and not os.path.islink(old):
+                shutil.rmtree(old)
+            elif os.path.lexists(old):
+                os.remove(old)
+        for entry in os.listdir(staging):
+            os.replace(os.path.join(staging, entry), os.path.join(dist_path, entry))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return find_artifact(command)
+
+
+# --- WORKER ---
+
+def _blob_path(digest):
+    return os.path.join(BLOB_DIR, digest[:2], digest)
+
+
+def _job_path(root, relative):
+    """ Place a '/'-separated relative path below root, refusing anything that escapes it """
+    path = os.path.normpath(os.path.join(root, *relative.split('/')))
+    if os.path.isabs(relative) or not (path == root or path.startswith(root + os.sep)):
+        raise RemoteBuildError(f"Invalid input path: {relative}")
+    return path
+
+
+def materialize(source_root, files):
+    """ Make source_root hold exactly the given files, hardlinked from the blob store """
+    os.makedirs(source_root, exist_ok=True)
+    wanted = {_job_path(source_root, relative): digest for relative, (digest, _) in files.items()}
+    for path, _ in list(walk_files(source_root)):
+        if path not in wanted:
+            os.remove(path)
+    for path, digest in wanted.items():
+        blob = _blob_path(digest)
+        try:
+            if os.path.samefile(path, blob):
+                continue
+        except OSError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.lexists(path):
+            os.remove(path)
+        try:
+            os.link(blob, path)
+        except OSError:
+            shutil.copy2(blob, path)
+
+
+def localize_profile(remote, job_root):
+    """ Turn a received profile into one that builds inside job_root """
+    source_root = os.path.join(job_root, 'src')
+    profile = Profile.from_dict(remote, source='remote build').to_dict()
+    if not profile['script_path']:
+        raise RemoteBuildError("The profile has no script")
+    profile['script_path'] = _job_path(source_root, profile['script_path'])
+    if profile['icon_path']:
+        profile['icon_path'] = _job_path(source_root, profile['icon_path'])
+    profile['included_files'] = [_job_path(source_root, f) for f in profile['included_files']]
+    profile['included_folders'] = [_job_path(source_root, f) for f in profile['included_folders']]
+    for folder in profile['included_folders']:
+        os.makedirs(folder, exist_ok=True) # Empty folders have no files to recreate them
+    profile['output_dir'] = os.path.join(job_root, 'output')
+    # The coordinator deploys; the worker's machine must never be shut down
+    profile['shutdown'] = False
+    profile['deploy_zip'] = False
+    for field in MACHINE_FIELDS:
+        profile[field] = PROFILE_DEFAULTS[field]
+    return profile
+
+
+def pack_artifact(artifact, tar_path):
+    with tarfile.open(tar_path, 'w') as tar:
+        tar.add(artifact, arcname=os.path.basename(artifact))
+
+
+class BuildWorker:
+    """
+    The daemon side: authenticates coordinators and runs their builds, at
+    most slots at a time, on one BuildEngine.
+    """
+
+    def __init__(self, slots=None, token=None, log=print):
+        self.slots = slots or default_worker_count()
+        self.token = token
+        self.log = log
+        self.engine = BuildEngine(max_concurrent=self.slots)
+        self.running = 0
+        self._job_locks = {}
+
+    def status(self):
+        load = os.getloadavg()[0] if hasattr(os, 'getloadavg') else float(self.running)
+        return {
+            'type': 'status',
+            'version': PROTOCOL_VERSION,
+            'host': socket.gethostname(),
+            'platform': sys.platform,
+            'python': f"{sys.version_info[0]}.{sys.version_info[1]}",
+            'cores': usable_cores(),
+            'slots': self.slots,
+            'running': self.running,
+            'load': load,
+        }
+
+    async def handle(self, reader, writer):
+        """ Serve one coordinator connection """
+        peer = writer.get_extra_info('peername') or 'local socket'
+        try:
+            hello = await read_message(reader)
+            if hello.get('type') != 'hello' or hello.get('version') != PROTOCOL_VERSION:
+                await send_message(writer, {'type': 'error', 'message': f"Protocol version {PROTOCOL_VERSION} required"})
+                return
+            if self.token and not hmac.compare_digest(str(hello.get('token') or ''), self.token):
+                self.log(f"Rejected {peer}: invalid token")
+                await send_message(writer, {'type': 'error', 'message': "Invalid token"})
+                return
+            await send_message(writer, self.status())
+            request = await read_message(reader)
+            if request.get('type') == 'build':
+                try:
+                    await self._serve_build(request, reader, writer)
+                except (RemoteBuildError, ValueError) as e:
+                    self.log(f"Refused a build from {peer}: {e}")
+                    await send_message(writer, {'type': 'error', 'message': str(e)})
+        except ConnectionError:
+            pass # Status probes hang up after the reply
+        except (RemoteBuildError, OSError) as e:
+            self.log(f"Connection from {peer} failed: {e}")
+        finally:
+            writer.close()
+
+    async def _receive_blobs(self, reader, writer, files):
+        loop = asyncio.get_running_loop()
+        missing = sorted({digest for digest, _ in files.values() if not os.path.exists(_blob_path(digest))})
+        for digest in missing:
+            if not _DIGEST.fullmatch(digest):
+                raise RemoteBuildError("Invalid digest")
+        await send_message(writer, {'type': 'need', 'digests': missing})
+        for digest in missing:
+            header = await read_message(reader)
+            if header.get('type') != 'blob' or header.get('digest') != digest:
+                raise RemoteBuildError("Unexpected message while receiving files")
+            path = _blob_path(digest)
+            await loop.run_in_executor(None, lambda: os.makedirs(os.path.dirname(path), exist_ok=True))
+            tmp_path = f"{path}.tmp{os.getpid()}.{id(writer)}"
+            try:
+                await receive_file(reader, tmp_path, int(header['size']), digest)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return len(missing)
+
+    async def _watch_cancel(self, reader, key):
+        """ Cancel the build if the coordinator asks to, or hangs up """
+        try:
+            while True:
+                message = await read_message(reader)
+                if message.get('type') == 'cancel':
+                    break
+        except (ConnectionError, RemoteBuildError, OSError):
+            pass
+        self.engine.cancel(key)
+
+    async def _serve_build(self, request, reader, writer):
+        loop = asyncio.get_running_loop()
+        key = request.get('key', '')
+        if not isinstance(key, str) or not _KEY.fullmatch(key):
+            raise RemoteBuildError("Invalid job key")
+        files = request.get('files')
+        if not isinstance(files, dict):
+            raise RemoteBuildError("Missing file list")
+
+        # Builds of the same profile share a job folder, so they run one at a time
+        async with self._job_locks.setdefault(key, asyncio.Lock()):
+            received = await self._receive_blobs(reader, writer, files)
+            job_root = os.path.join(JOB_DIR, key)
+            profile = localize_profile(request.get('profile') or {}, job_root)
+            await loop.run_in_executor(None, materialize, os.path.join(job_root, 'src'), files)
+            name = request.get('name') or key
+            self.log(f"Building {name} ({len(files)} inputs, {received} received)")
+
+            stalled = False
+            _, high_water = writer.transport.get_write_buffer_limits()
+
+            async def wait_for_coordinator():
+                nonlocal stalled
+                try:
+                    await asyncio.wait_for(writer.drain(), SEND_TIMEOUT)
+                except asyncio.TimeoutError:
+                    stalled = True
+                    self.log(f"{name}: coordinator stopped reading the log, cancelling")
+                    self.engine.cancel(key)
+
+            def send_line(line):
+                if stalled:
+                    return None
+                writer.write(_encode({'type': 'output', 'line': line}))
+                if writer.transport.get_write_buffer_size() > high_water:
+                    # The engine awaits this, pausing the build's output
+                    # instead of buffering the whole log for a slow coordinator
+                    return wait_for_coordinator()
+                return None
+
+            self.running += 1
+            watcher = loop.create_task(self._watch_cancel(reader, key))
+            try:
+                result = await self.engine.build(key, profile, on_line=send_line,
+                                                 use_cache=bool(request.get('use_cache', True)),
+                                                 timeout=request.get('timeout'))
+            finally:
+                self.running -= 1
+                watcher.cancel()
+
+            self.log(f"{name}: {'succeeded' if result.succeeded else 'failed'} in {result.elapsed:.1f}s")
+            artifact = find_artifact(build_command(profile)) if result.succeeded else None
+            tar_path = os.path.join(job_root, 'artifact.tar')
+            size = 0
+            if artifact:
+                await loop.run_in_executor(None, pack_artifact, artifact, tar_path)
+                size = os.path.getsize(tar_path)
+            try:
+                await send_message(writer, {'type': 'finished', 'result': result.to_dict(),
+                                            'status': self.status(), 'artifact_size': size})
+                if size:
+                    await send_file(writer, tar_path, size)
+            finally:
+                if os.path.exists(tar_path):
+                    os.remove(tar_path)
+
+
+def _is_loopback(host):
+    try:
+        return all(info[4][0] in ('127.0.0.1', '::1') or info[4][0].startswith('127.')
+                   for info in socket.getaddrinfo(host, None))
+    except OSError:
+        return False
+
+
+def serve(listen, token=None, slots=None, log=print):
+    """ Run a build worker on listen (host:port or a Unix socket path) until interrupted """
+    target = parse_address(listen)
+    if target[0] == 'tcp' and not token and not _is_loopback(target[1]):
+        raise ValueError(f"Refusing to accept builds on {listen} without a token "
+                         f"(pass --token or set {TOKEN_ENV})")
+    worker = BuildWorker(slots, token, log)
+
+    async def run():
+        if target[0] == 'unix':
+            if os.path.exists(target[1]):
+                os.remove(target[1]) # Left behind by a previous worker
+            server = await asyncio.start_unix_server(worker.handle, target[1], limit=MESSAGE_LIMIT)
+            os.chmod(target[1], 0o600)
+        else:
+            server = await asyncio.start_server(worker.handle, target[1], target[2], limit=MESSAGE_LIMIT)
+        log(f"Build worker listening on {listen}: {worker.slots} build slots, {usable_cores()} cores.")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
+
+
+# --- COORDINATOR ---
+
+class WorkerInfo:
+    """ A worker as the coordinator sees it """
+
+    def __init__(self, address):
+        self.address = address
+        self.status = None  # Last status reply
+        self.error = None   # Why the worker is unusable
+        self.assigned = 0   # Builds this coordinator is running on it
+        self.builds = 0
+
+    @property
+    def available(self):
+        return self.status is not None and self.error is None
+
+    def busy(self):
+        # 'running' lags behind builds that are still uploading their inputs
+        return max(self.status['running'], self.assigned)
+
+    def has_free_slot(self):
+        return self.busy() < self.status['slots']
+
+    def score(self):
+        """ Busy cores per core once one more build starts; lower is better """
+        # Load that the worker's own builds do not explain comes from other work
+        other_load = max(0.0, self.status['load'] - self.status['running'])
+        return (other_load + self.busy() + 1) / self.status['cores']
+
+    def describe(self):
+        if not self.available:
+            return f"{self.address}: unavailable ({self.error or 'not contacted'})"
+        s = self.status
+        return (f"{self.address}: {s['host']} ({s['platform']}, Python {s['python']}), {s['cores']} cores, "
+                f"{s['running']}/{s['slots']} builds running, load {s['load']:.2f}")
+
+
+class RemoteResult(BatchResult):
+    """ Outcome of one profile built on a worker """
+
+    def __init__(self, profile_path, name, log_path):
+        super().__init__(profile_path, name, log_path)
+        self.worker = None
+
+    def to_dict(self):
+        data = super().to_dict()
+        data['worker'] = self.worker
+        return data
+
+
+class Coordinator:
+    """
+    Build several profiles on a set of workers. on_progress(name, message)
+    is called for status lines, like BatchBuilder's.
+    """
+
+    def __init__(self, addresses, token=None, log_dir=REMOTE_LOG_DIR, use_cache=True,
+                 timeout=None, on_progress=None):
+        self.workers = [WorkerInfo(address) for address in addresses]
+        self.token = token
+        self.log_dir = log_dir
+        self.use_cache = use_cache
+        self.timeout = timeout
+        self.on_progress = on_progress
+        self._slot_freed = None
+
+    def _report(self, name, message):
+        if self.on_progress:
+            self.on_progress(name, message)
+
+    async def _connect(self, worker):
+        """ Open a session with a worker and refresh its status """
+        reader, writer = await open_connection(worker.address)
+        try:
+            await send_message(writer, {'type': 'hello', 'version': PROTOCOL_VERSION, 'token': self.token})
+            reply = await asyncio.wait_for(read_message(reader), CONNECT_TIMEOUT)
+            if reply.get('type') == 'error':
+                raise RemoteBuildError(reply.get('message'))
+            if reply.get('platform') != sys.platform:
+                raise RemoteBuildError(f"builds for {reply.get('platform')}, not {sys.platform}")
+        except BaseException:
+            writer.close()
+            raise
+        worker.status = reply
+        worker.error = None
+        return reader, writer
+
+    async def probe(self, worker):
+        try:
+            _, writer = await self._connect(worker)
+            writer.close()
+        except (OSError, ConnectionError, RemoteBuildError, asyncio.TimeoutError) as e:
+            worker.status = None
+            worker.error = str(e) or type(e).__name__
+
+    async def refresh(self):
+        """ Ask every worker for its status """
+        await asyncio.gather(*(self.probe(worker) for worker in self.workers))
+        return self.workers
+
+    async def _acquire(self, excluded):
+        """ Wait for a free slot on the best worker; None if no worker is left """
+        async with self._slot_freed:
+            while True:
+                usable = [w for w in self.workers if w.available and w not in excluded]
+                if not usable:
+                    return None
+                free = [w for w in usable if w.has_free_slot()]
+                if free:
+                    worker = min(free, key=WorkerInfo.score)
+                    worker.assigned += 1
+                    return worker
+                await self._slot_freed.wait()
+
+    async def _release(self, worker):
+        async with self._slot_freed:
+            worker.assigned -= 1
+            self._slot_freed.notify_all()
+
+    async def _send_blobs(self, writer, packed, digests):
+        sizes = {digest: size for digest, size in packed.files.values()}
+        for digest in digests:
+            if digest not in packed.sources:
+                raise RemoteBuildError("Worker asked for an unknown file")
+            await send_message(writer, {'type': 'blob', 'digest': digest, 'size': sizes[digest]})
+            await send_file(writer, packed.sources[digest], sizes[digest])
+
+    async def _run_on(self, worker, packed, command, name, write_log):
+        """ Build on one worker. Returns the worker's BuildResult dict """
+        loop = asyncio.get_running_loop()
+        reader, writer = await self._connect(worker)
+        try:
+            await send_message(writer, {'type': 'build', 'key': packed.key, 'name': name,
+                                        'profile': packed.profile, 'files': packed.files,
+                                        'use_cache': self.use_cache, 'timeout': self.timeout})
+            while True:
+                message = await read_message(reader)
+                kind = message.get('type')
+                if kind == 'need':
+                    write_log(f"Sending {len(message['digests'])} of {len(packed.files)} input files "
+                              f"to {worker.status['host']}...")
+                    await self._send_blobs(writer, packed, message['digests'])
+                elif kind == 'output':
+                    write_log(message.get('line', ''))
+                elif kind == 'finished':
+                    worker.status = message.get('status') or worker.status
+                    size = int(message.get('artifact_size') or 0)
+                    if size:
+                        dist_path, _ = artifact_names(command)
+                        os.makedirs(dist_path, exist_ok=True)
+                        fd, tar_path = tempfile.mkstemp(prefix='.remote-', suffix='.tar', dir=dist_path)
+                        os.close(fd)
+                        try:
+                            await receive_file(reader, tar_path, size)
+                            artifact = await loop.run_in_executor(None, unpack_artifact, tar_path, command)
+                            write_log(f"Artifact received from {worker.status['host']}: {artifact}")
+                        finally:
+                            os.remove(tar_path)
+                    return message['result']
+                elif kind == 'error':
+                    # Refused for a reason of the request, not of the worker
+                    return {'return_code': 1, 'cached': False, 'timed_out': False,
+                            'error': f"Worker refused the build: {message.get('message')}", 'elapsed': 0.0}
+                else:
+                    raise RemoteBuildError(f"Unexpected message '{kind}'")
+        finally:
+            writer.close()
+
+    def _finish_locally(self, profile, command, snapshot, return_code, write_log):
+        """ The post-build steps that belong to this machine, as complete_build runs them """
+        try:
+            record_build_result(profile, return_code)
+        except Exception as e:
+            write_log(f"Failed to update the profile library: {e}")
+        if return_code != 0:
+            return
+        try:
+            write_manifest(profile, command, snapshot)
+        except Exception as e:
+            write_log(f"Failed to write the freshness manifest: {e}")
+        if profile.get('deploy_zip'):
+            try:
+                deploy_build(BuildPlan(profile, command), write_log)
+            except Exception as e:
+                write_log(f"ZIP deployment failed: {e}")
+
+    async def build_one(self, index, profile_path, profile):
+        """ Build one profile (a Profile, or the error that prevented resolving it) on some worker """
+        loop = asyncio.get_running_loop()
+        name = profile_name(None, profile_path)
+        result = RemoteResult(profile_path, name, os.path.join(self.log_dir, f"{index:03d}_{name}.log"))
+        start_time = time.time()
+        with open(result.log_path, 'w', encoding='utf-8') as log:
+            def write_log(line):
+                log.write(line + "\n")
+
+            try:
+                if isinstance(profile, Exception):
+                    raise profile
+                profile = profile.to_dict()
+                command = build_command(profile)
+                if command is None:
+                    raise ValueError("Profile has no script_path")
+                # Snapshot before packing: anything edited later makes the profile stale
+                snapshot = await loop.run_in_executor(None, snapshot_inputs, profile)
+                packed = await loop.run_in_executor(None, pack_profile, profile)
+            except (OSError, ValueError) as e:
+                result.return_code = 1
+                result.error = str(e)
+                write_log(f"An error occurred: {result.error}")
+                self._report(name, f"failed ({result.error})")
+                return result
+
+            excluded = set()
+            outcome = None
+            while outcome is None:
+                worker = await self._acquire(excluded)
+                if worker is None:
+                    result.error = "no worker available"
+                    break
+                self._report(name, f"started on {worker.status['host']}")
+                try:
+                    outcome = await self._run_on(worker, packed, command, name, write_log)
+                    result.worker = worker.address
+                    worker.builds += 1
+                except (OSError, ConnectionError, RemoteBuildError, asyncio.TimeoutError,
+                        asyncio.IncompleteReadError) as e:
+                    # The worker went away: try the build elsewhere
+                    worker.error = str(e) or type(e).__name__
+                    excluded.add(worker)
+                    write_log(f"Worker {worker.address} failed: {worker.error}")
+                    self._report(name, f"worker {worker.address} failed, retrying")
+                finally:
+                    await self._release(worker)
+
+        if outcome is None:
+            result.return_code = 1
+        else:
+            result.return_code = outcome['return_code']
+            result.cached = outcome.get('cached', False)
+            result.error = "timed out" if outcome.get('timed_out') else (outcome.get('error') or None)
+            with open(result.log_path, 'a', encoding='utf-8') as log:
+                await loop.run_in_executor(None, self._finish_locally, profile, command, snapshot,
+                                           result.return_code, lambda line: log.write(line + "\n"))
+        result.elapsed = time.time() - start_time
+        if result.succeeded:
+            self._report(name, "cache hit" if result.cached else "succeeded")
+        else:
+            self._report(name, f"failed ({result.error or f'exit code {result.return_code}'})")
+        return result
+
+    async def _run(self, profile_paths):
+        self._slot_freed = asyncio.Condition()
+        await self.refresh()
+        if not any(worker.available for worker in self.workers):
+            raise ConnectionError("No build worker could be reached:\n" +
+                                  "\n".join(w.describe() for w in self.workers))
+        profiles = load_profiles(profile_paths)
+        return await asyncio.gather(*(self.build_one(index, path, profile) for index, (path, profile)
+                                      in enumerate(zip(profile_paths, profiles))))
+
+    def run(self, profile_paths):
+        """ Build every profile and return a summary dict like BatchBuilder.run() """
+        os.makedirs(self.log_dir, exist_ok=True)
+        start_time = time.time()
+        results = asyncio.run(self._run(list(profile_paths)))
+        return {
+            'total': len(results),
+            'succeeded': sum(1 for r in results if r.succeeded),
+            'failed': sum(1 for r in results if not r.succeeded),
+            'cached': sum(1 for r in results if r.cached),
+            'workers': sum(1 for w in self.workers if w.builds),
+            'elapsed': round(time.time() - start_time, 3),
+            'results': [r.to_dict() for r in results],
+        }
+
+
+def worker_status(addresses, token=None):
+    """ Return a WorkerInfo with a fresh status (or error) for every address """
+    return asyncio.run(Coordinator(addresses, token).refresh())
+
+
+def format_distribution(summary):
+    """ Per-worker lines to print after a distributed build's summary """
+    per_worker = {}
+    for r in summary['results']:
+        if r['worker']:
+            per_worker.setdefault(r['worker'], []).append(r)
+    lines = []
+    for address, results in sorted(per_worker.items()):
+        busy = sum(r['elapsed'] for r in results)
+        lines.append(f"  {address}: {len(results)} builds, {busy:.1f}s of build time")
+    return lines
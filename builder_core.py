@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Core
+# Description: GUI-free helpers shared by the window, the batch builder and
+#              the command line: profile (.mpb) handling, PyInstaller command
+#              construction, host resource queries and process control. Must
+#              not import Qt.
+
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import subprocess
+
+
+STATE_DIR = os.path.join(os.path.expanduser('~'), '.python_builder')
+WORK_DIR = os.path.join(STATE_DIR, 'work')
+
+PROFILE_DEFAULTS = {
+    'script_path': '',
+    'output_dir': '',
+    'icon_path': '',
+    'one_file': False,
+    'no_console': False,
+    'shutdown': False,
+    'use_cache': True,
+    'incremental': True,
+    'dedupe_data': False,
+    'use_upx': True, # PyInstaller compresses with UPX when it is installed
+    'profile_imports': False, # Measure the script's import time before building
+    'deploy_zip': False,
+    'zip_method': 'lzma',
+    'zip_level': 6,
+    'build_timeout': 0, # seconds, 0 = no limit
+    'cores': str(os.cpu_count()),
+    'nice': 0, # CPU priority of the build, 0 (normal) to 19 (lowest)
+    'io_priority': 'normal', # normal, low or idle
+    'memory_limit_mb': 0, # Memory the whole build may use, 0 = no limit
+    'product_name': '',
+    'product_version': '',
+    'file_version': '',
+    'file_description': '',
+    'copyright': '',
+    'included_files': [],
+    'included_folders': [],
+    'included_modules': [],
+    'excluded_modules': [],
+}
+
+
+def default_profile():
+    """ Return a fresh profile dict with every key set to its default """
+    profile = dict(PROFILE_DEFAULTS)
+    for key, value in profile.items():
+        if isinstance(value, list):
+            profile[key] = list(value)
+    return profile
+
+
+def load_profile_file(file_path):
+    """
+    Load a .mpb profile, resolving its base profiles and filling in defaults.
+    Raises profile_model.ProfileError (a ValueError) for invalid profiles.
+    """
+    # Imported lazily: profile_model imports this module
+    from profile_model import resolve_profile, save_cache
+    profile = resolve_profile(file_path).to_dict()
+    save_cache()
+    return profile
+
+
+def save_profile_file(file_path, profile, update=False):
+    """
+    Write a profile dict to a .mpb file. With update=True an existing file
+    keeps its own keys and base profile, and only the changed fields are
+    written over them; otherwise the file is replaced by the full profile.
+    """
+    from profile_model import profile_file_data
+    data = profile_file_data(profile, file_path if update else None)
+    tmp_path = f"{file_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, file_path)
+
+
+def profile_name(profile, file_path=None):
+    """ Human readable name for a profile, used for logs and summaries """
+    if file_path:
+        return os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.splitext(os.path.basename(profile.get('script_path', '')))[0] or 'profile'
+
+
+def build_command(profile):
+    """
+    Build the PyInstaller command list for a profile, or None if no script
+    is set. Nothing is written: prepare_build() creates the version file and
+    the staging tree the command refers to.
+    """
+    script_path = profile.get('script_path')
+    if not script_path:
+        return None
+
+    command = ['pyinstaller', '--noconfirm']
+
+    # Basic options
+    if profile.get('one_file'):
+        command.append('--onefile')
+    if profile.get('no_console'):
+        command.append('--windowed') # or --noconsole
+    if not profile.get('use_upx', True):
+        command.append('--noupx')
+
+    # Icon
+    if profile.get('icon_path'):
+        command.extend(['--icon', profile['icon_path']])
+
+    # Windows version resource (imported lazily: version_resource imports this module)
+    from version_resource import version_file_for
+    version_file = version_file_for(profile)
+    if version_file:
+        command.extend(['--version-file', version_file])
+
+    # Output directory
+    output_dir = profile.get('output_dir') or os.path.dirname(script_path)
+    command.extend(['--distpath', os.path.join(output_dir, 'dist')])
+    command.extend(['--workpath', profile_workpath(profile)])
+    command.extend(['--specpath', output_dir])
+
+    # Files, Folders, Modules
+    # Imported lazily like version_resource: data_staging imports this module
+    from data_staging import uses_staging, staging_root
+    if uses_staging(profile):
+        # One deduplicated tree with the same layout the entries below produce
+        command.extend(['--add-data', f'{staging_root(profile)}{os.pathsep}.'])
+    files = [] if uses_staging(profile) else profile.get('included_files', [])
+    folders = [] if uses_staging(profile) else profile.get('included_folders', [])
+
+    for file_path in files:
+        # Format: 'source;destination_folder'
+        # We place it in the root (.)
+        command.extend(['--add-data', f'{file_path}{os.pathsep}.'])
+
+    for folder_path in folders:
+        folder_name = os.path.basename(folder_path)
+        command.extend(['--add-data', f'{folder_path}{os.pathsep}{folder_name}'])
+
+    for module in profile.get('included_modules', []):
+        command.extend(['--hidden-import', module])
+
+    for module in profile.get('excluded_modules', []):
+        command.extend(['--exclude-module', module])
+
+    # Add the main script at the end
+    command.append(script_path)
+
+    return command
+
+
+def pyinstaller_tag(executable='pyinstaller'):
+    """ Short id of the PyInstaller installation (and so the interpreter) on PATH """
+    tool = shutil.which(executable)
+    if not tool:
+        return 'default'
+    return hashlib.sha1(os.path.realpath(tool).encode('utf-8')).hexdigest()[:10]
+
+
+def profile_id(profile):
+    """ Stable id of a profile, derived from its script and output directory """
+    script_path = profile['script_path']
+    output_dir = profile.get('output_dir') or os.path.dirname(script_path)
+    identity = f"{os.path.abspath(script_path)}|{os.path.abspath(output_dir)}"
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()[:12]
+
+
+def profile_workpath(profile):
+    """
+    Return the PyInstaller work directory for a profile. Incremental profiles
+    get a persistent directory per script, output dir and interpreter so the
+    Analysis/PYZ/PKG caches survive between builds; others use <output>/build.
+    """
+    script_path = profile['script_path']
+    output_dir = profile.get('output_dir') or os.path.dirname(script_path)
+    if not profile.get('incremental', True):
+        return os.path.join(output_dir, 'build')
+    name = os.path.splitext(os.path.basename(script_path))[0]
+    return os.path.join(WORK_DIR, f"{name}-{profile_id(profile)}-{pyinstaller_tag()}")
+
+
+def profile_inputs(profile):
+    """ Return every file that feeds into a profile's build """
+    # Imported lazily: build_cache is only needed when inputs are hashed
+    from build_cache import collect_inputs
+    return collect_inputs(
+        profile['script_path'],
+        files=profile.get('included_files', []),
+        folders=profile.get('included_folders', []),
+        icon_path=profile.get('icon_path', ''),
+    )
+
+
+# --- HOST RESOURCES ---
+
+def available_memory():
+    """ Return the available physical memory in bytes, or None if unknown """
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/meminfo', 'r') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            return None
+    elif sys.platform == 'win32':
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [
+                ('dwLength', ctypes.c_ulong),
+                ('dwMemoryLoad', ctypes.c_ulong),
+                ('ullTotalPhys', ctypes.c_ulonglong),
+                ('ullAvailPhys', ctypes.c_ulonglong),
+                ('ullTotalPageFile', ctypes.c_ulonglong),
+                ('ullAvailPageFile', ctypes.c_ulonglong),
+                ('ullTotalVirtual', ctypes.c_ulonglong),
+                ('ullAvailVirtual', ctypes.c_ulonglong),
+                ('ullAvailExtendedVirtual', ctypes.c_ulonglong),
+            ]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+    else:
+        try:
+            return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+        except (ValueError, OSError, AttributeError):
+            return None
+    return None
+
+
+def usable_cores():
+    """ Return the number of CPUs this process may run on """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# --- PROCESSES ---
+
+def process_group_kwargs():
+    """
+    Popen keyword arguments that start a build in its own process group, so
+    the build and everything it spawns can be stopped together.
+    """
+    if sys.platform == 'win32':
+        return {'creationflags': subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def kill_process_tree(pid, timeout=5.0):
+    """
+    Stop a process started with process_group_kwargs() and all of its
+    descendants: politely first, forcefully after timeout seconds.
+    """
+    if sys.platform == 'win32':
+        subprocess.run(['taskkill', '/T', '/F', '/PID', str(pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       creationflags=subprocess.CREATE_NO_WINDOW)
+        return
+
+    import signal
+    try:
+        os.killpg(pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            os.killpg(pid, 0)
+        except (ProcessLookupError, PermissionError):
+            return
+        time.sleep(0.1)
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def pid_alive(pid):
+    """ Return True if a process with this pid is running """
+    if not pid:
+        return False
+    if sys.platform == 'win32':
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        handle = ctypes.windll.kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            ctypes.windll.kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            ctypes.windll.kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Bundle Size Report
+# Description: Post-build analysis of what went into an executable. Reads the
+#              PKG (CArchive) and PYZ archives embedded in the produced
+#              executable, or walks the onedir tree, and reports the bytes
+#              shipped per package, per extension module and per data file.
+#              Reports are kept per profile so each build can be diffed
+#              against the previous one.
+
+
+import os
+import io
+import json
+import time
+import zlib
+import struct
+import marshal
+import zipfile
+
+from builder_core import STATE_DIR, profile_id
+from build_cache import artifact_names
+
+
+REPORT_DIR = os.path.join(STATE_DIR, 'reports')
+MAX_REPORTS_PER_PROFILE = 20
+
+_COOKIE_MAGIC = b'MEI\014\013\012\013\016'
+_COOKIE_FORMAT = '!8sIIII64s'
+_COOKIE_LENGTH = struct.calcsize(_COOKIE_FORMAT)
+_TOC_ENTRY_FORMAT = '!IIIIBc'
+_TOC_ENTRY_LENGTH = struct.calcsize(_TOC_ENTRY_FORMAT)
+_PYZ_MAGIC = b'PYZ\0'
+
+EXTENSION_SUFFIXES = ('.pyd', '.so')
+BINARY_SUFFIXES = ('.dll', '.dylib')
+
+
+class ArchiveError(Exception):
+    pass
+
+
+# --- ARCHIVE READERS ---
+
+def read_carchive_toc(file_path):
+    """
+    Return (start_offset, entries) for the CArchive appended to an executable.
+    entries is a list of (name, offset, stored_length, uncompressed_length, compressed, typecode).
+    """
+    with open(file_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        # The cookie sits at the end, possibly followed by a code signature
+        search_size = min(file_size, 64 * 1024)
+        f.seek(file_size - search_size)
+        tail = f.read(search_size)
+        pos = tail.rfind(_COOKIE_MAGIC)
+        if pos == -1:
+            raise ArchiveError(f"{file_path}: no PyInstaller archive found")
+        cookie_offset = file_size - search_size + pos
+        _, archive_length, toc_offset, toc_length, _, _ = struct.unpack(
+            _COOKIE_FORMAT, tail[pos:pos + _COOKIE_LENGTH])
+        start_offset = cookie_offset + _COOKIE_LENGTH - archive_length
+
+        f.seek(start_offset + toc_offset)
+        toc_data = f.read(toc_length)
+
+    entries = []
+    cur_pos = 0
+    while cur_pos < len(toc_data):
+        entry_length, offset, length, uncompressed, compressed, typecode = struct.unpack(
+            _TOC_ENTRY_FORMAT, toc_data[cur_pos:cur_pos + _TOC_ENTRY_LENGTH])
+        name = toc_data[cur_pos + _TOC_ENTRY_LENGTH:cur_pos + entry_length].rstrip(b'\0').decode('utf-8')
+        cur_pos += entry_length
+        entries.append((name, offset, length, uncompressed, bool(compressed), typecode.decode('ascii')))
+    return start_offset, entries
+
+
+def read_pyz_toc(file_path, offset):
+    """ Return {module_name: stored_length} for a PYZ archive at offset """
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        if f.read(4) != _PYZ_MAGIC:
+            raise ArchiveError(f"{file_path}: PYZ magic mismatch")
+        f.read(4) # Python magic number
+        toc_offset, = struct.unpack('!i', f.read(4))
+        f.seek(offset + toc_offset)
+        toc = marshal.load(f)
+    # (typecode, offset, length) per module; older versions store a list of pairs
+    return {name: entry[2] for name, entry in dict(toc).items()}
+
+
+def _read_entry(file_path, start_offset, entry):
+    _, offset, length, _, compressed, _ = entry
+    with open(file_path, 'rb') as f:
+        f.seek(start_offset + offset)
+        data = f.read(length)
+    return zlib.decompress(data) if compressed else data
+
+
+# --- CLASSIFICATION ---
+
+def _top_level(path):
+    """ Package a bundled file belongs to: first path component, its module name, or None """
+    parts = [p for p in path.replace('\\', '/').split('/') if p]
+    if len(parts) > 1 and parts[0].startswith('python3') and parts[1] == 'lib-dynload':
+        return parts[-1].split('.')[0]
+    if len(parts) == 1:
+        return parts[0].split('.')[0] if _classify(parts[0]) == 'extensions' else None
+    return parts[0] if parts else None
+
+
+def _classify(path):
+    lower = path.lower()
+    base = os.path.basename(lower)
+    if lower.endswith(EXTENSION_SUFFIXES) and not base.startswith('lib'):
+        return 'extensions'
+    if lower.endswith(BINARY_SUFFIXES + EXTENSION_SUFFIXES) or '.so.' in base:
+        return 'binaries'
+    return 'data'
+
+
+class BundleReport:
+    """ Sizes of everything in one build output """
+
+    def __init__(self, artifact, mode):
+        self.artifact = artifact
+        self.mode = mode
+        self.total = 0
+        self.packages = {}
+        self.items = {'modules': {}, 'extensions': {}, 'binaries': {}, 'data': {}}
+
+    def add(self, category, name, size, package=None):
+        self.items[category][name] = self.items[category].get(name, 0) + size
+        if package is None:
+            package = name.split('.')[0] if category == 'modules' else (_top_level(name) or f"<{category}>")
+        self.packages[package] = self.packages.get(package, 0) + size
+
+    def add_zip(self, zip_data):
+        """ Attribute the members of a zip (base_library.zip) to their packages """
+        with zipfile.ZipFile(zip_data) as zf:
+            for info in zf.infolist():
+                module = info.filename.rsplit('.', 1)[0].replace('/', '.')
+                if module.endswith('.__init__'):
+                    module = module[:-len('.__init__')]
+                self.add('modules', module, info.compress_size)
+
+    def to_dict(self):
+        return {
+            'artifact': self.artifact,
+            'mode': self.mode,
+            'total': self.total,
+            'created': time.time(),
+            'packages': self.packages,
+            'items': self.items,
+        }
+
+
+def _add_carchive(report, file_path):
+    start_offset, entries = read_carchive_toc(file_path)
+    for entry in entries:
+        name, offset, length, _, _, typecode = entry
+        if typecode == 'z':
+            for module, size in read_pyz_toc(file_path, start_offset + offset).items():
+                report.add('modules', module, size)
+        elif typecode in ('m', 'M', 's'):
+            report.add('modules', name, length, package='<scripts>' if typecode == 's' else None)
+        elif typecode == 'b':
+            report.add(_classify(name), name, length)
+        elif typecode in ('x', 'Z'):
+            if name.endswith('base_library.zip'):
+                report.add_zip(io.BytesIO(_read_entry(file_path, start_offset, entry)))
+            else:
+                report.add('data', name, length)
+        elif typecode == 'l':
+            report.add('data', name, length, package='<splash>')
+
+
+def analyze_artifact(path):
+    """ Build a BundleReport for a onefile executable or a onedir folder """
+    if os.path.isfile(path):
+        report = BundleReport(path, 'onefile')
+        report.total = os.path.getsize(path)
+        _add_carchive(report, path)
+        return report
+
+    report = BundleReport(path, 'onedir')
+    executable = None
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            full_path = os.path.join(dirpath, filename)
+            rel_path = os.path.relpath(full_path, path).replace(os.sep, '/')
+            size = os.path.getsize(full_path)
+            report.total += size
+            if os.path.dirname(full_path) == path and executable is None:
+                try:
+                    read_carchive_toc(full_path)
+                    executable = full_path
+                    continue
+                except (ArchiveError, OSError, struct.error):
+                    pass
+            internal = rel_path[len('_internal/'):] if rel_path.startswith('_internal/') else rel_path
+            if filename == 'base_library.zip':
+                report.add_zip(full_path)
+            else:
+                report.add(_classify(internal), internal, size)
+
+    if executable:
+        # Scripts and the PYZ live in the executable; count the bootloader apart
+        before = sum(report.packages.values())
+        _add_carchive(report, executable)
+        embedded = sum(report.packages.values()) - before
+        report.packages['<bootloader>'] = max(0, os.path.getsize(executable) - embedded)
+    return report
+
+
+def find_artifact(command):
+    """ Return the onefile executable or onedir folder produced by a command, or None """
+    dist_path, name = artifact_names(command)
+    for candidate in (name + '.exe', name, name + '.app'):
+        path = os.path.join(dist_path, candidate)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# --- HISTORY AND DIFF ---
+
+def _profile_report_dir(profile):
+    return os.path.join(REPORT_DIR, profile_id(profile))
+
+
+def load_previous_report(profile):
+    report_dir = _profile_report_dir(profile)
+    try:
+        names = sorted(n for n in os.listdir(report_dir) if n.endswith('.json'))
+    except OSError:
+        return None
+    if not names:
+        return None
+    with open(os.path.join(report_dir, names[-1]), 'r') as f:
+        return json.load(f)
+
+
+def save_report(profile, report_dict):
+    report_dir = _profile_report_dir(profile)
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, f"{int(report_dict['created'] * 1000)}.json")
+    with open(path, 'w') as f:
+        json.dump(report_dict, f)
+    names = sorted(n for n in os.listdir(report_dir) if n.endswith('.json'))
+    for old in names[:-MAX_REPORTS_PER_PROFILE]:
+        os.remove(os.path.join(report_dir, old))
+    return path
+
+
+def diff_sizes(old, new):
+    """ Return [(name, old_size, new_size)] for every entry whose size changed, largest change first """
+    changes = []
+    for name in set(old) | set(new):
+        before, after = old.get(name, 0), new.get(name, 0)
+        if before != after:
+            changes.append((name, before, after))
+    changes.sort(key=lambda c: abs(c[2] - c[1]), reverse=True)
+    return changes
+
+
+def format_size(num_bytes):
+    sign = '-' if num_bytes < 0 else ''
+    num_bytes = abs(num_bytes)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num_bytes < 1024 or unit == 'GB':
+            return f"{sign}{num_bytes:.0f} {unit}" if unit == 'B' else f"{sign}{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
+
+def format_report(report_dict, previous=None, top=15):
+    """ Render a report (and its diff against previous) as plain text lines """
+    lines = [f"Bundle size: {format_size(report_dict['total'])} ({report_dict['mode']})"]
+    if previous:
+        delta = report_dict['total'] - previous['total']
+        lines[0] += f", {'+' if delta >= 0 else ''}{format_size(delta)} since previous build"
+
+    lines.append("Largest packages:")
+    packages = sorted(report_dict['packages'].items(), key=lambda p: p[1], reverse=True)
+    for name, size in packages[:top]:
+        lines.append(f"  {format_size(size):>10}  {name}")
+
+    for category in ('extensions', 'data'):
+        items = sorted(report_dict['items'][category].items(), key=lambda p: p[1], reverse=True)
+        if items:
+            lines.append(f"Largest {category}:")
+            for name, size in items[:top]:
+                lines.append(f"  {format_size(size):>10}  {name}")
+
+    if previous:
+        changes = diff_sizes(previous['packages'], report_dict['packages'])
+        if changes:
+            lines.append("Changed since previous build:")
+            for name, before, after in changes[:top]:
+                tag = 'added' if not before else ('removed' if not after else '')
+                delta = after - before
+                lines.append(f"  {'+' if delta >= 0 else ''}{format_size(delta):>10}  {name} {tag}".rstrip())
+    return lines
+
+
+def report_build(profile, command):
+    """ Analyze the output of a finished build, store it and return (report, previous) dicts """
+    artifact = find_artifact(command)
+    if artifact is None:
+        return None, None
+    report = analyze_artifact(artifact).to_dict()
+    previous = load_previous_report(profile)
+    save_report(profile, report)
+    return report, previous
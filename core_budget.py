@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Core Budget
+# Description: One pool of CPU cores shared by everything a builder process
+#              runs at the same time. Every running PyInstaller holds one
+#              core, and the thread pools of the pre- and post-build stages
+#              (hashing, staging, compression, import analysis) are sized to
+#              the cores they could take, up to the profile's "cores" setting.
+#              Concurrent builds therefore share the machine instead of each
+#              assuming they have all of it.
+
+
+import os
+import asyncio
+import threading
+import contextlib
+import contextvars
+from collections import deque
+
+from builder_core import usable_cores
+
+
+CORES_ENV = 'PYTHON_BUILDER_CORES'
+
+# Cores held by the stage running in the current thread or task
+_allowance = contextvars.ContextVar('python_builder_cores', default=None)
+# Most cores a stage may take while a profile's steps run (its "cores" setting)
+_limit = contextvars.ContextVar('python_builder_core_limit', default=None)
+
+
+def default_total():
+    """ The budget size: $PYTHON_BUILDER_CORES, or the cores this process may use """
+    try:
+        return max(1, int(os.environ[CORES_ENV]))
+    except (KeyError, ValueError):
+        return usable_cores()
+
+
+class _Waiter:
+
+    def __init__(self, minimum, maximum, loop=None):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.granted = 0
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(self.granted)
+
+
+class CoreBudget:
+    """
+    A counted pool of cores. Requests are served in arrival order; a request
+    for up to n cores with a smaller minimum is granted as soon as the
+    minimum is free, and takes whatever else is free up to n. Safe to use
+    from any thread and from asyncio tasks.
+    """
+
+    def __init__(self, total=None):
+        self.total = max(1, int(total or default_total()))
+        self.in_use = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return max(0, self.total - self.in_use)
+
+    def _clamp(self, cores, minimum):
+        cores = max(1, min(int(cores or self.total), self.total))
+        minimum = cores if minimum is None else max(1, min(int(minimum), cores))
+        return cores, minimum
+
+    def _grant(self):
+        # Called with the lock held. Strict FIFO: a large request at the head
+        # is not overtaken by smaller ones, so it cannot starve.
+        while self._waiters and self.available >= self._waiters[0].minimum:
+            waiter = self._waiters.popleft()
+            waiter.granted = min(waiter.maximum, self.available)
+            self.in_use += waiter.granted
+            waiter.wake()
+
+    def _enqueue(self, cores, minimum, loop=None):
+        cores, minimum = self._clamp(cores, minimum)
+        waiter = _Waiter(minimum, cores, loop)
+        with self._lock:
+            self._waiters.append(waiter)
+            self._grant()
+        return waiter
+
+    def acquire(self, cores=None, minimum=None):
+        """
+        Block until at least minimum cores (default: all of cores) are free.
+        Returns the number of cores taken; hand them back with release().
+        """
+        waiter = self._enqueue(cores, minimum)
+        waiter.event.wait()
+        return waiter.granted
+
+    async def acquire_async(self, cores=None, minimum=None):
+        """ acquire() for asyncio tasks; cancelling the wait takes nothing """
+        waiter = self._enqueue(cores, minimum, asyncio.get_running_loop())
+        try:
+            return await asyncio.shield(waiter.future)
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    granted = 0
+                else:
+                    granted = waiter.granted
+            if granted:
+                self.release(granted)
+            raise
+
+    def release(self, cores):
+        with self._lock:
+            self.in_use = max(0, self.in_use - cores)
+            self._grant()
+
+    def resize(self, total):
+        """ Change the budget; cores already handed out are not taken back """
+        with self._lock:
+            self.total = max(1, int(total))
+            for waiter in self._waiters:
+                waiter.maximum = min(waiter.maximum, self.total)
+                waiter.minimum = min(waiter.minimum, self.total)
+            self._grant()
+
+
+_default_budget = None
+_default_lock = threading.Lock()
+
+
+def default_budget():
+    """ The process-wide budget every build and stage draws from """
+    global _default_budget
+    with _default_lock:
+        if _default_budget is None:
+            _default_budget = CoreBudget()
+        return _default_budget
+
+
+def profile_cores(profile):
+    """ The cores a profile's stages may use, within the budget """
+    total = default_budget().total
+    try:
+        cores = int(profile.get('cores') or total)
+    except (TypeError, ValueError):
+        cores = total
+    return max(1, min(cores, total))
+
+
+@contextlib.contextmanager
+def core_limit(cores):
+    """ Cap the stages started in this context (thread or task) at cores """
+    token = _limit.set(max(1, int(cores)))
+    try:
+        yield
+    finally:
+        _limit.reset(token)
+
+
+@contextlib.contextmanager
+def stage_threads(cores=None):
+    """
+    Reserve cores for a parallel stage and yield how many threads it should
+    start. cores defaults to the whole budget, and is capped by core_limit().
+    The stage starts as soon as one core is free and takes what else is free
+    up to cores. A pool nested in a stage that already holds cores shares
+    that allowance instead of asking the budget again.
+    """
+    limit = _limit.get()
+    if limit is not None:
+        cores = min(cores or limit, limit)
+    active = _allowance.get()
+    if active is not None:
+        yield max(1, min(cores or active, active))
+        return
+    budget = default_budget()
+    granted = budget.acquire(cores, minimum=1)
+    token = _allowance.set(granted)
+    try:
+        yield granted
+    finally:
+        _allowance.reset(token)
+        budget.release(granted)
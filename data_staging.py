@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Data Staging
+# Description: Builds one staging tree for a profile's included files and
+#              folders and hands it to PyInstaller as a single --add-data.
+#              Files are hardlinked (or reflinked, or copied as a last resort)
+#              from their sources, so staging costs no data I/O. Files with
+#              identical content are stored once: the duplicates become
+#              relative symlinks, which PyInstaller 6 keeps as symlinks in
+#              both onedir and onefile bundles. The tree is updated in place,
+#              so unchanged data is not restaged on the next build.
+
+
+import os
+import sys
+import json
+import time
+import shutil
+
+from builder_core import STATE_DIR, profile_id
+from hash_engine import default_engine, walk_files
+
+
+STAGING_DIR = os.path.join(STATE_DIR, 'staging')
+STAGING_MANIFEST = 'staging.json'
+STAGING_VERSION = 1
+
+# Linux FICLONE ioctl: copy-on-write clone on btrfs, XFS and similar
+FICLONE = 0x40049409
+
+# Windows needs a privilege for symlinks: duplicates stay hardlinked there
+USE_SYMLINKS = sys.platform != 'win32'
+
+
+def staging_root(profile):
+    """ The tree passed to PyInstaller; its manifest lives next to it, not inside """
+    return os.path.join(STAGING_DIR, profile_id(profile), 'data')
+
+
+def uses_staging(profile):
+    return bool(profile.get('dedupe_data') and (profile.get('included_files') or profile.get('included_folders')))
+
+
+def data_entries(profile):
+    """
+    Return [(source, destination)] for every included data file, with the
+    destination relative to the bundle root (files at the top level,
+    folders under their own name), as plain --add-data would place them.
+    """
+    entries = []
+    for file_path in profile.get('included_files', []):
+        entries.append((os.path.abspath(file_path), os.path.basename(file_path)))
+    for folder_path in profile.get('included_folders', []):
+        folder_path = os.path.abspath(folder_path)
+        name = os.path.basename(folder_path.rstrip('/\\'))
+        for path, _ in walk_files(folder_path):
+            entries.append((path, os.path.join(name, os.path.relpath(path, folder_path))))
+    return entries
+
+
+def _reflink(src, dst):
+    import fcntl
+    with open(src, 'rb') as source, open(dst, 'wb') as target:
+        try:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        except OSError:
+            target.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def _link_file(src, dst):
+    """ Place src at dst as cheaply as possible; return 'hardlink', 'reflink' or 'copy' """
+    try:
+        os.link(src, dst)
+        return 'hardlink'
+    except OSError:
+        pass
+    if sys.platform.startswith('linux'):
+        try:
+            _reflink(src, dst)
+            return 'reflink'
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+    return 'copy'
+
+
+def _remove(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def plan_staging(entries, engine=None):
+    """
+    Decide how each destination is staged. Returns (plan, conflicts, total)
+    where plan maps destination -> [kind, source, size, mtime_ns, target];
+    kind is 'file' or 'duplicate' (target is the destination holding the
+    same content). conflicts lists destinations claimed by several sources.
+    """
+    engine = engine or default_engine()
+    stats = {}
+    for source, _ in entries:
+        if source not in stats:
+            try:
+                stats[source] = os.stat(source)
+            except OSError:
+                stats[source] = None
+    missing = [source for source, st in stats.items() if st is None]
+    if missing:
+        raise FileNotFoundError(f"Included data not found: {missing[0]}")
+    digests = engine.hash_files([(source, st) for source, st in stats.items()])
+    engine.save()
+
+    plan = {}
+    conflicts = []
+    first_by_digest = {}
+    total = 0
+    # Sorted so the same content always lands on the same destination
+    for source, destination in sorted(entries, key=lambda e: e[1]):
+        if destination in plan:
+            if plan[destination][1] != source:
+                conflicts.append(destination)
+            continue
+        st = stats[source]
+        total += st.st_size
+        digest = digests[source]
+        original = first_by_digest.setdefault(digest, destination)
+        if original == destination or st.st_size == 0:
+            plan[destination] = ['file', source, st.st_size, st.st_mtime_ns, None]
+        else:
+            plan[destination] = ['duplicate', source, st.st_size, st.st_mtime_ns, original]
+    return plan, conflicts, total
+
+
+def stage_data(profile):
+    """
+    Bring the staging tree of a profile up to date and return a report dict
+    (files, bytes, duplicates, duplicate_bytes, linked, copied, copied_bytes,
+    restaged, conflicts, elapsed).
+    """
+    start_time = time.time()
+    root = staging_root(profile)
+    plan, conflicts, total = plan_staging(data_entries(profile))
+
+    manifest_path = os.path.join(os.path.dirname(root), STAGING_MANIFEST)
+    try:
+        with open(manifest_path, 'r') as f:
+            previous = json.load(f)
+        if previous.get('version') != STAGING_VERSION:
+            previous = {}
+    except (OSError, ValueError):
+        previous = {}
+    staged = previous.get('entries', {})
+
+    report = {'files': len(plan), 'bytes': total, 'duplicates': 0, 'duplicate_bytes': 0,
+              'linked': 0, 'copied': 0, 'copied_bytes': 0, 'restaged': 0, 'conflicts': conflicts}
+
+    # Drop whatever is no longer wanted, or is staged differently now
+    for destination, entry in staged.items():
+        if plan.get(destination) != entry:
+            _remove(os.path.join(root, destination))
+
+    for destination, entry in plan.items():
+        kind, source, size, _, target = entry
+        if kind == 'duplicate':
+            report['duplicates'] += 1
+            report['duplicate_bytes'] += size
+        path = os.path.join(root, destination)
+        if staged.get(destination) == entry and os.path.lexists(path):
+            continue
+        report['restaged'] += 1
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _remove(path)
+        if kind == 'duplicate' and USE_SYMLINKS:
+            os.symlink(os.path.relpath(os.path.join(root, target), os.path.dirname(path)), path)
+            continue
+        method = _link_file(source, path)
+        if method == 'copy':
+            report['copied'] += 1
+            report['copied_bytes'] += size
+        else:
+            report['linked'] += 1
+
+    # Folders emptied by removals
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        if dirpath != root and not dirnames and not filenames:
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+
+    os.makedirs(root, exist_ok=True)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': STAGING_VERSION, 'entries': plan}, f)
+    os.replace(tmp_path, manifest_path)
+    report['elapsed'] = time.time() - start_time
+    return report
+
+
+def format_staging_report(report):
+    """ Render a staging report as log lines """
+    # Imported here: bundle_report pulls in the build cache
+    from bundle_report import format_size
+    lines = [f"Staged {report['files']} data files ({format_size(report['bytes'])}) in "
+             f"{report['elapsed']:.1f}s: {report['restaged']} updated, {report['linked']} linked, "
+             f"{format_size(report['copied_bytes'])} copied."]
+    if report['duplicates'] and USE_SYMLINKS:
+        lines.append(f"{report['duplicates']} duplicate files stored once, saving "
+                     f"{format_size(report['duplicate_bytes'])} in the bundle.")
+    elif report['duplicates']:
+        lines.append(f"{report['duplicates']} duplicate files ({format_size(report['duplicate_bytes'])}) "
+                     "hardlinked; Windows bundles still contain every copy.")
+    for destination in report['conflicts']:
+        lines.append(f"Warning: several included files map to {destination}; the first one is used.")
+    return lines
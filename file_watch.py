@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - File Watcher
+# Description: Watches the inputs of a profile (script, local imports,
+#              included files and folders, icon) and reports when they change.
+#              On Linux the folders holding them are watched with inotify
+#              (through ctypes, no extra package); elsewhere the files are
+#              polled. A burst of saves is coalesced into one change report,
+#              and the first event of a burst is reported right away so a
+#              running build can be stopped before the burst settles.
+
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import asyncio
+import threading
+
+from import_graph import find_local_imports
+from hash_engine import walk_files
+
+
+# A burst of saves is over once nothing changed for this long
+DEBOUNCE_SECONDS = 0.4
+# Report changes even if saves never stop for DEBOUNCE_SECONDS
+MAX_SETTLE_SECONDS = 5.0
+POLL_INTERVAL = 1.0
+# Names of changed files listed before the rest are counted
+MAX_LISTED_CHANGES = 5
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+# Editors often save by writing a new file and renaming it over the old one,
+# so folders are watched rather than the files themselves
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT = struct.Struct('iIII')
+
+
+def watch_targets(profile, extra_files=()):
+    """
+    Return (files, folders) to watch for a profile: absolute paths of single
+    files (script, local imports, included files, icon and extra_files) and
+    of included folders, whose whole tree is watched.
+    """
+    script_path = os.path.abspath(profile['script_path'])
+    files = {script_path}
+    try:
+        files.update(find_local_imports(script_path))
+    except (OSError, SyntaxError, ValueError):
+        pass # Half-saved script: watch it alone until it parses again
+    files.update(os.path.abspath(path) for path in profile.get('included_files', []))
+    if profile.get('icon_path'):
+        files.add(os.path.abspath(profile['icon_path']))
+    files.update(os.path.abspath(path) for path in extra_files)
+    folders = {os.path.abspath(path) for path in profile.get('included_folders', [])}
+    return sorted(files), sorted(folders)
+
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    import ctypes
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class InotifyBackend:
+    """ Folder watches through the inotify system calls """
+
+    name = 'inotify'
+
+    def __init__(self, libc):
+        import ctypes
+        self._ctypes = ctypes
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1 failed: {os.strerror(error)}")
+        self._wake_read, self._wake_write = os.pipe()
+        self._watches = {}   # wd -> folder
+        self._folders = {}   # folder -> wd
+        self._names = {}     # folder -> names of watched files in it
+        self._trees = set()  # Roots of watched folder trees
+        self._tree_dirs = set()
+
+    def _add_watch(self, folder):
+        if folder in self._folders:
+            return True
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+        if wd < 0:
+            error = self._ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(error, "inotify watch limit reached (raise fs.inotify.max_user_watches)")
+            return False # Missing or not a folder: reported as changed when it appears
+        self._watches[wd] = folder
+        self._folders[folder] = wd
+        return True
+
+    def _add_tree(self, root):
+        for dirpath, _, _ in os.walk(root):
+            self._tree_dirs.add(dirpath)
+            self._add_watch(dirpath)
+
+    def watch(self, files, folders):
+        """ Watch exactly these files and folder trees from now on """
+        names = {}
+        for path in files:
+            folder, name = os.path.split(path)
+            names.setdefault(folder, set()).add(name)
+        self._names = names
+        self._trees = set(folders)
+        self._tree_dirs = set()
+        for folder in names:
+            self._add_watch(folder)
+        for root in folders:
+            self._add_watch(os.path.dirname(root)) # Sees the root itself being replaced
+            self._add_tree(root)
+        wanted = set(names) | self._tree_dirs | {os.path.dirname(root) for root in folders}
+        for folder in [f for f in self._folders if f not in wanted]:
+            self._libc.inotify_rm_watch(self.fd, self._folders.pop(folder))
+
+    def _in_tree(self, path):
+        return any(path == root or path.startswith(root + os.sep) for root in self._trees)
+
+    def read(self, timeout):
+        """ Wait up to timeout seconds; return the set of changed paths """
+        try:
+            ready, _, _ = select.select([self.fd, self._wake_read], [], [], timeout)
+        except InterruptedError:
+            return set()
+        if self._wake_read in ready:
+            os.read(self._wake_read, 4096)
+        if self.fd not in ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: treat everything watched as changed
+                changed.update(os.path.join(folder, file_name) for folder, names in self._names.items()
+                               for file_name in names)
+                changed.update(self._trees)
+                continue
+            folder = self._watches.get(wd)
+            if folder is None:
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                if self._folders.get(folder) == wd:
+                    del self._folders[folder]
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                if folder in self._tree_dirs:
+                    changed.add(folder)
+                continue
+            path = os.path.join(folder, os.fsdecode(name))
+            if self._in_tree(path):
+                changed.add(path)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path) # New subfolder of an included folder
+            elif name and os.fsdecode(name) in self._names.get(folder, ()):
+                changed.add(path)
+        return changed
+
+    def wake(self):
+        os.write(self._wake_write, b'x')
+
+    def close(self):
+        for fd in (self.fd, self._wake_read, self._wake_write):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class PollingBackend:
+    """ Compares the size, mtime and inode of every watched file on a timer """
+
+    name = 'polling'
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self._files = []
+        self._folders = []
+        self._snapshot = {}
+        self._wake_event = threading.Event()
+
+    def _scan(self):
+        snapshot = {}
+        for path in self._files:
+            try:
+                st = os.stat(path)
+                snapshot[path] = (st.st_size, st.st_mtime_ns, st.st_ino)
+            except OSError:
+                pass
+        for folder in self._folders:
+            for path, st in walk_files(folder):
+                snapshot[path] = (st.st_size, st.st_mtime_ns, st.st_ino)
+        return snapshot
+
+    def watch(self, files, folders):
+        self._files = list(files)
+        self._folders = list(folders)
+        self._snapshot = self._scan()
+
+    def read(self, timeout):
+        if self._wake_event.wait(min(timeout, self.interval)):
+            self._wake_event.clear()
+            return set()
+        snapshot = self._scan()
+        changed = {path for path in snapshot.keys() | self._snapshot.keys()
+                   if snapshot.get(path) != self._snapshot.get(path)}
+        self._snapshot = snapshot
+        return changed
+
+    def wake(self):
+        self._wake_event.set()
+
+    def close(self):
+        pass
+
+
+def create_backend(polling=False):
+    """ inotify where available, polling otherwise """
+    libc = None if polling else _load_libc()
+    if libc is not None:
+        try:
+            return InotifyBackend(libc)
+        except OSError:
+            pass # Out of inotify instances
+    return PollingBackend()
+
+
+class ProfileWatcher:
+    """
+    Watches the inputs of a profile. next_changes() blocks until they change
+    and returns the changed paths once the burst of saves has settled.
+    set_profile() and stop() may be called from any thread.
+    """
+
+    def __init__(self, profile, extra_files=(), debounce=DEBOUNCE_SECONDS, polling=False):
+        self.extra_files = list(extra_files)
+        self.debounce = debounce
+        self.backend = create_backend(polling)
+        self.files = []
+        self.folders = []
+        self._pending_profile = None
+        self._lock = threading.Lock()
+        self._busy = threading.Lock() # Held while next_changes() reads the backend
+        self._stop_event = threading.Event()
+        self._apply(profile)
+
+    def _apply(self, profile):
+        self.files, self.folders = watch_targets(profile, self.extra_files)
+        self.backend.watch(self.files, self.folders)
+
+    def set_profile(self, profile):
+        """ Follow a changed profile (or new local imports) from the next wait on """
+        with self._lock:
+            self._pending_profile = dict(profile)
+        self.backend.wake()
+
+    def _refresh(self):
+        with self._lock:
+            profile, self._pending_profile = self._pending_profile, None
+        if profile is not None:
+            self._apply(profile)
+
+    def next_changes(self, on_first=None):
+        """
+        Block until watched files change and return their sorted paths, or
+        None once stop() was called. on_first(paths) is called as soon as the
+        first change is seen, before waiting for the burst to settle.
+        """
+        with self._busy:
+            return self._next_changes(on_first)
+
+    def _next_changes(self, on_first):
+        changed = set()
+        while not changed:
+            if self._stop_event.is_set():
+                return None
+            self._refresh()
+            changed = self.backend.read(POLL_INTERVAL)
+        if on_first:
+            on_first(sorted(changed))
+
+        started = time.monotonic()
+        while time.monotonic() - started < MAX_SETTLE_SECONDS:
+            if self._stop_event.is_set():
+                return None
+            more = self.backend.read(self.debounce)
+            if not more:
+                break
+            changed.update(more)
+        return sorted(changed)
+
+    def stop(self):
+        self._stop_event.set()
+        self.backend.wake()
+
+    def close(self):
+        """ Stop and release the watches once a pending next_changes() returned """
+        self.stop()
+        with self._busy:
+            self.backend.close()
+
+
+def describe_changes(paths):
+    """ One line naming the changed files """
+    shown = [os.path.basename(path) for path in paths[:MAX_LISTED_CHANGES]]
+    more = len(paths) - len(shown)
+    return ', '.join(shown) + (f" and {more} more" if more > 0 else '')
+
+
+# --- WATCH BUILDS ---
+
+async def _watch_builds(load_profile, profile_path, on_line, on_status, polling):
+    # Imported lazily: the GUI watches files but builds through its queue
+    from build_engine import BuildEngine
+
+    loop = asyncio.get_running_loop()
+    engine = BuildEngine()
+    profile = load_profile()
+    watcher = ProfileWatcher(profile, extra_files=[profile_path] if profile_path else (), polling=polling)
+    on_status(f"Watching {len(watcher.files)} files and {len(watcher.folders)} folders "
+              f"({watcher.backend.name}). Press Ctrl+C to stop.")
+
+    builds = 0
+    current = {}
+
+    def start(profile):
+        nonlocal builds
+        builds += 1
+        key = f"watch-{builds}"
+        task = loop.create_task(engine.build(key, profile, on_line))
+        current.update(key=key, task=task)
+
+        def done(task):
+            if task.cancelled() or task.exception():
+                return
+            result = task.result()
+            if result.cancelled:
+                on_status("Build cancelled.")
+            elif result.succeeded:
+                on_status(f"Build succeeded ({result.elapsed:.1f}s){' from cache' if result.cached else ''}. "
+                          "Waiting for changes...")
+            else:
+                on_status(f"Build failed{': ' + result.error if result.error else ''}. Waiting for changes...")
+        task.add_done_callback(done)
+
+    def stop_running(paths):
+        task = current.get('task')
+        if task and not task.done():
+            engine.cancel(current['key'])
+
+    start(profile)
+    try:
+        while True:
+            changes = await loop.run_in_executor(None, watcher.next_changes, stop_running)
+            if changes is None:
+                break
+            on_status(f"Changed: {describe_changes(changes)}")
+            task = current.get('task')
+            if task and not task.done():
+                stop_running(changes)
+                await task
+            if profile_path and os.path.abspath(profile_path) in changes:
+                try:
+                    profile = load_profile()
+                    on_status("Profile reloaded.")
+                except (OSError, ValueError) as e:
+                    on_status(f"Keeping the previous profile: {e}")
+            watcher.set_profile(profile)
+            start(profile)
+    finally:
+        task = current.get('task')
+        if task and not task.done():
+            task.cancel()
+        watcher.close()
+
+
+def watch_builds(load_profile, profile_path=None, on_line=print, on_status=print, polling=False):
+    """
+    Build a profile, then rebuild it whenever its inputs change until
+    interrupted. A build still running when new changes arrive is stopped.
+    load_profile() returns the profile and is called again when the file at
+    profile_path changes.
+    """
+    asyncio.run(_watch_builds(load_profile, profile_path, on_line, on_status, polling))
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Freshness
+# Description: Decides which profiles need rebuilding. Every successful build
+#              leaves a manifest with the size, mtime and SHA-256 of each of
+#              its inputs (script, local imports, included files and folders,
+#              icon). A check stats those inputs in parallel and only hashes
+#              the files whose mtime or size moved, so unchanged profiles are
+#              recognised without reading their contents.
+
+
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from builder_core import STATE_DIR, build_command, profile_id, profile_inputs, pyinstaller_tag
+from bundle_report import find_artifact
+from hash_engine import default_engine, walk_files
+from core_budget import stage_threads
+
+
+MANIFEST_DIR = os.path.join(STATE_DIR, 'manifests')
+MANIFEST_VERSION = 1
+
+# Changed inputs listed per stale profile before the rest are summarized
+MAX_LISTED_CHANGES = 5
+
+
+def _manifest_path(profile):
+    return os.path.join(MANIFEST_DIR, f"{profile_id(profile)}.json")
+
+
+def load_manifest(profile):
+    try:
+        with open(_manifest_path(profile), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+
+def _stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _hash(path):
+    try:
+        return default_engine().hash_file(path)
+    except OSError:
+        return None
+
+
+def snapshot_inputs(profile, executor=None):
+    """ Return {path: (size, mtime_ns)} of a profile's inputs, taken before a build """
+    if executor is None:
+        with stage_threads() as threads, ThreadPoolExecutor(max_workers=threads) as executor:
+            return snapshot_inputs(profile, executor)
+    paths = profile_inputs(profile)
+    return dict(zip(paths, executor.map(_stat, paths)))
+
+
+def write_manifest(profile, command, snapshot, executor=None):
+    """
+    Record the inputs a successful build was made from. snapshot comes from
+    snapshot_inputs() before the build; a file modified since then gets no
+    digest, so the next check treats it as changed.
+    """
+    if executor is None:
+        with stage_threads() as threads, ThreadPoolExecutor(max_workers=threads) as executor:
+            return write_manifest(profile, command, snapshot, executor)
+    previous = (load_manifest(profile) or {}).get('inputs', {})
+    paths = sorted(snapshot)
+    stats = list(executor.map(_stat, paths))
+
+    inputs = {}
+    to_hash = []
+    for path, before, now in zip(paths, (snapshot[p] for p in paths), stats):
+        if now is None or tuple(now) != tuple(before or ()):
+            inputs[path] = [before[0] if before else -1, before[1] if before else -1, None]
+            continue
+        old = previous.get(path)
+        if old and old[2] and (old[0], old[1]) == tuple(now):
+            inputs[path] = [now[0], now[1], old[2]]
+        else:
+            inputs[path] = [now[0], now[1], None]
+            to_hash.append(path)
+    for path, digest in zip(to_hash, executor.map(_hash, to_hash)):
+        inputs[path][2] = digest
+    default_engine().save()
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'created': time.time(),
+        'command': command,
+        'tool': pyinstaller_tag(),
+        'folders': [os.path.abspath(f) for f in profile.get('included_folders', [])],
+        'inputs': inputs,
+    }
+    path = _manifest_path(profile)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def _list_folder(folder):
+    return {os.path.abspath(path) for path, _ in walk_files(folder)}
+
+
+class Freshness:
+    """ Outcome of checking one profile """
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+        self.reason = None   # Why the profile is stale, or None when fresh
+        self.changed = []    # Inputs that were modified, added or removed
+
+    @property
+    def stale(self):
+        return self.reason is not None
+
+    def describe(self):
+        if not self.stale:
+            return "up to date"
+        if not self.changed:
+            return self.reason
+        shown = [os.path.basename(p) for p in self.changed[:MAX_LISTED_CHANGES]]
+        more = len(self.changed) - len(shown)
+        return f"{self.reason}: {', '.join(shown)}" + (f" and {more} more" if more > 0 else '')
+
+
+def check_profiles(profiles, workers=None):
+    """
+    Check several (name, profile) pairs and return a Freshness for each.
+    All stats, then all hashes, run together on one thread pool of up to
+    workers threads (default: the whole core budget).
+    """
+    results = [Freshness(profile, name) for name, profile in profiles]
+    with stage_threads(workers) as threads, ThreadPoolExecutor(max_workers=threads) as executor:
+        manifests = list(executor.map(lambda r: load_manifest(r.profile), results))
+
+        # Cheap checks first: anything that needs no input stat
+        pending = []
+        for result, manifest in zip(results, manifests):
+            command = build_command(result.profile)
+            if command is None:
+                result.reason = "profile has no script"
+            elif manifest is None:
+                result.reason = "no successful build recorded"
+            elif manifest['command'] != command or manifest['tool'] != pyinstaller_tag():
+                result.reason = "build options or PyInstaller changed"
+            elif find_artifact(command) is None:
+                result.reason = "build output missing"
+            else:
+                pending.append((result, manifest))
+
+        # Stat every recorded input; only mtime/size mismatches get hashed
+        stat_jobs = [(result, path, entry) for result, manifest in pending
+                     for path, entry in manifest['inputs'].items()]
+        stats = executor.map(lambda job: _stat(job[1]), stat_jobs)
+        hash_jobs = []
+        for (result, path, entry), stat in zip(stat_jobs, stats):
+            if stat is None:
+                result.changed.append(path)
+            elif tuple(stat) != (entry[0], entry[1]) or entry[2] is None:
+                hash_jobs.append((result, path, entry))
+        digests = executor.map(lambda job: _hash(job[1]), hash_jobs)
+        for (result, path, entry), digest in zip(hash_jobs, digests):
+            if digest is None or digest != entry[2]:
+                result.changed.append(path)
+
+        # Files added to included folders since the build
+        folder_jobs = [(result, manifest, folder) for result, manifest in pending
+                       if not result.changed for folder in manifest['folders']]
+        listings = executor.map(lambda job: _list_folder(job[2]), folder_jobs)
+        for (result, manifest, folder), files in zip(folder_jobs, listings):
+            result.changed.extend(sorted(files.difference(manifest['inputs'])))
+    default_engine().save()
+
+    for result, _ in pending:
+        if result.changed:
+            result.changed.sort()
+            result.reason = f"{len(result.changed)} input(s) changed"
+    return results
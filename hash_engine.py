@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Hash Engine
+# Description: Content hashing for build inputs, included folders and
+#              deployment staging. Folders are walked with os.scandir, large
+#              files are hashed through memory-mapped reads on a thread pool
+#              (hashlib releases the GIL while digesting), and digests are
+#              remembered per (path, size, mtime, inode) so unchanged files
+#              are never read twice, even across runs.
+
+
+import os
+import mmap
+import stat
+import time
+import marshal
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from builder_core import STATE_DIR, usable_cores
+from core_budget import stage_threads
+
+
+HASH_CACHE_PATH = os.path.join(STATE_DIR, 'hash_cache.bin')
+HASH_CACHE_VERSION = 1
+MAX_CACHE_ENTRIES = 200000
+
+CHUNK_SIZE = 1024 * 1024
+# Files from this size up are hashed through mmap instead of read() calls
+MMAP_THRESHOLD = 4 * 1024 * 1024
+# Files modified this recently may change again within the same mtime tick,
+# so their digests are not cached
+RACY_WINDOW = 2.0
+
+
+def walk_files(root):
+    """
+    Yield (path, stat_result) for every regular file below root, found with
+    os.scandir. Symlinked folders are not followed; symlinked files are.
+    """
+    pending = [root]
+    while pending:
+        folder = pending.pop()
+        try:
+            entries = os.scandir(folder)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file():
+                        yield entry.path, entry.stat()
+                except OSError:
+                    pass # Vanished or unreadable while walking
+
+
+def _cache_key(st):
+    # scandir leaves st_ino unset on Windows, so it cannot be compared there
+    return st.st_size, st.st_mtime_ns, st.st_ino if os.name != 'nt' else 0
+
+
+def _digest_file(path, size):
+    """ Return (digest, cache key of the file as it was read) """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        if size >= MMAP_THRESHOLD:
+            # One update over the whole mapping: no copies, and the GIL is
+            # released for the entire file
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+        else:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest(), _cache_key(os.fstat(f.fileno()))
+
+
+class HashEngine:
+    """
+    SHA-256 of files with a persisted digest cache. Safe to use from several
+    threads; call save() to write new digests to disk.
+    """
+
+    def __init__(self, cache_path=HASH_CACHE_PATH, workers=None):
+        self.cache_path = cache_path
+        self.workers = workers or min(32, usable_cores() * 2)
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    # --- CACHE ---
+
+    def _cache(self):
+        with self._lock:
+            if self._entries is None:
+                self._entries = {}
+                try:
+                    with open(self.cache_path, 'rb') as f:
+                        data = marshal.load(f)
+                    if data.get('version') == HASH_CACHE_VERSION:
+                        self._entries = data['entries']
+                except (OSError, EOFError, ValueError, TypeError, AttributeError):
+                    pass # Missing or unreadable: start over
+            return self._entries
+
+    def save(self):
+        """ Write the digest cache if new digests were computed """
+        entries = self._cache()
+        with self._lock:
+            if not self._dirty:
+                return
+            if len(entries) > MAX_CACHE_ENTRIES:
+                for path in list(entries)[:len(entries) - MAX_CACHE_ENTRIES]:
+                    del entries[path]
+            data = {'version': HASH_CACHE_VERSION, 'entries': dict(entries)}
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(tmp_path, 'wb') as f:
+                marshal.dump(data, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass # The cache is only an optimization
+
+    # --- HASHING ---
+
+    def hash_file(self, path, stat_result=None):
+        """ Return the SHA-256 hex digest of a file. Raises OSError if unreadable """
+        path = os.path.abspath(path)
+        st = stat_result or os.stat(path)
+        if not stat.S_ISREG(st.st_mode):
+            raise OSError(f"Not a regular file: {path}")
+        key = _cache_key(st)
+        entries = self._cache()
+        cached = entries.get(path)
+        if cached is not None and tuple(cached[:3]) == key:
+            self.hits += 1
+            return cached[3]
+
+        digest, read_key = _digest_file(path, st.st_size)
+        self.misses += 1
+        # Skip caching if the file changed while it was read, or may still change unnoticed
+        if read_key == key and time.time() - st.st_mtime_ns / 1e9 > RACY_WINDOW:
+            with self._lock:
+                entries.pop(path, None) # Re-insert at the end: oldest entries are dropped first
+                entries[path] = key + (digest,)
+                self._dirty = True
+        return digest
+
+    def _try_hash(self, item):
+        path, stat_result = item
+        try:
+            return self.hash_file(path, stat_result)
+        except OSError:
+            return None
+
+    def hash_files(self, paths):
+        """
+        Hash many files in parallel. paths may be paths or (path, stat_result)
+        pairs. Returns {path: digest}, with None for unreadable files.
+        """
+        items = [p if isinstance(p, tuple) else (p, None) for p in paths]
+        if len(items) <= 1:
+            digests = [self._try_hash(item) for item in items]
+        else:
+            threads = min(self.workers, len(items))
+            # Two threads per core: reads wait on the disk as much as they digest
+            with stage_threads(-(-threads // 2)) as cores, \
+                    ThreadPoolExecutor(max_workers=min(threads, cores * 2)) as executor:
+                digests = list(executor.map(self._try_hash, items))
+        return {path: digest for (path, _), digest in zip(items, digests)}
+
+    def hash_tree(self, root):
+        """ Return {relative path: digest} for every file below root """
+        files = list(walk_files(root))
+        digests = self.hash_files(files)
+        return {os.path.relpath(path, root): digests[path] for path, _ in files}
+
+
+_default_engine = None
+_default_lock = threading.Lock()
+
+
+def default_engine():
+    """ The process-wide engine, so every caller shares one digest cache """
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = HashEngine()
+        return _default_engine
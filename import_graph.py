@@ -0,0 +1,485 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Import Graph Analyzer
+# Description: Static scan of a script and its local package tree. Follows the
+#              import graph to find local modules, external packages actually
+#              used, and modules that are only imported dynamically (by name).
+#              From that it proposes --hidden-import entries, and
+#              --exclude-module entries for heavy packages that would be
+#              collected only through optional imports, together with the
+#              size of the modules each exclusion keeps out of the bundle.
+
+
+import os
+import re
+import ast
+import sys
+import json
+import importlib.metadata
+from importlib.machinery import PathFinder
+from concurrent.futures import ProcessPoolExecutor
+
+from builder_core import STATE_DIR
+from core_budget import stage_threads
+
+
+SCAN_CACHE_PATH = os.path.join(STATE_DIR, 'import_scan_cache.json')
+SCAN_CACHE_VERSION = 2
+# Below this many uncached files a process pool costs more than it saves
+PARALLEL_THRESHOLD = 16
+
+# Large packages that PyInstaller hooks commonly drag into a bundle even
+# though the application does not import them
+HEAVY_PACKAGES = [
+    'tkinter', 'matplotlib', 'numpy', 'scipy', 'pandas', 'PIL', 'IPython',
+    'jedi', 'notebook', 'PyQt5', 'PyQt6', 'PySide2', 'wx', 'gi', 'sympy',
+    'sklearn', 'torch', 'tensorflow', 'cv2', 'lxml', 'docutils', 'pygments',
+    'setuptools', 'pkg_resources', 'unittest', 'pydoc_data', 'lib2to3',
+    'test', 'xmlrpc', 'curses',
+]
+
+_DYNAMIC_IMPORT_FUNCS = {'import_module', '__import__'}
+# An import inside a try with one of these handlers may fail without harm
+_OPTIONAL_IMPORT_HANDLERS = {'ImportError', 'ModuleNotFoundError', 'Exception', 'BaseException'}
+
+STDLIB_MODULES = set(getattr(sys, 'stdlib_module_names', ())) | set(sys.builtin_module_names)
+
+
+# --- SINGLE FILE SCAN ---
+
+def _catches_import_error(try_node):
+    """ True if a try statement swallows a failed import """
+    for handler in try_node.handlers:
+        if handler.type is None:
+            return True
+        types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+        for exc_type in types:
+            name = exc_type.attr if isinstance(exc_type, ast.Attribute) else getattr(exc_type, 'id', None)
+            if name in _OPTIONAL_IMPORT_HANDLERS:
+                return True
+    return False
+
+
+def _is_type_checking(test):
+    return (isinstance(test, ast.Name) and test.id == 'TYPE_CHECKING') or \
+        (isinstance(test, ast.Attribute) and test.attr == 'TYPE_CHECKING')
+
+
+def scan_source(source, file_path='<string>'):
+    """
+    Parse one file and return its imports as a JSON-friendly dict:
+      imports  - [name, level, optional] for every static import; optional
+                 imports sit in a try that catches ImportError or under
+                 'if TYPE_CHECKING', so the file still works without them
+      dynamic  - module names passed as string literals to importlib.import_module / __import__
+    """
+    tree = ast.parse(source, filename=file_path)
+    imports = []
+    dynamic = []
+    pending = [(tree, False)]
+    while pending:
+        node, optional = pending.pop()
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append([alias.name, 0, optional])
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module or ''
+            imports.append([module, node.level, optional])
+            # 'from pkg import sub' may refer to a submodule
+            for alias in node.names:
+                if alias.name != '*':
+                    imports.append([f"{module}.{alias.name}" if module else alias.name,
+                                    node.level, optional])
+        elif isinstance(node, ast.Try) or type(node).__name__ == 'TryStar':
+            guarded = optional or _catches_import_error(node)
+            pending.extend((child, guarded) for child in node.body)
+            for child in node.handlers + node.orelse + node.finalbody:
+                pending.append((child, optional))
+            continue
+        elif isinstance(node, ast.If) and _is_type_checking(node.test):
+            pending.extend((child, True) for child in node.body)
+            pending.extend((child, optional) for child in node.orelse)
+            continue
+        elif isinstance(node, ast.Call) and node.args:
+            func = node.func
+            func_name = func.attr if isinstance(func, ast.Attribute) else getattr(func, 'id', None)
+            first = node.args[0]
+            if func_name in _DYNAMIC_IMPORT_FUNCS and isinstance(first, ast.Constant) \
+                    and isinstance(first.value, str):
+                dynamic.append(first.value)
+        pending.extend((child, optional) for child in ast.iter_child_nodes(node))
+    return {'imports': imports, 'dynamic': dynamic}
+
+
+def scan_file(file_path):
+    """ Scan a file on disk; unreadable or invalid files have no imports """
+    try:
+        with open(file_path, 'rb') as f:
+            return scan_source(f.read(), file_path)
+    except (OSError, SyntaxError, ValueError):
+        return {'imports': [], 'dynamic': []}
+
+
+class ScanCache:
+    """ Per-file scan results keyed on (mtime, size), persisted as JSON """
+
+    def __init__(self, path=SCAN_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == SCAN_CACHE_VERSION:
+                self.entries = data.get('files', {})
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def _stamp(file_path):
+        stat = os.stat(file_path)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def get(self, file_path):
+        entry = self.entries.get(file_path)
+        try:
+            if entry and entry['stamp'] == self._stamp(file_path):
+                return entry['result']
+        except OSError:
+            pass
+        return None
+
+    def put(self, file_path, result):
+        try:
+            self.entries[file_path] = {'stamp': self._stamp(file_path), 'result': result}
+            self.dirty = True
+        except OSError:
+            pass
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': SCAN_CACHE_VERSION, 'files': self.entries}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+# --- GRAPH WALK ---
+
+def _module_file(root, module_name):
+    """ Resolve a dotted module name to a .py file below root, or None """
+    base = os.path.join(root, *module_name.split('.'))
+    for candidate in (base + '.py', os.path.join(base, '__init__.py')):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+class ImportGraph:
+    """
+    Result of walking the imports of a script: local files, external
+    (third-party) and stdlib top-level packages, dynamically imported module
+    names, and every absolute import that leaves the local tree.
+    """
+
+    def __init__(self, script_path):
+        self.script_path = os.path.abspath(script_path)
+        self.root = os.path.dirname(self.script_path)
+        self.local_files = set()
+        self.external = set()
+        self.stdlib = set()
+        self.dynamic = set()
+        self.outside = set()
+
+
+def _scan_many(file_paths, cache, workers):
+    """ Scan files, using the cache and a process pool for the rest """
+    results = {}
+    missing = []
+    for path in file_paths:
+        cached = cache.get(path) if cache else None
+        if cached is None:
+            missing.append(path)
+        else:
+            results[path] = cached
+
+    scanned = None
+    if len(missing) >= PARALLEL_THRESHOLD and workers != 1:
+        with stage_threads(workers) as processes:
+            if processes > 1:
+                with ProcessPoolExecutor(max_workers=processes) as pool:
+                    scanned = list(pool.map(scan_file, missing, chunksize=8))
+    if scanned is None:
+        scanned = [scan_file(path) for path in missing]
+
+    for path, result in zip(missing, scanned):
+        results[path] = result
+        if cache:
+            cache.put(path, result)
+    return results
+
+
+def _resolve(graph, current, module_name, level, optional=False):
+    """ Return the local file an import refers to, recording external packages """
+    if level:
+        # Relative import: walk up from the importing file's package
+        base_dir = os.path.dirname(current)
+        for _ in range(level - 1):
+            base_dir = os.path.dirname(base_dir)
+        return _module_file(base_dir, module_name) if module_name else None
+    candidate = _module_file(graph.root, module_name)
+    if candidate is None and module_name:
+        graph.external.add(module_name.split('.')[0])
+        graph.outside.add((module_name, optional))
+    return candidate
+
+
+def build_import_graph(script_path, cache=None, workers=None):
+    """
+    Walk the import graph of script_path breadth-first. Each level of newly
+    discovered files is scanned together (in parallel when large enough,
+    cached per file), so unrelated parts of the directory tree are never read.
+    """
+    graph = ImportGraph(script_path)
+    root = graph.root
+    seen = {graph.script_path}
+    frontier = [graph.script_path]
+
+    while frontier:
+        scans = _scan_many(frontier, cache, workers)
+        next_frontier = []
+        for current in frontier:
+            result = scans[current]
+            graph.dynamic.update(result['dynamic'])
+            for module_name, level, optional in result['imports']:
+                candidate = _resolve(graph, current, module_name, level, optional)
+                if not candidate or candidate in seen:
+                    continue
+                seen.add(candidate)
+                graph.local_files.add(candidate)
+                next_frontier.append(candidate)
+                # Importing a.b.c also executes a/__init__.py and a/b/__init__.py
+                package_dir = os.path.dirname(candidate)
+                while package_dir.startswith(root + os.sep):
+                    init_file = os.path.join(package_dir, '__init__.py')
+                    if os.path.isfile(init_file) and init_file not in seen:
+                        seen.add(init_file)
+                        graph.local_files.add(init_file)
+                        next_frontier.append(init_file)
+                    package_dir = os.path.dirname(package_dir)
+        frontier = next_frontier
+
+    # 'from x import y' records x.y as well; keep only real top-level names
+    names = {name for name in graph.external if name and not _module_file(root, name)}
+    graph.stdlib = names & STDLIB_MODULES
+    graph.external = names - STDLIB_MODULES
+    graph.outside = {(name, optional) for name, optional in graph.outside
+                     if name.split('.')[0] in names}
+    return graph
+
+
+def find_local_imports(script_path):
+    """
+    Return the set of local .py files imported (transitively) by script_path.
+    Only modules that resolve below the script's directory are followed.
+    """
+    return build_import_graph(script_path, workers=1).local_files
+
+
+# --- SUGGESTIONS ---
+
+def _normalize(name):
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def _requirement_name(requirement):
+    if 'extra ==' in requirement:
+        return None
+    return _normalize(re.split(r'[\s<>=!~;\[(]', requirement, maxsplit=1)[0])
+
+
+def _dependency_closure(top_level_names):
+    """ Return the import names of every distribution the given packages depend on """
+    try:
+        package_map = importlib.metadata.packages_distributions()
+    except Exception:
+        return set()
+
+    dist_to_imports = {}
+    for import_name, dists in package_map.items():
+        for dist in dists:
+            dist_to_imports.setdefault(_normalize(dist), set()).add(import_name)
+
+    pending = {_normalize(d) for name in top_level_names for d in package_map.get(name, [])}
+    seen = set()
+    while pending:
+        dist = pending.pop()
+        if dist in seen:
+            continue
+        seen.add(dist)
+        try:
+            requirements = importlib.metadata.requires(dist) or []
+        except importlib.metadata.PackageNotFoundError:
+            continue
+        for requirement in requirements:
+            name = _requirement_name(requirement)
+            if name and name not in seen:
+                pending.add(name)
+
+    used = set()
+    for dist in seen:
+        used.update(dist_to_imports.get(dist, ()))
+    return used
+
+
+def _with_parents(module_name):
+    """ Importing a.b.c also imports a and a.b """
+    parts = module_name.split('.')
+    return ['.'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+def _installed_spec(module_name, specs):
+    """ Locate an installed or stdlib module on sys.path without importing it """
+    if module_name not in specs:
+        parent = module_name.rpartition('.')[0]
+        spec = None
+        try:
+            if not parent:
+                spec = PathFinder.find_spec(module_name)
+            else:
+                parent_spec = _installed_spec(parent, specs)
+                if parent_spec is not None and parent_spec.submodule_search_locations:
+                    spec = PathFinder.find_spec(module_name, list(parent_spec.submodule_search_locations))
+        except (ImportError, ValueError):
+            spec = None
+        specs[module_name] = spec
+    return specs[module_name]
+
+
+class ImportClosure:
+    """
+    Installed and stdlib modules reachable from a script's graph:
+      collected - {module: file or None} reached over any import, as a bundler would
+      required  - modules reached over non-optional imports only
+    """
+
+    def __init__(self):
+        self.collected = {}
+        self.required = set()
+
+    def packages(self, modules):
+        return {name.split('.')[0] for name in modules}
+
+    def collected_size(self, package):
+        """ Bytes of the modules of a top-level package that would be collected """
+        total = 0
+        for name, file_path in self.collected.items():
+            if file_path and (name == package or name.startswith(package + '.')):
+                try:
+                    total += os.path.getsize(file_path)
+                except OSError:
+                    pass
+        return total
+
+
+def import_closure(graph, extra_imports=(), cache=None, workers=None):
+    """
+    Follow the graph's imports, plus extra_imports (hidden imports), through
+    installed and stdlib modules. Each module is found with PathFinder and
+    scanned like a local file, so nothing is imported; the walk records every
+    module reached and which of them are reached only through optional imports.
+    """
+    closure = ImportClosure()
+    specs = {}
+    edges = {}
+    imports = set(graph.outside) | {(name, False) for name in extra_imports}
+    roots = [(target, optional) for name, optional in imports for target in _with_parents(name)]
+    seen = set()
+    frontier = {name for name, _ in roots}
+
+    while frontier:
+        seen.update(frontier)
+        sources = {}
+        for name in frontier:
+            spec = _installed_spec(name, specs)
+            if spec is None:
+                continue
+            file_path = spec.origin if spec.has_location else None
+            closure.collected[name] = file_path
+            if file_path and file_path.endswith('.py'):
+                sources[name] = file_path
+        scans = _scan_many(sorted(set(sources.values())), cache, workers)
+
+        next_frontier = set()
+        for name, file_path in sources.items():
+            package = name if os.path.basename(file_path) == '__init__.py' else name.rpartition('.')[0]
+            targets = []
+            for module_name, level, optional in scans[file_path]['imports']:
+                if level:
+                    parts = package.split('.') if package else []
+                    if level - 1 >= len(parts):
+                        continue
+                    base = '.'.join(parts[:len(parts) - (level - 1)])
+                    module_name = f"{base}.{module_name}" if module_name else base
+                if module_name:
+                    targets.extend((target, optional) for target in _with_parents(module_name))
+            edges[name] = targets
+            next_frontier.update(target for target, _ in targets if target not in seen)
+        frontier = next_frontier
+
+    pending = [name for name, optional in roots if not optional]
+    while pending:
+        name = pending.pop()
+        if name in closure.required or name not in closure.collected:
+            continue
+        closure.required.add(name)
+        pending.extend(target for target, optional in edges.get(name, ()) if not optional)
+    return closure
+
+
+def suggest(script_path, hidden_imports=(), excludes=(), workers=None, use_cache=True):
+    """
+    Analyze a script and return a dict with:
+      hidden_imports - [module] imported only dynamically and not yet listed
+      excludes       - [(module, size_bytes)] heavy packages that would be collected
+                       only through optional imports, largest first; size is
+                       what the collected modules occupy
+      external       - sorted third-party top-level packages the script imports
+      local_files    - number of local modules in the graph
+    """
+    cache = ScanCache() if use_cache else None
+    graph = build_import_graph(script_path, cache=cache, workers=workers)
+    hidden = sorted(name for name in graph.dynamic
+                    if name not in hidden_imports and not name.startswith('.'))
+    closure = import_closure(graph, list(hidden_imports) + hidden, cache=cache, workers=workers)
+    if cache:
+        cache.save()
+
+    used = set(graph.external) | set(graph.stdlib) | closure.packages(closure.required)
+    used |= _dependency_closure(used - STDLIB_MODULES)
+    exclude_suggestions = []
+    for name in HEAVY_PACKAGES:
+        if name in used or name in excludes:
+            continue
+        size = closure.collected_size(name)
+        if size:
+            exclude_suggestions.append((name, size))
+    exclude_suggestions.sort(key=lambda item: item[1], reverse=True)
+
+    return {
+        'hidden_imports': hidden,
+        'excludes': exclude_suggestions,
+        'external': sorted(graph.external),
+        'local_files': len(graph.local_files),
+    }
+
+
+def format_size(num_bytes):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num_bytes < 1024 or unit == 'GB':
+            return f"{num_bytes:.0f} {unit}" if unit == 'B' else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
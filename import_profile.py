@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Import Time Profiler
+# Description: Runs a script's imports under "python -X importtime" in a
+#              separate process (the script is executed with a __name__ other
+#              than "__main__", so only its top-level code runs) and adds up
+#              the cost per top-level package. Packages that are expensive to
+#              import but only used inside functions are flagged: importing
+#              them where they are used moves their cost out of startup.
+
+
+import os
+import ast
+import sys
+import subprocess
+
+from builder_core import process_group_kwargs, kill_process_tree
+from import_graph import build_import_graph
+
+
+DEFAULT_TIMEOUT = 30.0
+# Packages cheaper than this are not worth a lazy-import suggestion
+LAZY_THRESHOLD_MS = 10.0
+
+_MARKER = '--- python builder: script imports start ---'
+_PREFIX = 'import time:'
+
+# The marker is written to the child's stderr before the script runs, so the
+# interpreter's own startup imports can be told apart from the script's.
+# runpy.run_path() imports pkgutil on first use: load it before the marker.
+_PROBE = (
+    "import sys, runpy, pkgutil\n"
+    "script = sys.argv[1]\n"
+    "sys.argv = [script]\n"
+    "sys.path[0] = __import__('os').path.dirname(script)\n"
+    f"sys.stderr.write({_MARKER!r} + '\\n')\n"
+    "sys.stderr.flush()\n"
+    "runpy.run_path(script, run_name='__import_profile__')\n"
+)
+
+
+class ImportProfile:
+    """ Import cost of a script, per top-level package """
+
+    def __init__(self, script_path):
+        self.script_path = script_path
+        self.packages = []     # dicts, most expensive first
+        self.total_ms = 0.0    # Cumulative cost of everything the script imported
+        self.error = None      # Last line of the script's traceback, if it failed
+        self.timed_out = False
+
+    @property
+    def lazy_candidates(self):
+        return [p for p in self.packages if p['lazy']]
+
+    def to_dict(self):
+        return {
+            'script_path': self.script_path,
+            'total_ms': self.total_ms,
+            'error': self.error,
+            'timed_out': self.timed_out,
+            'packages': self.packages,
+        }
+
+
+# --- IMPORTTIME OUTPUT ---
+
+def parse_importtime(text):
+    """
+    Parse -X importtime output into [(depth, module, self_us, cumulative_us)]
+    in output order (a module is listed after everything it imported).
+    Other lines are ignored.
+    """
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith(_PREFIX):
+            continue
+        try:
+            self_us, cumulative_us, name = line[len(_PREFIX):].split('|', 2)
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue # The header line
+        # Nested imports are indented by two spaces per level
+        stripped = name.lstrip()
+        depth = (len(name) - len(stripped) - 1) // 2
+        entries.append((depth, stripped, self_us, cumulative_us))
+    return entries
+
+
+def aggregate(entries, local=()):
+    """
+    Add up parsed entries per top-level package. Returns {package: dict} with
+    self_ms (time spent in the package's own modules), cumulative_ms (time
+    until the package was imported, including what it imported in turn),
+    modules and direct (imported by the script or one of the local packages
+    named in local).
+    """
+    packages = {}
+    # Walked in reverse, the output lists every module before its imports
+    stack = []
+    for depth, name, self_us, cumulative_us in reversed(entries):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        top = name.split('.')[0]
+        package = packages.setdefault(top, {'name': top, 'self_ms': 0.0, 'cumulative_ms': 0.0, 'modules': 0,
+                                            'direct': False})
+        package['self_ms'] += self_us / 1000
+        package['modules'] += 1
+        # Count the cumulative time once per outermost entry into the package
+        if all(ancestor != top for _, ancestor in stack):
+            package['cumulative_ms'] += cumulative_us / 1000
+        if not stack or stack[-1][1] in local:
+            package['direct'] = True
+        stack.append((depth, top))
+    return packages
+
+
+# --- STATIC USE CHECK ---
+
+def _module_scope(tree):
+    """ Yield the nodes that run at import time (function bodies excluded) """
+    pending = list(ast.iter_child_nodes(tree))
+    while pending:
+        node = pending.pop()
+        yield node
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            # Decorators, defaults and annotations are evaluated at definition
+            pending.extend(node.decorator_list)
+            pending.append(node.args)
+            if node.returns:
+                pending.append(node.returns)
+        elif isinstance(node, ast.Lambda):
+            pending.append(node.args)
+        else:
+            pending.extend(ast.iter_child_nodes(node))
+
+
+def top_level_import_uses(source, file_path='<string>'):
+    """
+    Return {package: used_at_import_time} for every package a file imports at
+    module level. False means the names it binds are only used inside
+    functions (or not at all), so the import could move into those functions.
+    """
+    tree = ast.parse(source, filename=file_path)
+    scope = list(_module_scope(tree))
+    bound = {}
+    for node in scope:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                bound[alias.asname or alias.name.split('.')[0]] = alias.name.split('.')[0]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module \
+                and node.module != '__future__':
+            for alias in node.names:
+                if alias.name != '*':
+                    bound[alias.asname or alias.name] = node.module.split('.')[0]
+            if any(alias.name == '*' for alias in node.names):
+                # Star imports bind unknown names: assume they are used
+                bound[f"*{node.module}"] = node.module.split('.')[0]
+
+    uses = {package: name.startswith('*') for name, package in bound.items()}
+    for node in scope:
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id in bound:
+            uses[bound[node.id]] = True
+    return uses
+
+
+def _lazy_files(script_path):
+    """ Return {package: [files]} for packages only used inside functions, and the local names """
+    graph = build_import_graph(script_path, workers=1)
+    files = [graph.script_path] + sorted(graph.local_files)
+    candidates = {}
+    blocked = set()
+    for file_path in files:
+        try:
+            with open(file_path, 'rb') as f:
+                uses = top_level_import_uses(f.read(), file_path)
+        except (OSError, SyntaxError, ValueError):
+            continue
+        for package, used in uses.items():
+            if used:
+                blocked.add(package)
+            else:
+                candidates.setdefault(package, []).append(file_path)
+    local = {os.path.relpath(path, graph.root).split(os.sep)[0].split('.')[0] for path in graph.local_files}
+    return {package: paths for package, paths in candidates.items() if package not in blocked}, local
+
+
+# --- PROFILING ---
+
+def run_importtime(script_path, python=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Import the script in a child interpreter with -X importtime. Returns
+    (stderr text after the marker, timed_out).
+    """
+    command = [python or sys.executable, '-X', 'importtime', '-c', _PROBE, os.path.abspath(script_path)]
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        cwd=os.path.dirname(os.path.abspath(script_path)),
+        **process_group_kwargs()
+    )
+    timed_out = False
+    try:
+        _, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        # The script does real work at import time (no __main__ guard)
+        timed_out = True
+        kill_process_tree(process.pid)
+        _, stderr = process.communicate()
+    text = stderr.decode('utf-8', errors='replace')
+    _, found, after = text.partition(_MARKER)
+    return (after if found else text), timed_out
+
+
+def profile_imports(script_path, python=None, timeout=DEFAULT_TIMEOUT, warm_up=True):
+    """
+    Measure what importing script_path costs and return an ImportProfile.
+    With warm_up, a first unmeasured run compiles bytecode and fills the page
+    cache, as a frozen app ships precompiled modules.
+    """
+    if not os.path.isfile(script_path):
+        raise FileNotFoundError(f"Script not found: {script_path}")
+    if warm_up:
+        _, timed_out = run_importtime(script_path, python, timeout)
+        if timed_out:
+            warm_up = False # The measured run would time out the same way
+    text, timed_out = run_importtime(script_path, python, timeout)
+
+    result = ImportProfile(script_path)
+    result.timed_out = timed_out
+    errors = [line for line in text.splitlines() if line.strip() and not line.startswith(_PREFIX)]
+    if errors and not timed_out and errors[0].startswith('Traceback'):
+        result.error = errors[-1].strip()
+
+    entries = parse_importtime(text)
+    lazy, local = _lazy_files(script_path)
+    packages = aggregate(entries, local)
+    result.total_ms = sum(cumulative for depth, _, _, cumulative in entries if depth == 0) / 1000
+    for name, package in packages.items():
+        package['local'] = name in local
+        package['lazy'] = lazy.get(name) if package['cumulative_ms'] >= LAZY_THRESHOLD_MS else None
+        result.packages.append(package)
+    result.packages.sort(key=lambda p: p['cumulative_ms'], reverse=True)
+    return result
+
+
+def format_import_profile(result, top=15):
+    """ Render an ImportProfile as log lines """
+    lines = [f"Import time of {os.path.basename(result.script_path)}: {result.total_ms:.0f} ms "
+             f"({len(result.packages)} top-level packages)"]
+    if result.timed_out:
+        lines.append("Warning: the script did not finish importing in time; its top-level code "
+                     "probably runs without an 'if __name__ == \"__main__\"' guard. Partial results:")
+    if result.error:
+        lines.append(f"Warning: the script failed while importing: {result.error}")
+    for package in result.packages[:top]:
+        flags = []
+        if package['local']:
+            flags.append('local')
+        elif not package['direct']:
+            flags.append('indirect')
+        if package['lazy']:
+            flags.append('import lazily')
+        lines.append(f"  {package['name']:<24}{package['cumulative_ms']:>9.1f} ms"
+                     f"{package['self_ms']:>9.1f} ms self  {package['modules']:>4} modules"
+                     f"{'  [' + ', '.join(flags) + ']' if flags else ''}")
+    for package in result.lazy_candidates:
+        where = ', '.join(os.path.basename(path) for path in package['lazy'])
+        lines.append(f"'{package['name']}' costs {package['cumulative_ms']:.0f} ms at startup but is only used "
+                     f"inside functions in {where}: import it there instead.")
+    return lines
@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Log Archive
+# Description: Keeps the output of every build on disk, one compressed file
+#              per build. Lines are compressed as they arrive, in independent
+#              gzip members (zstd frames when PYTHON_BUILDER_LOG_CODEC=zstd
+#              and a zstd module is available), so a log stays readable up to
+#              its last complete frame even if the build never finished. Old
+#              logs are pruned by age, count per profile and total size.
+#              Searching streams through the archive a chunk at a time
+#              instead of decompressing whole logs into memory.
+
+
+import io
+import os
+import re
+import gzip
+import json
+import time
+import uuid
+import zlib
+import difflib
+from collections import deque
+
+from builder_core import STATE_DIR, profile_id, profile_name
+from bundle_report import format_size
+
+
+LOG_ARCHIVE_DIR = os.path.join(STATE_DIR, 'logs')
+CODEC_ENV = 'PYTHON_BUILDER_LOG_CODEC'
+
+# A frame is written once this much output is pending, or after FRAME_SECONDS
+FRAME_BYTES = 1024 * 1024
+FRAME_SECONDS = 5.0
+# Past this compressed size only the last TAIL_LINES lines of a build are kept
+MAX_LOG_BYTES = 64 * 1024 * 1024
+TAIL_LINES = 5000
+
+# Retention, applied whenever a build log is closed
+MAX_ARCHIVE_BYTES = 512 * 1024 * 1024
+MAX_LOGS_PER_PROFILE = 50
+MAX_AGE_DAYS = 90
+
+READ_CHUNK = 1024 * 1024
+# PyInstaller prefixes its lines with the milliseconds since it started
+_ELAPSED_PREFIX = re.compile(r'^\d+ (?=[A-Z]+: )')
+
+
+# --- CODECS ---
+
+class _GzipCodec:
+    name = 'gzip'
+    suffix = '.log.gz'
+    errors = (EOFError, OSError, zlib.error)
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def compress(self, data):
+        """ One complete gzip member; concatenated members form a valid gzip file """
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def open(self, path):
+        return gzip.open(path, 'rb')
+
+
+class _ZstdCodec:
+    name = 'zstd'
+    suffix = '.log.zst'
+
+    def __init__(self, module, level=3):
+        self.module = module
+        self.level = level
+        # compression.zstd (Python 3.14+) or the zstandard package
+        self.stdlib = hasattr(module, 'ZstdFile')
+        self.errors = (EOFError, OSError, module.ZstdError)
+
+    def compress(self, data):
+        if self.stdlib:
+            return self.module.compress(data, level=self.level)
+        return self.module.ZstdCompressor(level=self.level).compress(data)
+
+    def open(self, path):
+        if self.stdlib:
+            return self.module.open(path, 'rb')
+        reader = self.module.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True,
+                                                              closefd=True)
+        return io.BufferedReader(reader)
+
+
+def _zstd_module():
+    try:
+        from compression import zstd
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def default_codec():
+    """ gzip, or zstd if $PYTHON_BUILDER_LOG_CODEC asks for it and it is installed """
+    if os.environ.get(CODEC_ENV, '').lower() == 'zstd':
+        module = _zstd_module()
+        if module is not None:
+            return _ZstdCodec(module)
+    return _GzipCodec()
+
+
+def _codec_for(path):
+    if path.endswith(_ZstdCodec.suffix):
+        module = _zstd_module()
+        if module is None:
+            raise ValueError(f"{os.path.basename(path)}: reading zstd logs needs the zstandard package")
+        return _ZstdCodec(module)
+    return _GzipCodec()
+
+
+# --- WRITING ---
+
+class BuildLog:
+    """
+    The archived output of one build. write() lines as they arrive and
+    close() with the build's result. The log's metadata is saved next to it
+    when it opens, so a build that never closes still shows up, unfinished.
+    """
+
+    def __init__(self, profile, key=None, archive_dir=LOG_ARCHIVE_DIR, codec=None):
+        os.makedirs(archive_dir, exist_ok=True)
+        self.archive_dir = archive_dir
+        self.codec = codec or default_codec()
+        started = time.time()
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}-{uuid.uuid4().hex[:6]}"
+        self.path = os.path.join(archive_dir, self.id + self.codec.suffix)
+        self.meta = {
+            'id': self.id,
+            'file': os.path.basename(self.path),
+            'key': key,
+            'profile': profile_name(profile),
+            'profile_id': profile_id(profile) if profile.get('script_path') else None,
+            'script_path': profile.get('script_path', ''),
+            'started': started,
+            'finished': None,
+            'return_code': None,
+            'cached': False,
+            'cancelled': False,
+            'timed_out': False,
+            'error': '',
+            'lines': 0,
+            'bytes': 0,    # Uncompressed
+            'omitted': 0,  # Lines dropped from the middle of an oversized log
+        }
+        self._file = open(self.path, 'wb')
+        self._pending = []
+        self._pending_bytes = 0
+        self._last_frame = started
+        self._tail = None # Set once the log reaches MAX_LOG_BYTES
+        self._save_meta()
+
+    def _save_meta(self):
+        path = os.path.join(self.archive_dir, self.id + '.json')
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f, indent=4)
+        os.replace(tmp_path, path)
+
+    def _write_frame(self):
+        if self._pending:
+            self._file.write(self.codec.compress(b''.join(self._pending)))
+            self._file.flush()
+            self._pending = []
+            self._pending_bytes = 0
+        self._last_frame = time.time()
+        if self._tail is None and self._file.tell() >= MAX_LOG_BYTES:
+            self._tail = deque(maxlen=TAIL_LINES)
+
+    def write(self, line):
+        if self._file is None:
+            return
+        data = line.encode('utf-8', errors='replace') + b'\n'
+        self.meta['lines'] += 1
+        self.meta['bytes'] += len(data)
+        if self._tail is not None:
+            if len(self._tail) == self._tail.maxlen:
+                self.meta['omitted'] += 1
+            self._tail.append(data)
+            return
+        self._pending.append(data)
+        self._pending_bytes += len(data)
+        if self._pending_bytes >= FRAME_BYTES or time.time() - self._last_frame >= FRAME_SECONDS:
+            try:
+                self._write_frame()
+            except OSError:
+                # Out of disk space or similar: the build goes on without its archive
+                self._file.close()
+                self._file = None
+
+    def close(self, result=None, prune_archive=True):
+        """ Write what is pending, record the build's outcome and apply the retention limits """
+        if self._file is None:
+            return self.meta
+        if self._tail is not None:
+            if self.meta['omitted']:
+                self._pending.append(f"... {self.meta['omitted']} lines omitted: the log reached "
+                                     f"{MAX_LOG_BYTES // (1024 * 1024)} MB ...\n".encode('utf-8'))
+            self._pending.extend(self._tail)
+        try:
+            self._write_frame()
+        finally:
+            self._file.close()
+            self._file = None
+        self.meta['finished'] = time.time()
+        if result is not None:
+            for name in ('return_code', 'cached', 'cancelled', 'timed_out', 'error'):
+                self.meta[name] = getattr(result, name)
+        self._save_meta()
+        if prune_archive:
+            prune(self.archive_dir, keep=(self.id,))
+        return self.meta
+
+
+# --- ARCHIVE ---
+
+def list_logs(archive_dir=LOG_ARCHIVE_DIR):
+    """ Return the metadata of every archived log, oldest first, with its path and size """
+    try:
+        names = os.listdir(archive_dir)
+    except OSError:
+        return []
+    entries = []
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(archive_dir, name), 'r') as f:
+                entry = json.load(f)
+            entry['path'] = os.path.join(archive_dir, entry['file'])
+            entry['size'] = os.path.getsize(entry['path'])
+        except (OSError, ValueError, KeyError):
+            continue # Being written, or its log was pruned by another process
+        entries.append(entry)
+    entries.sort(key=lambda e: e['started'])
+    return entries
+
+
+def _remove(entry):
+    for path in (entry['path'], os.path.join(os.path.dirname(entry['path']), entry['id'] + '.json')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def prune(archive_dir=LOG_ARCHIVE_DIR, max_bytes=MAX_ARCHIVE_BYTES, max_per_profile=MAX_LOGS_PER_PROFILE,
+          max_age_days=MAX_AGE_DAYS, keep=()):
+    """
+    Delete the oldest logs beyond the age, per-profile and total size limits.
+    Unfinished logs may belong to a running build and only go once too old.
+    Returns the number of logs deleted.
+    """
+    entries = list_logs(archive_dir)
+    cutoff = time.time() - max_age_days * 86400
+    removed = set()
+    per_profile = {}
+    for entry in reversed(entries):
+        count = per_profile[entry['profile_id']] = per_profile.get(entry['profile_id'], 0) + 1
+        if entry['id'] in keep:
+            continue
+        if entry['started'] < cutoff or (entry['finished'] and count > max_per_profile):
+            removed.add(entry['id'])
+
+    total = sum(e['size'] for e in entries if e['id'] not in removed)
+    for entry in entries:
+        if total <= max_bytes:
+            break
+        if entry['id'] not in removed and entry['id'] not in keep and entry['finished']:
+            removed.add(entry['id'])
+            total -= entry['size']
+
+    for entry in entries:
+        if entry['id'] in removed:
+            _remove(entry)
+    return len(removed)
+
+
+def find_log(reference, entries):
+    """ The entry whose id is reference, or the only one starting with it """
+    matches = [e for e in entries if e['id'] == reference] or \
+              [e for e in entries if e['id'].startswith(reference)]
+    if not matches:
+        raise ValueError(f"No archived log {reference}")
+    if len(matches) > 1:
+        raise ValueError(f"{reference} matches {len(matches)} logs; give more of the id")
+    return matches[0]
+
+
+# --- READING ---
+
+def _read_chunks(path):
+    """ Yield decompressed data ending on line boundaries, READ_CHUNK at a time """
+    codec = _codec_for(path)
+    with codec.open(path) as f:
+        carry = b''
+        while True:
+            try:
+                # read1: an incomplete frame only costs what it holds, not the whole read
+                data = f.read1(READ_CHUNK)
+            except codec.errors:
+                data = b'' # Last frame incomplete: the build is running or was interrupted
+            if not data:
+                break
+            data = carry + data
+            end = data.rfind(b'\n') + 1
+            carry = data[end:]
+            if end:
+                yield data[:end]
+        if carry:
+            yield carry + b'\n'
+
+
+def read_lines(path):
+    """ Yield the lines of an archived log without their newlines """
+    for chunk in _read_chunks(path):
+        for line in chunk.decode('utf-8', errors='replace').splitlines():
+            yield line
+
+
+def grep_logs(pattern, entries, ignore_case=False, fixed=False):
+    """
+    Yield (entry, line_number, line) for every line of the given logs that
+    matches the regular expression pattern (or contains it, with fixed).
+    Logs are scanned chunk by chunk; only matching lines are decoded.
+    """
+    try:
+        regex = re.compile((re.escape(pattern) if fixed else pattern).encode('utf-8'),
+                           re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+    except re.error as e:
+        raise ValueError(f"Invalid pattern {pattern!r}: {e}")
+    for entry in entries:
+        line_number = 1
+        for chunk in _read_chunks(entry['path']):
+            counted = 0
+            position = 0
+            while True:
+                match = regex.search(chunk, position)
+                if not match:
+                    break
+                start = chunk.rfind(b'\n', 0, match.start()) + 1
+                end = chunk.find(b'\n', match.start())
+                if end == -1:
+                    break # An empty match after the last line
+                if match.end() > end:
+                    # The match runs into the next line: not a match of this one
+                    position = match.start() + 1
+                    continue
+                line_number += chunk.count(b'\n', counted, start)
+                counted = start
+                yield entry, line_number, chunk[start:end].decode('utf-8', errors='replace')
+                position = end + 1
+            line_number += chunk.count(b'\n', counted)
+
+
+def _normalized(path):
+    for line in read_lines(path):
+        yield _ELAPSED_PREFIX.sub('', line)
+
+
+def diff_logs(old, new, context=3, normalize=True):
+    """
+    Unified diff of two archived logs. With normalize, PyInstaller's elapsed
+    time prefix is dropped so only lines that really changed are reported.
+    """
+    read = _normalized if normalize else read_lines
+    return difflib.unified_diff(list(read(old['path'])), list(read(new['path'])),
+                                f"{old['id']} ({old['profile']})", f"{new['id']} ({new['profile']})",
+                                n=context, lineterm='')
+
+
+# --- FORMATTING ---
+
+def log_state(entry):
+    if not entry['finished']:
+        return 'unfinished'
+    if entry['cancelled']:
+        return 'cancelled'
+    if entry['timed_out']:
+        return 'timed out'
+    if entry['return_code'] == 0:
+        return 'cached' if entry['cached'] else 'ok'
+    return 'failed'
+
+
+def format_logs(entries):
+    """ Render archived logs as a table, one line per build """
+    lines = [f"{'ID':<23}{'Date':<18}{'State':<12}{'Time':>8}{'Lines':>9}{'Size':>11}  Profile"]
+    for entry in entries:
+        elapsed = f"{entry['finished'] - entry['started']:.1f}s" if entry['finished'] else '-'
+        date = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['started']))
+        lines.append(f"{entry['id']:<23}{date:<18}{log_state(entry):<12}{elapsed:>8}{entry['lines']:>9}"
+                     f"{format_size(entry['size']):>11}  {entry['profile']}")
+    return lines
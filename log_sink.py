@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Log Sink
+# Description: Thread-safe line buffer between a build worker and the UI.
+#              The worker writes lines as fast as PyInstaller prints them; the
+#              UI drains them in chunks on a timer, so the cost of displaying
+#              the log does not grow with the number of lines.
+
+
+import threading
+from collections import deque
+
+
+DEFAULT_HISTORY_LINES = 20000
+DEFAULT_MAX_PENDING = 50000
+FLUSH_INTERVAL_MS = 100
+
+
+class LogSink:
+    """
+    Buffers log lines written from a worker thread.
+
+    Lines waiting to be displayed are held in a bounded queue; if the reader
+    falls behind, the oldest undisplayed lines are dropped and a notice is
+    inserted instead. The most recent lines are also kept in a bounded ring
+    so the tail of the log can always be retrieved.
+    """
+
+    def __init__(self, history=DEFAULT_HISTORY_LINES, max_pending=DEFAULT_MAX_PENDING):
+        self._lock = threading.Lock()
+        self._pending = deque(maxlen=max_pending)
+        self.history = deque(maxlen=history)
+        self.dropped = 0
+        self.total = 0
+
+    def write(self, line):
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append(line)
+            self.history.append(line)
+            self.total += 1
+
+    def drain(self):
+        """ Return and clear every line waiting to be displayed """
+        with self._lock:
+            lines = list(self._pending)
+            self._pending.clear()
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            lines.insert(0, f"... {dropped} lines not displayed (output too fast) ...")
+        return lines
+
+    def snapshot(self):
+        """ Return the most recent lines, oldest first """
+        with self._lock:
+            return list(self.history)
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Log Store
+# Description: Append-only storage for build logs of any length. Lines are
+#              kept as UTF-8 in blocks of a few thousand, each with one array
+#              of end offsets and one byte of flags per line, so a line costs
+#              its text plus five bytes. Warnings, errors and missing-module
+#              messages are indexed as lines arrive, which makes jumping
+#              between them and filtering on them instant. Text searches scan
+#              the raw block bytes instead of individual strings.
+
+
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+BLOCK_LINES = 4096
+
+# Line flags
+WARNING = 1
+ERROR = 2
+MISSING = 4
+KINDS = (WARNING, ERROR, MISSING)
+KIND_NAMES = {WARNING: 'warnings', ERROR: 'errors', MISSING: 'missing modules'}
+
+# Each pattern only runs on lines containing one of its keywords: substring
+# tests are far cheaper than a regex search over every debug line
+_PATTERNS = (
+    (ERROR, ('ERROR', 'Error', 'error occurred', 'CRITICAL', 'FATAL', 'Traceback', 'Exception'),
+     re.compile(r'\b(?:ERROR|CRITICAL|FATAL|Error)\b|^Traceback \(most recent call last\)'
+                r'|^\w+(?:Error|Exception): |An error occurred')),
+    (WARNING, ('WARN', 'Warning'), re.compile(r'\b(?:WARNING|WARN|Warning)\b')),
+    (MISSING, ('not found', 'module named'),
+     re.compile(r'missing module named|No module named|Hidden import .+ not found|Library not found')),
+)
+
+
+def classify(line):
+    """ Return the flags (WARNING, ERROR, MISSING) of a log line """
+    flags = 0
+    for kind, keywords, pattern in _PATTERNS:
+        for keyword in keywords:
+            if keyword in line:
+                if pattern.search(line):
+                    flags |= kind
+                break
+    return flags
+
+
+class _Block:
+
+    def __init__(self):
+        self.data = bytearray()
+        self.ends = array('I')
+        self.flags = bytearray()
+
+    def freeze(self):
+        # Full blocks never change again: drop bytearray's growth headroom
+        self.data = bytes(self.data)
+
+    def line(self, index):
+        start = self.ends[index - 1] if index else 0
+        return self.data[start:self.ends[index]].decode('utf-8', errors='replace')
+
+
+class LogStore:
+    """
+    Lines of a log, numbered from 0 in the order they were appended. With
+    max_lines, the oldest lines are dropped a block at a time; line numbers
+    are never reused, so first is the number of the oldest line still kept.
+    """
+
+    def __init__(self, max_lines=None):
+        self.max_lines = max_lines
+        self.version = 0 # Changes whenever lines are added, dropped or cleared
+        self.clear()
+
+    def clear(self):
+        self._blocks = []
+        self._dropped_blocks = 0
+        self.count = 0 # Lines ever appended
+        self.version += 1
+        self.index = {kind: array('q') for kind in KINDS}
+
+    @property
+    def first(self):
+        return self._dropped_blocks * BLOCK_LINES
+
+    def __len__(self):
+        return self.count - self.first
+
+    def append(self, line):
+        """ Add one line (without its newline); returns its flags """
+        if not self._blocks or len(self._blocks[-1].ends) == BLOCK_LINES:
+            if self._blocks:
+                self._blocks[-1].freeze()
+            self._blocks.append(_Block())
+        block = self._blocks[-1]
+        flags = classify(line)
+        block.data += line.encode('utf-8', errors='replace')
+        block.ends.append(len(block.data))
+        block.flags.append(flags)
+        if flags:
+            for kind in KINDS:
+                if flags & kind:
+                    self.index[kind].append(self.count)
+        self.count += 1
+        self.version += 1
+        return flags
+
+    def extend(self, lines):
+        for line in lines:
+            self.append(line)
+
+    def excess(self):
+        """ How many of the oldest lines trim() would drop """
+        if not self.max_lines:
+            return 0
+        blocks = min(len(self._blocks) - 1, (len(self) - self.max_lines) // BLOCK_LINES)
+        return max(0, blocks) * BLOCK_LINES
+
+    def trim(self):
+        """ Drop whole blocks beyond max_lines; returns how many lines went """
+        dropped = self.excess()
+        if dropped:
+            del self._blocks[:dropped // BLOCK_LINES]
+            self._dropped_blocks += dropped // BLOCK_LINES
+            for kind, lines in self.index.items():
+                self.index[kind] = lines[bisect_left(lines, self.first):]
+            self.version += 1
+        return dropped
+
+    def _locate(self, number):
+        if not self.first <= number < self.count:
+            raise IndexError(f"Line {number} is not in the log")
+        block, index = divmod(number, BLOCK_LINES)
+        return self._blocks[block - self._dropped_blocks], index
+
+    def line(self, number):
+        block, index = self._locate(number)
+        return block.line(index)
+
+    def flags(self, number):
+        block, index = self._locate(number)
+        return block.flags[index]
+
+    # --- NAVIGATION ---
+
+    def next_line(self, numbers, after):
+        """ The first of the sorted line numbers after line after, or None """
+        position = bisect_right(numbers, after)
+        return numbers[position] if position < len(numbers) else None
+
+    def previous_line(self, numbers, before):
+        """ The last of the sorted line numbers before line before, or None """
+        position = bisect_left(numbers, before)
+        return numbers[position - 1] if position else None
+
+    def issues(self, kinds=KINDS):
+        """ Sorted numbers of the lines flagged with any of kinds """
+        if len(kinds) == 1:
+            return self.index[kinds[0]]
+        merged = set()
+        for kind in kinds:
+            merged.update(self.index[kind])
+        return array('q', sorted(merged))
+
+    def search(self, text, case_sensitive=False):
+        """ Sorted numbers of the lines containing text """
+        matches = array('q')
+        if not text:
+            return matches
+        needle = text.encode('utf-8')
+        if not case_sensitive:
+            needle = needle.lower()
+        for position, block in enumerate(self._blocks):
+            data = block.data if case_sensitive else block.data.lower()
+            base = (self._dropped_blocks + position) * BLOCK_LINES
+            ends = block.ends
+            offset = data.find(needle)
+            while offset != -1:
+                index = bisect_right(ends, offset)
+                # A match running past the end of its line spans two lines
+                if offset + len(needle) <= ends[index]:
+                    matches.append(base + index)
+                    offset = data.find(needle, ends[index])
+                else:
+                    offset = data.find(needle, offset + 1)
+        return matches
+
+    def memory_usage(self):
+        """ Approximate bytes held by the stored lines and their indexes """
+        total = sum(len(b.data) + len(b.ends) * b.ends.itemsize + len(b.flags) for b in self._blocks)
+        return total + sum(len(lines) * lines.itemsize for lines in self.index.values())
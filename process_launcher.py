@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Process Launcher
+# Description: Starts a command under resource limits. Run as
+#              "python process_launcher.py [limits] -- command...", it lowers
+#              its own CPU and I/O priority, caps its data size and joins a
+#              cgroup, prints a note for every limit that could not be
+#              applied, then replaces itself with the command, which
+#              inherits them all. Doing this in a fresh interpreter instead
+#              of a preexec_fn keeps it safe in the multi-threaded builder.
+#              Imports nothing beyond the standard library, so it starts fast.
+
+
+import os
+import sys
+import argparse
+
+
+LAUNCHER_PATH = os.path.abspath(__file__)
+
+# ioprio_set(2) has no libc wrapper; syscall numbers per architecture
+_IOPRIO_SET = {'x86_64': 251, 'amd64': 251, 'i386': 289, 'i686': 289, 'aarch64': 30, 'arm64': 30,
+               'riscv64': 30, 'armv7l': 314, 'ppc64le': 273, 's390x': 282}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_WHO_PGRP = 2
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_VALUES = {'low': (2 << _IOPRIO_CLASS_SHIFT) | 7, 'idle': 3 << _IOPRIO_CLASS_SHIFT}
+
+
+def set_io_priority(who, target, io_priority):
+    """ Lower the I/O priority ('low' or 'idle') of a process or process group (Linux) """
+    import ctypes
+    import platform
+    number = _IOPRIO_SET.get(platform.machine().lower())
+    if number is None:
+        raise OSError(f"I/O priorities are not supported on {platform.machine()}")
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.syscall(number, who, target, _IOPRIO_VALUES[io_priority]) != 0:
+        raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+
+def apply_limits(nice=0, io_priority='normal', memory_limit=0, cgroup=None):
+    """ Put this process under the limits; returns a note for each one that failed """
+    notes = []
+    if cgroup:
+        try:
+            with open(os.path.join(cgroup, 'cgroup.procs'), 'w') as f:
+                f.write(str(os.getpid()))
+        except OSError as e:
+            notes.append(f"Could not join the build's cgroup, only the memory watchdog applies: {e}")
+    if nice:
+        try:
+            os.setpriority(os.PRIO_PROCESS, 0, nice)
+        except OSError as e:
+            notes.append(f"Could not lower the CPU priority: {e}")
+    if io_priority != 'normal':
+        try:
+            set_io_priority(IOPRIO_WHO_PROCESS, 0, io_priority)
+        except OSError as e:
+            notes.append(f"Could not lower the I/O priority: {e}")
+    if memory_limit:
+        import resource
+        try:
+            resource.setrlimit(resource.RLIMIT_DATA, (memory_limit, memory_limit))
+        except (OSError, ValueError, OverflowError) as e:
+            notes.append(f"Could not limit the memory of each process: {e}")
+    return notes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='process_launcher', description="Run a command under resource limits")
+    parser.add_argument('--nice', type=int, default=0)
+    parser.add_argument('--io-priority', choices=['normal'] + list(_IOPRIO_VALUES), default='normal')
+    parser.add_argument('--memory-limit', type=int, default=0, help="bytes per process (RLIMIT_DATA)")
+    parser.add_argument('--cgroup', default=None, help="cgroup v2 directory to join")
+    parser.add_argument('command', nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+    if not command:
+        parser.error("no command given")
+
+    for note in apply_limits(args.nice, args.io_priority, args.memory_limit, args.cgroup):
+        print(note)
+    sys.stdout.flush()
+    try:
+        os.execvp(command[0], command)
+    except OSError as e:
+        print(f"Could not start {command[0]}: {e}")
+        return 127
+
+
+if __name__ == '__main__':
+    sys.exit(main())
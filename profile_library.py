@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Profile Library
+# Description: Index of every .mpb profile below one or more directory
+#              trees, kept in a local SQLite database. A refresh only
+#              re-parses files whose mtime or size changed, and each entry
+#              carries the script, output folder, modules and the result of
+#              the last build, so profiles can be found without opening
+#              them one by one.
+
+
+import os
+import time
+import sqlite3
+
+from builder_core import STATE_DIR, default_profile, profile_id, profile_name
+from profile_model import resolve_profile, save_cache
+
+
+LIBRARY_PATH = os.path.join(STATE_DIR, 'profile_library.sqlite3')
+SCHEMA_VERSION = 1
+PROFILE_EXTENSION = '.mpb'
+
+# Folders that never hold profiles but can be huge
+SKIP_DIRS = {'.git', '.hg', '.svn', '__pycache__', 'node_modules', '.venv', 'venv', '.tox', '.mypy_cache'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    script_path TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    one_file INTEGER NOT NULL,
+    profile_id TEXT NOT NULL,
+    last_build_code INTEGER,
+    last_build_time REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS profiles_root ON profiles (root);
+CREATE INDEX IF NOT EXISTS profiles_script ON profiles (script_path);
+CREATE INDEX IF NOT EXISTS profiles_id ON profiles (profile_id);
+CREATE TABLE IF NOT EXISTS profile_modules (
+    path TEXT NOT NULL REFERENCES profiles (path) ON DELETE CASCADE,
+    module TEXT NOT NULL,
+    kind TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS profile_modules_module ON profile_modules (module);
+CREATE INDEX IF NOT EXISTS profile_modules_path ON profile_modules (path);
+CREATE TABLE IF NOT EXISTS roots (
+    root TEXT PRIMARY KEY,
+    scanned REAL NOT NULL
+);
+"""
+
+COLUMNS = ['path', 'name', 'script_path', 'output_dir', 'one_file', 'profile_id',
+           'last_build_code', 'last_build_time', 'error']
+
+
+def _last_timing(profile):
+    """ (return_code, time) of the last recorded build of a profile, or (None, None) """
+    # Imported lazily so indexing does not pull in the build machinery
+    from build_timing import load_history
+    history = load_history(profile)
+    if not history:
+        return None, None
+    return history[-1].get('return_code', 0), history[-1]['created']
+
+
+def iter_profile_files(root):
+    """ Yield (path, stat) for every .mpb file below root """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for filename in filenames:
+            if filename.endswith(PROFILE_EXTENSION):
+                path = os.path.join(dirpath, filename)
+                try:
+                    yield path, os.stat(path)
+                except OSError:
+                    pass
+
+
+class ProfileLibrary:
+    """ SQLite-backed index of .mpb profiles. One instance per thread """
+
+    def __init__(self, db_path=LIBRARY_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = sqlite3.connect(db_path, timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA foreign_keys = ON")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.db.executescript("DROP TABLE IF EXISTS profile_modules; DROP TABLE IF EXISTS profiles; "
+                                  "DROP TABLE IF EXISTS roots;")
+            self.db.executescript(_SCHEMA)
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- INDEXING ---
+
+    def _index_file(self, root, path, stat):
+        error = None
+        try:
+            profile = resolve_profile(path).to_dict()
+        except (OSError, ValueError) as e:
+            profile = default_profile()
+            error = str(e)
+
+        script_path = profile.get('script_path') or ''
+        output_dir = profile.get('output_dir') or ''
+        pid = profile_id(profile) if script_path else ''
+        code, built = _last_timing(profile) if script_path else (None, None)
+        # Keep a result recorded by a build unless the history knows a newer one
+        row = self.db.execute("SELECT last_build_code, last_build_time FROM profiles WHERE path = ?",
+                              (path,)).fetchone()
+        if row and row['last_build_time'] and (built is None or row['last_build_time'] >= built):
+            code, built = row['last_build_code'], row['last_build_time']
+
+        self.db.execute("DELETE FROM profiles WHERE path = ?", (path,))
+        self.db.execute(
+            "INSERT INTO profiles (path, root, mtime_ns, size, name, script_path, output_dir, one_file, "
+            "profile_id, last_build_code, last_build_time, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, root, stat.st_mtime_ns, stat.st_size, profile_name(profile, path), script_path,
+             output_dir, int(bool(profile.get('one_file'))), pid, code, built, error))
+        modules = [(path, m, 'hidden') for m in profile.get('included_modules') or []]
+        modules += [(path, m, 'excluded') for m in profile.get('excluded_modules') or []]
+        self.db.executemany("INSERT INTO profile_modules (path, module, kind) VALUES (?, ?, ?)", modules)
+
+    def refresh(self, root):
+        """
+        Bring the index of one directory tree up to date. Only new and
+        modified files are parsed. Returns {'files', 'updated', 'removed', 'elapsed'}.
+        """
+        start_time = time.time()
+        root = os.path.abspath(root)
+        known = {row['path']: (row['mtime_ns'], row['size']) for row in
+                 self.db.execute("SELECT path, mtime_ns, size FROM profiles WHERE root = ?", (root,))}
+        seen = set()
+        updated = 0
+        with self.db:
+            for path, stat in iter_profile_files(root):
+                seen.add(path)
+                if known.get(path) != (stat.st_mtime_ns, stat.st_size):
+                    self._index_file(root, path, stat)
+                    updated += 1
+            save_cache()
+            removed = [path for path in known if path not in seen]
+            self.db.executemany("DELETE FROM profiles WHERE path = ?", [(p,) for p in removed])
+            self.db.execute("INSERT OR REPLACE INTO roots (root, scanned) VALUES (?, ?)", (root, time.time()))
+        return {'files': len(seen), 'updated': updated, 'removed': len(removed),
+                'elapsed': time.time() - start_time}
+
+    def roots(self):
+        """ Indexed directory trees, most recently scanned first """
+        return [row['root'] for row in self.db.execute("SELECT root FROM roots ORDER BY scanned DESC")]
+
+    def remove_root(self, root):
+        root = os.path.abspath(root)
+        with self.db:
+            self.db.execute("DELETE FROM profiles WHERE root = ?", (root,))
+            self.db.execute("DELETE FROM roots WHERE root = ?", (root,))
+
+    def record_build(self, profile, return_code, when=None):
+        """ Store the result of a build on every indexed profile that builds the same thing """
+        if not profile.get('script_path'):
+            return
+        with self.db:
+            self.db.execute("UPDATE profiles SET last_build_code = ?, last_build_time = ? WHERE profile_id = ?",
+                            (return_code, when or time.time(), profile_id(profile)))
+
+    # --- QUERIES ---
+
+    def search(self, text='', module=None, script=None, output=None, status=None, root=None, limit=500):
+        """
+        Return matching profiles as dicts, most recently built first.
+        text matches name, path, script and output folder; module matches a
+        hidden or excluded module (a trailing '*' matches a prefix); status
+        is 'ok', 'failed' or 'never'.
+        """
+        where, params = [], []
+        if text:
+            where.append("(p.name LIKE ? OR p.path LIKE ? OR p.script_path LIKE ? OR p.output_dir LIKE ?)")
+            params += [f"%{text}%"] * 4
+        if module:
+            op, value = ('LIKE', module[:-1] + '%') if module.endswith('*') else ('=', module)
+            where.append(f"p.path IN (SELECT path FROM profile_modules WHERE module {op} ?)")
+            params.append(value)
+        if script:
+            where.append("p.script_path LIKE ?")
+            params.append(f"%{script}%")
+        if output:
+            where.append("p.output_dir LIKE ?")
+            params.append(f"%{output}%")
+        if status == 'ok':
+            where.append("p.last_build_code = 0")
+        elif status == 'failed':
+            where.append("p.last_build_code != 0")
+        elif status == 'never':
+            where.append("p.last_build_code IS NULL")
+        if root:
+            where.append("p.root = ?")
+            params.append(os.path.abspath(root))
+
+        query = f"SELECT {', '.join('p.' + c for c in COLUMNS)} FROM profiles p"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY p.last_build_time IS NULL, p.last_build_time DESC, p.name LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.db.execute(query, params)]
+
+    def modules(self, path):
+        """ Return {'hidden': [...], 'excluded': [...]} for an indexed profile """
+        result = {'hidden': [], 'excluded': []}
+        for row in self.db.execute("SELECT module, kind FROM profile_modules WHERE path = ? ORDER BY rowid",
+                                   (path,)):
+            result[row['kind']].append(row['module'])
+        return result
+
+
+def record_build_result(profile, return_code):
+    """ Update the library after a build; does nothing if there is no library yet """
+    if not os.path.exists(LIBRARY_PATH):
+        return
+    with ProfileLibrary() as library:
+        library.record_build(profile, return_code)
+
+
+def format_build_status(row):
+    if row['last_build_code'] is None:
+        return 'never built'
+    status = 'OK' if row['last_build_code'] == 0 else f"failed ({row['last_build_code']})"
+    return f"{status} {time.strftime('%Y-%m-%d %H:%M', time.localtime(row['last_build_time']))}"
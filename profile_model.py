@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Profile Model
+# Description: Typed, versioned .mpb profiles. A profile may extend a base
+#              profile ("extends": "base.mpb") and override its fields, or
+#              append to its lists with "included_modules+" style keys. The
+#              resolved profile is validated in one pass that reports every
+#              bad field at once, and resolved profiles are kept in a marshal
+#              cache keyed by the mtime and size of every file they came from.
+
+
+import os
+import json
+import marshal
+import difflib
+
+from builder_core import STATE_DIR, PROFILE_DEFAULTS
+from zip_deploy import METHODS as ZIP_METHODS, LEVEL_RANGES as ZIP_LEVEL_RANGES
+from resource_governor import NICE_RANGE, IO_PRIORITIES
+
+
+# Version 1 profiles have no 'version' key; version 2 added inheritance
+PROFILE_VERSION = 2
+
+CACHE_PATH = os.path.join(STATE_DIR, 'profile_cache.bin')
+# Resolved profiles are only reused if written for the same field set
+CACHE_KEY = (PROFILE_VERSION, tuple(PROFILE_DEFAULTS))
+MAX_CACHE_ENTRIES = 5000
+
+EXTENDS_KEY = 'extends'
+APPEND_SUFFIX = '+'
+MAX_INHERITANCE_DEPTH = 16
+
+LIST_FIELDS = [key for key, value in PROFILE_DEFAULTS.items() if isinstance(value, list)]
+
+
+class ProfileError(ValueError):
+    """ A profile that cannot be read, resolved or validated """
+
+    def __init__(self, path, errors):
+        self.path = path
+        self.errors = list(errors)
+        lines = "\n".join(f"  {error}" for error in self.errors)
+        super().__init__(f"{path}: invalid profile\n{lines}" if len(self.errors) > 1 else
+                         f"{path}: {self.errors[0]}")
+
+
+# --- VALIDATION ---
+
+def _check_cores(value):
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise TypeError("must be a positive whole number")
+    if isinstance(value, str) and not value.strip().isdigit():
+        raise ValueError(f"must be a positive whole number, got {value!r}")
+    if int(value) < 1:
+        raise ValueError(f"must be at least 1, got {value!r}")
+    # Stored as text, like the window's combo box does
+    return str(int(value))
+
+
+def _check_zip_method(value):
+    if not isinstance(value, str):
+        raise TypeError("must be a string")
+    if value not in ZIP_METHODS:
+        raise ValueError(f"must be one of {', '.join(ZIP_METHODS)}, got {value!r}")
+    return value
+
+
+def _check_whole_number(value):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError("must be a whole number")
+    return value
+
+
+def _check_timeout(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError("must be a number of seconds")
+    if value < 0:
+        raise ValueError(f"must not be negative, got {value!r}")
+    return value
+
+
+def _check_nice(value):
+    _check_whole_number(value)
+    low, high = NICE_RANGE
+    if not low <= value <= high:
+        raise ValueError(f"must be between {low} and {high}, got {value!r}")
+    return value
+
+
+def _check_io_priority(value):
+    if not isinstance(value, str):
+        raise TypeError("must be a string")
+    if value not in IO_PRIORITIES:
+        raise ValueError(f"must be one of {', '.join(IO_PRIORITIES)}, got {value!r}")
+    return value
+
+
+def _check_memory_limit(value):
+    _check_whole_number(value)
+    if value < 0:
+        raise ValueError(f"must not be negative, got {value!r}")
+    return value
+
+
+def _check_type(expected):
+    def check(value):
+        if not isinstance(value, expected):
+            raise TypeError(f"must be {'true or false' if expected is bool else 'a string'}")
+        return value
+    return check
+
+
+def _check_string_list(value):
+    if not isinstance(value, list):
+        raise TypeError("must be a list of strings")
+    for index, item in enumerate(value):
+        if not isinstance(item, str):
+            raise ValueError(f"item {index} must be a string, got {_describe(item)}")
+    return list(value)
+
+
+# One checker per field; each returns the normalized value or raises
+CHECKS = {}
+for _key, _value in PROFILE_DEFAULTS.items():
+    if isinstance(_value, list):
+        CHECKS[_key] = _check_string_list
+    else:
+        CHECKS[_key] = _check_type(type(_value))
+CHECKS.update(cores=_check_cores, zip_method=_check_zip_method, zip_level=_check_whole_number,
+              build_timeout=_check_timeout, nice=_check_nice, io_priority=_check_io_priority,
+              memory_limit_mb=_check_memory_limit)
+
+
+def _describe(value):
+    text = json.dumps(value)
+    return text if len(text) <= 40 else text[:37] + '...'
+
+
+class Profile:
+    """
+    A resolved, validated build profile. Front-ends work with the plain dict
+    from to_dict(); load_profile_file() returns that dict directly.
+    """
+    __slots__ = tuple(PROFILE_DEFAULTS) + ('source',)
+
+    def __init__(self, source=None, **fields):
+        self.source = source
+        for key, default in PROFILE_DEFAULTS.items():
+            value = fields.pop(key, default)
+            setattr(self, key, list(value) if isinstance(value, list) else value)
+        if fields:
+            raise TypeError(f"Unknown profile fields: {', '.join(sorted(fields))}")
+
+    @classmethod
+    def from_dict(cls, data, source='<profile>', origins=None):
+        """
+        Validate every field of data (defaults fill the gaps) and return a
+        Profile. Raises ProfileError listing all problems found.
+        origins maps a field to the base profile it was inherited from.
+        """
+        origins = origins or {}
+        errors = []
+        fields = {}
+        for key, value in data.items():
+            where = f" (from {origins[key]})" if key in origins else ''
+            check = CHECKS.get(key)
+            if check is None:
+                close = difflib.get_close_matches(key, CHECKS, n=1)
+                hint = f", did you mean '{close[0]}'?" if close else ''
+                errors.append(f"unknown field '{key}'{where}{hint}")
+                continue
+            try:
+                fields[key] = check(value)
+            except (TypeError, ValueError) as e:
+                errors.append(f"'{key}'{where} {e} (got {_describe(value)})" if isinstance(e, TypeError)
+                              else f"'{key}'{where} {e}")
+
+        # Cross-field check, once both fields are known to be well-formed
+        method = fields.get('zip_method', PROFILE_DEFAULTS['zip_method'])
+        level = fields.get('zip_level', PROFILE_DEFAULTS['zip_level'])
+        if 'zip_level' in fields and method in ZIP_LEVEL_RANGES:
+            low, high = ZIP_LEVEL_RANGES[method]
+            if not low <= level <= high:
+                errors.append(f"'zip_level' must be between {low} and {high} for {method}, got {level}")
+
+        if errors:
+            raise ProfileError(source, errors)
+        return cls(source, **fields)
+
+    def to_dict(self):
+        profile = {}
+        for key in PROFILE_DEFAULTS:
+            value = getattr(self, key)
+            profile[key] = list(value) if isinstance(value, list) else value
+        return profile
+
+    def __repr__(self):
+        return f"Profile({self.source or self.script_path!r})"
+
+
+# --- RESOLUTION ---
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        raise ProfileError(path, ["file not found"])
+    except ValueError as e:
+        raise ProfileError(path, [f"not valid JSON: {e}"])
+    if not isinstance(data, dict):
+        raise ProfileError(path, ["must contain a JSON object"])
+    return data
+
+
+def _migrate(path, data):
+    """ Bring a profile file's fields up to PROFILE_VERSION """
+    version = data.pop('version', 1)
+    if isinstance(version, bool) or not isinstance(version, int) or version < 1:
+        raise ProfileError(path, [f"'version' must be a whole number, got {_describe(version)}"])
+    if version > PROFILE_VERSION:
+        raise ProfileError(path, [f"written by a newer Python Builder (profile version {version}, "
+                                  f"this one reads up to {PROFILE_VERSION})"])
+    # Version 2 only added keys ('extends', appends); version 1 fields are read unchanged
+    return data
+
+
+def _resolve_fields(path, chain, parsed):
+    """
+    Merge a profile file with its bases. Returns (fields, origins, deps):
+    the merged raw fields, the base file each inherited field came from,
+    and every file read as (path, mtime_ns, size).
+    """
+    if path in chain:
+        cycle = ' -> '.join(os.path.basename(p) for p in chain + [path])
+        raise ProfileError(chain[0], [f"profiles extend each other in a cycle: {cycle}"])
+    if len(chain) >= MAX_INHERITANCE_DEPTH:
+        raise ProfileError(chain[0], [f"more than {MAX_INHERITANCE_DEPTH} levels of '{EXTENDS_KEY}'"])
+
+    if path not in parsed:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            if chain:
+                raise ProfileError(chain[-1], [f"base profile {path} not found"])
+            raise ProfileError(path, ["file not found"])
+        parsed[path] = (_migrate(path, _read_json(path)), (path, stat.st_mtime_ns, stat.st_size))
+    data, dep = parsed[path]
+    data = dict(data)
+
+    base = data.pop(EXTENDS_KEY, None)
+    if base is None:
+        fields, origins, deps = {}, {}, []
+    else:
+        if not isinstance(base, str) or not base:
+            raise ProfileError(path, [f"'{EXTENDS_KEY}' must be the path of a base profile"])
+        base_path = os.path.normpath(os.path.join(os.path.dirname(path), os.path.expanduser(base)))
+        fields, origins, deps = _resolve_fields(base_path, chain + [path], parsed)
+        fields = dict(fields)
+        origins = {key: origins.get(key, os.path.basename(base_path)) for key in fields}
+
+    errors = []
+    for key, value in data.items():
+        if key.endswith(APPEND_SUFFIX):
+            target = key[:-len(APPEND_SUFFIX)]
+            if target not in LIST_FIELDS:
+                errors.append(f"'{key}' can only extend a list field ({', '.join(LIST_FIELDS)})")
+            elif not isinstance(value, list):
+                errors.append(f"'{key}' must be a list of strings (got {_describe(value)})")
+            else:
+                current = fields.get(target, [])
+                fields[target] = (current if isinstance(current, list) else []) + \
+                    [item for item in value if item not in current]
+                origins.pop(target, None)
+        else:
+            fields[key] = value
+            origins.pop(key, None)
+    if errors:
+        raise ProfileError(path, errors)
+    return fields, origins, deps + [dep]
+
+
+# --- CACHE ---
+
+_cache = None
+_cache_dirty = False
+
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        _cache = {}
+        try:
+            with open(CACHE_PATH, 'rb') as f:
+                data = marshal.load(f)
+            if data.get('key') == CACHE_KEY:
+                _cache = data['entries']
+        except (OSError, EOFError, ValueError, TypeError, AttributeError):
+            pass # Missing or from another version: start over
+    return _cache
+
+
+def _deps_unchanged(deps):
+    for path, mtime_ns, size in deps:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_mtime_ns != mtime_ns or stat.st_size != size:
+            return False
+    return True
+
+
+def save_cache():
+    """ Write resolved profiles to disk if any were added since the last save """
+    global _cache_dirty
+    if not _cache_dirty:
+        return
+    entries = _load_cache()
+    if len(entries) > MAX_CACHE_ENTRIES:
+        for path in list(entries)[:len(entries) - MAX_CACHE_ENTRIES]:
+            del entries[path]
+    os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+    tmp_path = f"{CACHE_PATH}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            marshal.dump({'key': CACHE_KEY, 'entries': entries}, f)
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError:
+        pass # The cache is only an optimization
+    _cache_dirty = False
+
+
+def resolve_profile(path, parsed=None, use_cache=True):
+    """
+    Read, resolve and validate the profile at path and return a Profile.
+    parsed is shared between calls to read common base profiles only once.
+    """
+    global _cache_dirty
+    path = os.path.abspath(path)
+    if use_cache:
+        entry = _load_cache().get(path)
+        if entry is not None and _deps_unchanged(entry[0]):
+            return Profile(path, **entry[1])
+
+    fields, origins, deps = _resolve_fields(path, [], {} if parsed is None else parsed)
+    profile = Profile.from_dict(fields, path, origins)
+    if use_cache:
+        cache = _load_cache()
+        cache.pop(path, None) # Re-insert at the end: oldest entries are dropped first
+        cache[path] = (tuple(deps), profile.to_dict())
+        _cache_dirty = True
+    return profile
+
+
+def load_profiles(paths, use_cache=True):
+    """
+    Resolve many profiles at once. Returns a list with a Profile or the
+    ProfileError raised for each path, in order.
+    """
+    parsed = {}
+    results = []
+    for path in paths:
+        try:
+            results.append(resolve_profile(path, parsed, use_cache))
+        except ProfileError as e:
+            results.append(e)
+    if use_cache:
+        save_cache()
+    return results
+
+
+def profile_file_data(profile, path=None):
+    """
+    The JSON object written for a profile dict. Given the path of an existing
+    profile file, the file's own keys ('extends' and appends included) are
+    kept and only the fields that differ from what the file resolves to are
+    written on top, so inherited values and defaults stay out of the file.
+    """
+    data = {'version': PROFILE_VERSION}
+    try:
+        own = _migrate(path, _read_json(path)) if path and os.path.isfile(path) else None
+        current = resolve_profile(path, use_cache=False).to_dict() if own is not None else None
+    except ProfileError:
+        own = current = None # Unreadable: replace it with the full profile
+    if own is None:
+        data.update(profile)
+        return data
+
+    data.update(own)
+    for key, value in profile.items():
+        if key not in current or value == current[key]:
+            continue
+        inherited = current[key]
+        append_key = key + APPEND_SUFFIX
+        if key in LIST_FIELDS and EXTENDS_KEY in own and key not in own \
+                and value[:len(inherited)] == inherited:
+            # Still the base's list plus more: keep appending to it
+            data[append_key] = data.get(append_key, []) + value[len(inherited):]
+        else:
+            data.pop(append_key, None)
+            data[key] = value
+    return data
@@ -23,7 +23,7 @@ from PySide6.QtGui import (
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QGridLayout, QGroupBox, QLabel, QLineEdit, QPushButton,
-    QCheckBox, QComboBox, QFileDialog, QListWidget, QListWidgetItem,
+    QCheckBox, QFileDialog, QListWidget, QListWidgetItem,
     QTextEdit, QMessageBox
 )
 
@@ -160,10 +160,6 @@ class MainWindow(QMainWindow):
         self.noconsole_check = QCheckBox("Disable Console Window")
         self.shutdown_check = QCheckBox("Shutdown when done")
         
-        self.cores_combo = QComboBox()
-        self.cores_combo.addItems([str(i) for i in range(1, os.cpu_count() + 1)])
-        self.cores_combo.setCurrentText(str(os.cpu_count()))
-        
         self.icon_input = QLineEdit()
         self.icon_input.setPlaceholderText("Pilih file icon (.ico)")
         browse_icon_btn = QPushButton("Browse...")
@@ -172,11 +168,9 @@ class MainWindow(QMainWindow):
         comp_opts_layout.addWidget(self.onefile_check, 0, 0, 1, 2)
         comp_opts_layout.addWidget(self.noconsole_check, 1, 0, 1, 2)
         comp_opts_layout.addWidget(self.shutdown_check, 2, 0, 1, 2)
-        comp_opts_layout.addWidget(QLabel("Compilation Cores:"), 3, 0)
-        comp_opts_layout.addWidget(self.cores_combo, 3, 1)
-        comp_opts_layout.addWidget(QLabel("Select Icon (.ico)"), 4, 0)
-        comp_opts_layout.addWidget(self.icon_input, 5, 0, 1, 2)
-        comp_opts_layout.addWidget(browse_icon_btn, 6, 1)
+        comp_opts_layout.addWidget(QLabel("Select Icon (.ico)"), 3, 0)
+        comp_opts_layout.addWidget(self.icon_input, 4, 0, 1, 2)
+        comp_opts_layout.addWidget(browse_icon_btn, 5, 1)
         
         options_version_layout.addWidget(comp_opts_group)
 
@@ -359,9 +353,6 @@ class MainWindow(QMainWindow):
         if self.noconsole_check.isChecked():
             command.append('--windowed') # atau --noconsole
         
-        # Cores
-        command.extend(['--nproc', self.cores_combo.currentText()])
-
 
         # Icon
         if self.icon_input.text():
@@ -14,21 +14,49 @@ import os
 import subprocess
 import base64
 import time
-import json
+from bisect import bisect_left
+from builder_core import (
+    load_profile_file, save_profile_file, build_command, profile_name
+)
+from build_queue import BuildQueue, RUNNING, QUEUED, SUCCEEDED, CANCELLED, FINISHED_STATES
+from batch_builder import BatchBuilder, format_summary
+from log_sink import LogSink, FLUSH_INTERVAL_MS
+from log_store import LogStore, WARNING, ERROR, MISSING, KIND_NAMES
+from import_graph import suggest as suggest_imports, format_size
+from import_profile import profile_imports
+from file_watch import ProfileWatcher, describe_changes
+from zip_deploy import METHODS as ZIP_METHODS
+from core_budget import default_budget
+from resource_governor import IO_PRIORITIES
+from profile_library import ProfileLibrary, format_build_status
+from build_timing import (
+    PHASES, load_history, find_regressions, format_regressions, format_seconds, format_rss
+)
 from PySide6.QtCore import (
-    Qt, QThread, Signal, QSize, QTimer
+    Qt, QThread, Signal, QSize, QTimer, QAbstractListModel, QModelIndex, QSignalBlocker
 )
 from PySide6.QtGui import (
-    QIcon, QFont, QTextCursor
+    QIcon, QFont, QColor, QKeySequence, QShortcut
 )
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QGridLayout, QGroupBox, QLabel, QLineEdit, QPushButton,
     QCheckBox, QComboBox, QFileDialog, QListWidget, QListWidgetItem,
-    QTextEdit, QMessageBox, QInputDialog
+    QTableView, QAbstractItemView, QMessageBox, QInputDialog, QDialog, QDialogButtonBox,
+    QTableWidget, QTableWidgetItem, QHeaderView
 )
 
 
+# Log filters: line flags to show, None for all lines, 'search' for lines matching the find box
+LOG_FILTERS = {"All Lines": None, "Warnings": (WARNING,), "Errors": (ERROR,),
+               "Missing Modules": (MISSING,), "Find Matches": 'search'}
+LOG_COLORS = {ERROR: QColor('#c62828'), MISSING: QColor('#b36b00'), WARNING: QColor('#8a6d00')}
+
+# Build timeout choices (seconds, 0 = no limit)
+BUILD_TIMEOUTS = {"None": 0, "10 min": 600, "30 min": 1800, "60 min": 3600, "120 min": 7200}
+CPU_PRIORITIES = {"Normal": 0, "Low": 10, "Lowest": 19}
+MEMORY_LIMITS = {"None": 0, "1 GB": 1024, "2 GB": 2048, "4 GB": 4096, "8 GB": 8192, "16 GB": 16384}
+
 # Base64 data for the default icon. This will create icon.ico if it doesn't exist.
 ICON_B64 = b'iVBORw0KGgoAAAANSUhEUgAAAEAAAABACAYAAACqaXHeAAAAAXNSR0IArs4c6QAAAARnQU1BAACxjwv8YQUAAAAJcEhZcwAADsMAAA7DAcdvqGQAAAdASURBVHhe7Zt/aB1FFMc/d9/uprvdTWvbmmorBaGgBURoLKy0P6iVFBFLqYj1B0F/EESsFGuxtEhro7ZtKSoWREXwD1IsrG0jWKKN2kYKa7FpVWna7u5+dmfuY+/d29272dxNd/eD8+bdnTkz35nvzOzsm/M9tLS0tLS0tLS0tLS0tLS0tLS0tLS0tLS0/3Ukp3qj5L0iGzYckj0iG7QZ0n2R/SR7R9b+J2B12iA7RjZqM6T/M9lfsvN/T2D12iA7RTZpM6T7I/tP9vgfEVi9NkitkL0iGzQZ0n2R/SZ7R9b+J2B12iA7RjZqM6T/M9lfsvN/T2D12iA7RTZpM6T7I/tP9vgfEVi9NkgtkL0iGzQZ0n2R/SZ7R9b+J2B12iA7RjZqM6T/M9lfsvN/T2D12iA7RTZpM6T7I/tP9vgfEVi9NkiZ5RzZpM2Q7ovsL9krsv8nwOq1QXYqbNNmSHdE9pfsl9n/E2B12iA7RTZpM6T7I/tP9vgfEVi9NkiZ5RzZpM2Q7ovsL9krsv8nwOq1QXYqbNNmSHdE9pfsl9n/E2B12iA7RTZpM6T7I/tP9vgfEVi9NkitkL0iGzQZ0n2R/SZ7R9b+J2B12iA7RjZqM6T/M9lfsvN/T2D12iA7RTZpM6T7I/tP9vgfEVi9NkiZ5RzZpM2Q7ovsL9krsv8nwOq1QXYqbNNmSHdE9pfsl9n/E2B12iA7RTZpM6T7I/tP9vgfEVi9NkitkL0iGzQZ0n2R/SZ7R9b+J2B12iA7RjZqM6T/M9lfsvN/T2D12iA7RTZpM6T7I/tP9vgfEVi9NkitkL0iGzQZ0n2R/SZ7R9b+J2B12iA7RjZqM6T/M9lfsvN/T2D12iA7RTZpM6T7I/tP9vgfEVi9NkitkL0iGzQZ0n2R/SZ7R9b+J2B12iA7RjZqM6T/M9lfsvN/T2D12iA7RTZpM6T7I/tP9vgfEVi9NkgtkL0iGzQZ0n2R/SZ7R9b+J2B12iA7RjZqM6T/M9lfsvN/T2D12iA7RTZpM6T7I/tP9vgfEVi9NkitkL0iGzQZ0n2R/SZ7R9b+J2B12iA7RjZqM6T/M9lfsvN/T2D12iA7RTZpM6T7I/tP9vgfEVi9NkitkL0iGzQZ0n2R/SZ7R9b+J2B12iA7RjZqM6T/M9lfsvN/T2D12iA7RTZpM6T7I/tP9vgfEVi9NkitkL0iGzQZ0n2R/SZ7R9b+J2B12iA7RjZqM6T/M9lfsvN/T2D12iA7RTZpM6T7I/tP9vgfEVi9NkjtqTvkz0uGbcZkf0s2/V/uEGD1T6p2l2zZZkj2lWy/wG+C1T6pdpds2WZI9pVsP+M3wGqf1BxyZmSTNkO6L7K/ZI/L/hOg+qfUHXLmZJM2Q7ovsr9kj8v+E6D6p9QdcuZkkzZDui+yv2SPy/4ToPqn1B1y5mSTNkO6L7K/ZI/L/hOg+qfUHXLmZJM2Q7ovsr9kj8v+E6D6p9QdcuZkkzZDui+yv2SPy/4ToPqn1B1y5mSTNkO6L7K/ZI/L/hOg+qfUHXLmZJM2Q7ovsr9kj8v+E6D6p9QdcuZkkzZDui+yv2SPy/4ToPqn1B1y5mSTNkO6L7K/ZI/L/hOg+qfUHXLmZJM2Q7ovsr9kj8v+E6D6p9QdcuZkkzZDui+yv2SPy/4ToPqn1B1y5mSTNkO6L7K/ZI/L/hOg+qfUHXLmZJM2Q7ovsr9kj8v+E6D6p9QdcuZkkzZDui+yv2SPy/4ToPqn1B1y5mSTNkO6L7K/ZI/L/hOg+qfUHXLmZJM2Q7ovsr9kj8v+E6D6p9QdcuZkkzZDui+yv2SPy/4ToPqn1B1y5mSTNkO6L7K/ZI/L/hOg+qfUHXLmZJM2Q7ovsr9kj8v+E6D6p9QdcuZkkzZDui+yv2SPy/4-A+g8S9Wl2r5sW+5gAAAABJRU5ErkJggg=='
 
@@ -53,47 +81,510 @@ def create_default_icon():
             print(f"Failed to create default icon file: {e}")
 
 
-class BuildThread(QThread):
+class QueueThread(QThread):
     """
-    Worker thread to run the PyInstaller process so the UI doesn't freeze.
+    Worker thread that builds the jobs of the build queue one after another
+    so the UI doesn't freeze. Output lines are written to a LogSink which the
+    UI drains on a timer.
+    """
+    job_started = Signal(object)
+    job_finished = Signal(object)
+
+    def __init__(self, build_queue, sink):
+        super().__init__()
+        self.build_queue = build_queue
+        self.sink = sink
+        self.current_job = None
+
+    def current_phase(self):
+        """ PyInstaller phase the current job is in, or None """
+        return self.build_queue.engine.current_phase(self.current_job.id) if self.current_job else None
+
+    def report(self, job):
+        if job.state == RUNNING:
+            self.current_job = job
+            self.job_started.emit(job)
+        else:
+            self.current_job = None
+            self.job_finished.emit(job)
+
+    def run(self):
+        """ Build queued jobs until the queue is empty """
+        try:
+            self.build_queue.run(on_line=self.sink.write, on_event=self.report)
+        except Exception as e:
+            self.sink.write(f"An error occurred: {e}")
+
+
+class BatchThread(QThread):
+    """
+    Worker thread that drives a BatchBuilder over several profiles.
     """
     progress = Signal(str)
-    finished = Signal(int)
+    finished = Signal(dict)
 
-    def __init__(self, command):
+    def __init__(self, profile_paths):
         super().__init__()
-        self.command = command
-        self.process = None
+        self.batch = BatchBuilder(profile_paths, on_progress=self.report)
+
+    def report(self, name, message):
+        self.progress.emit(f"[{name}] {message}")
 
     def run(self):
-        """ Run the command in a subprocess """
         try:
-            # Using Popen to read output in real-time
-            self.process = subprocess.Popen(
-                self.command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                encoding='utf-8',
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-            )
-
-            # Read output line by line
-            for line in iter(self.process.stdout.readline, ''):
-                self.progress.emit(line.strip())
-            
-            self.process.stdout.close()
-            return_code = self.process.wait()
-            self.finished.emit(return_code)
-
-        except FileNotFoundError:
-            self.progress.emit("Error: 'pyinstaller' not found.")
-            self.progress.emit("Please make sure PyInstaller is installed and in your system's PATH.")
-            self.progress.emit("You can install it with: pip install pyinstaller")
-            self.finished.emit(1)
+            summary = self.batch.run()
         except Exception as e:
             self.progress.emit(f"An error occurred: {e}")
-            self.finished.emit(1)
+            summary = None
+        self.finished.emit(summary or {})
+
+
+class AnalyzeThread(QThread):
+    """
+    Worker thread that scans the import graph of the selected script.
+    """
+    finished = Signal(dict)
+    failed = Signal(str)
+
+    def __init__(self, script_path, hidden_imports, excludes):
+        super().__init__()
+        self.script_path = script_path
+        self.hidden_imports = hidden_imports
+        self.excludes = excludes
+
+    def run(self):
+        try:
+            self.finished.emit(suggest_imports(self.script_path, self.hidden_imports, self.excludes))
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class ImportTimeThread(QThread):
+    """
+    Worker thread that measures the import time of the selected script.
+    """
+    finished = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, script_path):
+        super().__init__()
+        self.script_path = script_path
+
+    def run(self):
+        try:
+            self.finished.emit(profile_imports(self.script_path))
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class WatchThread(QThread):
+    """
+    Worker thread that waits for the inputs of the current profile to change.
+    On the first change it cancels the build started for the previous one
+    (emitting cancelled); changed is emitted once the burst settled.
+    """
+    cancelled = Signal(list)
+    changed = Signal(list)
+
+    def __init__(self, profile, build_queue):
+        super().__init__()
+        self.watcher = ProfileWatcher(profile)
+        self.build_queue = build_queue
+        self.job_id = None # Build of the last change, set by the window
+
+    def stop_build(self, paths):
+        job_id, self.job_id = self.job_id, None
+        if job_id and self.build_queue.cancel(job_id):
+            self.cancelled.emit(paths)
+
+    def run(self):
+        while True:
+            changes = self.watcher.next_changes(on_first=self.stop_build)
+            if changes is None:
+                break
+            self.changed.emit(changes)
+
+    def stop(self):
+        self.watcher.stop()
+        self.wait()
+        self.watcher.close()
+
+
+class LibraryScanThread(QThread):
+    """
+    Worker thread that refreshes the profile library for some directory trees.
+    """
+    finished = Signal(str)
+
+    def __init__(self, roots):
+        super().__init__()
+        self.roots = roots
+
+    def run(self):
+        # SQLite connections belong to one thread, so open a separate one here
+        files = updated = 0
+        try:
+            with ProfileLibrary() as library:
+                for root in self.roots:
+                    if os.path.isdir(root):
+                        stats = library.refresh(root)
+                        files += stats['files']
+                        updated += stats['updated']
+            self.finished.emit(f"{files} profiles indexed, {updated} updated.")
+        except Exception as e:
+            self.finished.emit(f"Failed to index profiles: {e}")
+
+
+class LogModel(QAbstractListModel):
+    """
+    Presents a LogStore to a view, which only asks for the rows on
+    screen. With a filter, the rows are the numbers of the matching lines.
+    """
+
+    def __init__(self, max_lines=None):
+        super().__init__()
+        self.store = LogStore(max_lines)
+        self.filter_kinds = None
+        self.filter_text = ''
+        self.rows = None # Line numbers shown while a filter is set
+        self.longest = 0 # Characters in the longest line so far
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows) if self.rows is not None else len(self.store)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        number = self.line_number(index.row())
+        if role == Qt.DisplayRole:
+            return self.store.line(number)
+        if role == Qt.ForegroundRole:
+            flags = self.store.flags(number)
+            for kind in (ERROR, MISSING, WARNING):
+                if flags & kind:
+                    return LOG_COLORS[kind]
+        return None
+
+    def line_number(self, row):
+        return self.rows[row] if self.rows is not None else self.store.first + row
+
+    def row_of(self, number):
+        """ Row of a line number, or None when the filter hides it """
+        if self.rows is None:
+            return number - self.store.first if number >= self.store.first else None
+        row = bisect_left(self.rows, number)
+        return row if row < len(self.rows) and self.rows[row] == number else None
+
+    def _matches(self, number, line):
+        if self.filter_text:
+            return self.filter_text in line.lower()
+        return any(self.store.flags(number) & kind for kind in self.filter_kinds)
+
+    def append_lines(self, lines):
+        if not lines:
+            return
+        self.longest = max(self.longest, max(map(len, lines)))
+        first = self.store.count
+        if self.rows is None:
+            start = len(self.store)
+            self.beginInsertRows(QModelIndex(), start, start + len(lines) - 1)
+            self.store.extend(lines)
+            self.endInsertRows()
+        else:
+            self.store.extend(lines)
+            new_rows = [first + i for i, line in enumerate(lines) if self._matches(first + i, line)]
+            if new_rows:
+                start = len(self.rows)
+                self.beginInsertRows(QModelIndex(), start, start + len(new_rows) - 1)
+                self.rows.extend(new_rows)
+                self.endInsertRows()
+        self.trim()
+
+    def trim(self):
+        """ Drop the oldest lines beyond the store's max_lines """
+        excess = self.store.excess()
+        if not excess:
+            return
+        if self.rows is None:
+            self.beginRemoveRows(QModelIndex(), 0, excess - 1)
+            self.store.trim()
+            self.endRemoveRows()
+            return
+        removed = bisect_left(self.rows, self.store.first + excess)
+        if removed:
+            self.beginRemoveRows(QModelIndex(), 0, removed - 1)
+            del self.rows[:removed]
+            self.store.trim()
+            self.endRemoveRows()
+        else:
+            self.store.trim()
+
+    def set_filter(self, kinds=None, text=''):
+        """ Show only lines flagged with kinds, or containing text (case-insensitive) """
+        self.beginResetModel()
+        self.filter_kinds = kinds
+        self.filter_text = text.lower()
+        if text:
+            self.rows = self.store.search(text)
+        elif kinds:
+            self.rows = self.store.issues(kinds)
+        else:
+            self.rows = None
+        if self.rows is not None:
+            self.rows = self.rows[:] # Extended as lines arrive; the store's index must not be
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self.store.clear()
+        self.longest = 0
+        if self.rows is not None:
+            self.rows = self.rows[:0]
+        self.endResetModel()
+
+
+class ImportSuggestionsDialog(QDialog):
+    """
+    Lets the user pick which suggested hidden imports and excludes to apply.
+    """
+
+    def __init__(self, parent, suggestions):
+        super().__init__(parent)
+        self.setWindowTitle("Import Analysis")
+        self.resize(460, 480)
+        layout = QVBoxLayout(self)
+
+        layout.addWidget(QLabel(f"Scanned {suggestions['local_files'] + 1} local modules, "
+                                f"{len(suggestions['external'])} third-party packages imported."))
+
+        layout.addWidget(QLabel("Suggested hidden imports (imported dynamically):"))
+        self.hidden_list = QListWidget()
+        for name in suggestions['hidden_imports']:
+            self.add_checkable(self.hidden_list, name, name)
+        layout.addWidget(self.hidden_list)
+
+        layout.addWidget(QLabel("Possible excludes (reached only through optional imports; "
+                                "check the ones the app can do without):"))
+        self.excludes_list = QListWidget()
+        for name, size in suggestions['excludes']:
+            self.add_checkable(self.excludes_list, f"{name}  (collects {format_size(size)})", name,
+                               checked=False)
+        layout.addWidget(self.excludes_list)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def add_checkable(self, list_widget, text, value, checked=True):
+        item = QListWidgetItem(text)
+        item.setData(Qt.UserRole, value)
+        item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+        item.setCheckState(Qt.Checked if checked else Qt.Unchecked)
+        list_widget.addItem(item)
+
+    def checked_values(self, list_widget):
+        return [list_widget.item(i).data(Qt.UserRole) for i in range(list_widget.count())
+                if list_widget.item(i).checkState() == Qt.Checked]
+
+
+class BuildHistoryDialog(QDialog):
+    """
+    Shows the recorded phase timings and peak memory of a profile's builds.
+    Values that regressed against the runs before them are highlighted.
+    """
+
+    def __init__(self, parent, history):
+        super().__init__(parent)
+        self.setWindowTitle("Build History")
+        self.resize(900, 420)
+        layout = QVBoxLayout(self)
+
+        columns = ['Date', 'Result', 'Total'] + [phase.upper() if len(phase) == 3 else phase.capitalize()
+                                                 for phase in PHASES] + ['Peak RSS']
+        metrics = ['total'] + PHASES + ['peak_rss']
+        table = QTableWidget(len(history), len(columns))
+        table.setHorizontalHeaderLabels(columns)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        table.verticalHeader().setVisible(False)
+
+        # Newest build first
+        for row, index in enumerate(range(len(history) - 1, -1, -1)):
+            record = history[index]
+            regressions = find_regressions(history, index)
+            table.setItem(row, 0, QTableWidgetItem(time.strftime('%Y-%m-%d %H:%M:%S',
+                                                                 time.localtime(record['created']))))
+            table.setItem(row, 1, QTableWidgetItem("OK" if record.get('return_code', 0) == 0 else "Failed"))
+            for column, metric in enumerate(metrics, start=2):
+                if metric == 'peak_rss':
+                    value = record.get('peak_rss')
+                    item = QTableWidgetItem(format_rss(value))
+                else:
+                    value = record['total'] if metric == 'total' else record['phases'].get(metric)
+                    item = QTableWidgetItem(format_seconds(value) if value is not None else '-')
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                if metric in regressions:
+                    item.setBackground(QColor('#f8d7da'))
+                    item.setToolTip(format_regressions({metric: regressions[metric]})[0].strip())
+                table.setItem(row, column, item)
+        layout.addWidget(table)
+
+        latest = find_regressions(history) if history else {}
+        if not history:
+            summary = "No builds recorded for this profile yet."
+        elif latest:
+            summary = "Latest build is slower than usual:\n" + "\n".join(format_regressions(latest))
+        else:
+            summary = f"{len(history)} builds recorded. No regressions in the latest build."
+        layout.addWidget(QLabel(summary))
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+
+class ProfileLibraryDialog(QDialog):
+    """
+    Searches the profiles indexed below the library folders. Accepting the
+    dialog sets action to 'load' or 'queue' for the selected profiles.
+    """
+    STATUSES = {"Any result": None, "Succeeded": 'ok', "Failed": 'failed', "Never built": 'never'}
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setWindowTitle("Profile Library")
+        self.resize(900, 520)
+        self.action = None
+        self.scan_thread = None
+        self.library = ProfileLibrary()
+        layout = QVBoxLayout(self)
+
+        folders_layout = QHBoxLayout()
+        folders_layout.addWidget(QLabel("Folders:"))
+        self.roots_combo = QComboBox()
+        folders_layout.addWidget(self.roots_combo, 1)
+        add_folder_btn = QPushButton("Add Folder...")
+        add_folder_btn.clicked.connect(self.add_folder)
+        self.remove_folder_btn = QPushButton("Remove")
+        self.remove_folder_btn.clicked.connect(self.remove_folder)
+        self.rescan_btn = QPushButton("Rescan")
+        self.rescan_btn.clicked.connect(lambda: self.rescan(self.library.roots()))
+        folders_layout.addWidget(add_folder_btn)
+        folders_layout.addWidget(self.remove_folder_btn)
+        folders_layout.addWidget(self.rescan_btn)
+        layout.addLayout(folders_layout)
+
+        search_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Name, path, script or output folder")
+        self.search_input.textChanged.connect(self.update_results)
+        self.module_input = QLineEdit()
+        self.module_input.setPlaceholderText("Module (e.g. PySide6*)")
+        self.module_input.textChanged.connect(self.update_results)
+        self.status_combo = QComboBox()
+        self.status_combo.addItems(list(self.STATUSES))
+        self.status_combo.currentTextChanged.connect(self.update_results)
+        search_layout.addWidget(self.search_input, 2)
+        search_layout.addWidget(self.module_input, 1)
+        search_layout.addWidget(self.status_combo)
+        layout.addLayout(search_layout)
+
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(['Name', 'Last Build', 'Script', 'Output', 'Profile'])
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().setVisible(False)
+        self.table.doubleClicked.connect(lambda: self.finish('load'))
+        layout.addWidget(self.table)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        load_btn = buttons.addButton("Load", QDialogButtonBox.AcceptRole)
+        load_btn.clicked.connect(lambda: self.finish('load'))
+        queue_btn = buttons.addButton("Queue Selected", QDialogButtonBox.AcceptRole)
+        queue_btn.clicked.connect(lambda: self.finish('queue'))
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+        self.update_roots()
+        self.update_results()
+        # Pick up profiles changed since the last visit
+        self.rescan(self.library.roots())
+
+    def update_roots(self):
+        self.roots_combo.clear()
+        self.roots_combo.addItems(self.library.roots())
+        self.remove_folder_btn.setEnabled(self.roots_combo.count() > 0)
+
+    def update_results(self):
+        rows = self.library.search(self.search_input.text().strip(),
+                                   module=self.module_input.text().strip() or None,
+                                   status=self.STATUSES[self.status_combo.currentText()])
+        self.table.setRowCount(len(rows))
+        for row, entry in enumerate(rows):
+            status = QTableWidgetItem(format_build_status(entry))
+            if entry['last_build_code'] not in (None, 0):
+                status.setBackground(QColor('#f8d7da'))
+            name = QTableWidgetItem(entry['name'])
+            name.setData(Qt.UserRole, entry['path'])
+            if entry['error']:
+                name.setToolTip(f"Unreadable profile: {entry['error']}")
+            self.table.setItem(row, 0, name)
+            self.table.setItem(row, 1, status)
+            self.table.setItem(row, 2, QTableWidgetItem(entry['script_path']))
+            self.table.setItem(row, 3, QTableWidgetItem(entry['output_dir']))
+            self.table.setItem(row, 4, QTableWidgetItem(entry['path']))
+        if not self.scan_thread:
+            self.status_label.setText(f"{len(rows)} matching profiles.")
+
+    def add_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Add Folder to Profile Library")
+        if folder:
+            self.rescan([folder])
+
+    def remove_folder(self):
+        self.library.remove_root(self.roots_combo.currentText())
+        self.update_roots()
+        self.update_results()
+
+    def rescan(self, roots):
+        if self.scan_thread or not roots:
+            return
+        self.rescan_btn.setEnabled(False)
+        self.status_label.setText("Scanning for profiles...")
+        self.scan_thread = LibraryScanThread(roots)
+        self.scan_thread.finished.connect(self.scan_finished)
+        self.scan_thread.start()
+
+    def scan_finished(self, message):
+        self.scan_thread.wait()
+        self.scan_thread = None
+        self.rescan_btn.setEnabled(True)
+        self.update_roots()
+        self.update_results()
+        self.status_label.setText(message)
+
+    def selected_paths(self):
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+        return [self.table.item(row, 0).data(Qt.UserRole) for row in rows]
+
+    def finish(self, action):
+        if self.selected_paths():
+            self.action = action
+            self.accept()
+
+    def done(self, result):
+        if self.scan_thread:
+            self.scan_thread.wait()
+        self.library.close()
+        super().done(result)
 
 
 class MainWindow(QMainWindow):
@@ -109,8 +600,33 @@ class MainWindow(QMainWindow):
         self.timer.timeout.connect(self.update_elapsed_time)
         self.start_time = 0
 
+        # Timer that moves buffered build output into the log view in chunks
+        self.log_sink = LogSink()
+        self.log_timer = QTimer(self)
+        self.log_timer.setInterval(FLUSH_INTERVAL_MS)
+        self.log_timer.timeout.connect(self.flush_log)
+
+        # Builds are queued on disk and run one after another
+        self.build_queue = BuildQueue()
+        self.queue_thread = None
+        self.queue_results = []
+        self.closing = False
+        self.queue_refresh_timer = QTimer(self)
+        self.queue_refresh_timer.setInterval(2000) # Also shows jobs queued from the command line
+        self.queue_refresh_timer.timeout.connect(self.refresh_queue)
+
         self.setup_ui()
-        self.build_thread = None
+        self.batch_thread = None
+        self.analyze_thread = None
+        self.import_time_thread = None
+        self.watch_thread = None
+        self._log_targets = None
+        self.profile_path = None # File the current settings were loaded from or saved to
+        self._log_targets_key = None # (find text, log version) the jump targets were computed for
+
+        self.refresh_queue()
+        self.queue_refresh_timer.start()
+        self.resume_queue()
 
     def setup_ui(self):
         """ Set up all UI elements """
@@ -149,10 +665,41 @@ class MainWindow(QMainWindow):
         self.onefile_check = QCheckBox("One-File Mode (single .exe)")
         self.noconsole_check = QCheckBox("Disable Console Window")
         self.shutdown_check = QCheckBox("Shutdown when done")
+        self.cache_check = QCheckBox("Use build cache")
+        self.cache_check.setChecked(True)
+        self.incremental_check = QCheckBox("Incremental build (reuse analysis)")
+        self.incremental_check.setChecked(True)
+        self.dedupe_check = QCheckBox("Deduplicate data files (linked staging)")
+        self.upx_check = QCheckBox("Compress with UPX (when installed)")
+        self.upx_check.setChecked(True)
+        self.zip_check = QCheckBox("Create ZIP deployment")
+        self.zip_method_combo = QComboBox()
+        self.zip_method_combo.addItems(list(ZIP_METHODS))
+        self.zip_method_combo.setCurrentText('lzma')
+        self.zip_level_combo = QComboBox()
+        self.zip_level_combo.addItems([str(i) for i in range(10)])
+        self.zip_level_combo.setCurrentText('6')
+        
+        self.timeout_combo = QComboBox()
+        self.timeout_combo.addItems(list(BUILD_TIMEOUTS))
+
+        self.cpu_priority_combo = QComboBox()
+        self.cpu_priority_combo.addItems(list(CPU_PRIORITIES))
+        self.cpu_priority_combo.setToolTip("Lower priorities leave the CPU to other work on the machine")
+        self.io_priority_combo = QComboBox()
+        self.io_priority_combo.addItems(list(IO_PRIORITIES))
+        self.io_priority_combo.setToolTip("'idle' only reads and writes when no one else needs the disk (Linux)")
+        self.memory_limit_combo = QComboBox()
+        self.memory_limit_combo.addItems(list(MEMORY_LIMITS))
+        self.memory_limit_combo.setToolTip("A build that needs more memory than this is stopped, "
+                                           "instead of slowing down or crashing the machine")
         
         self.cores_combo = QComboBox()
         self.cores_combo.addItems([str(i) for i in range(1, os.cpu_count() + 1)])
         self.cores_combo.setCurrentText(str(os.cpu_count()))
+        self.cores_combo.setToolTip("Cores shared by all running builds: each PyInstaller run takes one, "
+                                    "hashing, staging and ZIP compression use the rest")
+        self.cores_combo.currentTextChanged.connect(self.update_core_budget)
         
         self.icon_input = QLineEdit()
         self.icon_input.setPlaceholderText("Select icon file (.ico)")
@@ -162,11 +709,28 @@ class MainWindow(QMainWindow):
         comp_opts_layout.addWidget(self.onefile_check, 0, 0, 1, 2)
         comp_opts_layout.addWidget(self.noconsole_check, 1, 0, 1, 2)
         comp_opts_layout.addWidget(self.shutdown_check, 2, 0, 1, 2)
-        comp_opts_layout.addWidget(QLabel("Compilation Cores:"), 3, 0)
-        comp_opts_layout.addWidget(self.cores_combo, 3, 1)
-        comp_opts_layout.addWidget(QLabel("Select Icon (.ico)"), 4, 0)
-        comp_opts_layout.addWidget(self.icon_input, 5, 0, 1, 2)
-        comp_opts_layout.addWidget(browse_icon_btn, 6, 1)
+        comp_opts_layout.addWidget(self.cache_check, 3, 0, 1, 2)
+        comp_opts_layout.addWidget(self.incremental_check, 4, 0, 1, 2)
+        comp_opts_layout.addWidget(self.dedupe_check, 5, 0, 1, 2)
+        comp_opts_layout.addWidget(self.upx_check, 6, 0, 1, 2)
+        comp_opts_layout.addWidget(self.zip_check, 7, 0, 1, 2)
+        comp_opts_layout.addWidget(QLabel("ZIP Compression:"), 8, 0)
+        comp_opts_layout.addWidget(self.zip_method_combo, 8, 1)
+        comp_opts_layout.addWidget(QLabel("ZIP Level:"), 9, 0)
+        comp_opts_layout.addWidget(self.zip_level_combo, 9, 1)
+        comp_opts_layout.addWidget(QLabel("Compilation Cores:"), 10, 0)
+        comp_opts_layout.addWidget(self.cores_combo, 10, 1)
+        comp_opts_layout.addWidget(QLabel("Build Timeout:"), 11, 0)
+        comp_opts_layout.addWidget(self.timeout_combo, 11, 1)
+        comp_opts_layout.addWidget(QLabel("CPU Priority:"), 12, 0)
+        comp_opts_layout.addWidget(self.cpu_priority_combo, 12, 1)
+        comp_opts_layout.addWidget(QLabel("I/O Priority:"), 13, 0)
+        comp_opts_layout.addWidget(self.io_priority_combo, 13, 1)
+        comp_opts_layout.addWidget(QLabel("Memory Limit:"), 14, 0)
+        comp_opts_layout.addWidget(self.memory_limit_combo, 14, 1)
+        comp_opts_layout.addWidget(QLabel("Select Icon (.ico)"), 15, 0)
+        comp_opts_layout.addWidget(self.icon_input, 16, 0, 1, 2)
+        comp_opts_layout.addWidget(browse_icon_btn, 17, 1)
         
         options_version_layout.addWidget(comp_opts_group)
 
@@ -202,6 +766,9 @@ class MainWindow(QMainWindow):
         self.files_list = QListWidget()
         self.folders_list = QListWidget()
         self.modules_list = QListWidget()
+        self.excludes_list = QListWidget()
+        self.import_cost_list = QListWidget()
+        self.import_cost_list.setToolTip("Startup import cost per top-level package of the last profiling run")
 
         add_file_btn = QPushButton("Add Files...")
         add_file_btn.clicked.connect(self.add_files)
@@ -218,6 +785,17 @@ class MainWindow(QMainWindow):
         remove_module_btn = QPushButton("Remove Selected")
         remove_module_btn.clicked.connect(lambda: self.remove_selected(self.modules_list))
 
+        add_exclude_btn = QPushButton("Add Exclude...")
+        add_exclude_btn.clicked.connect(self.add_exclude)
+        remove_exclude_btn = QPushButton("Remove Selected")
+        remove_exclude_btn.clicked.connect(lambda: self.remove_selected(self.excludes_list))
+
+        self.analyze_btn = QPushButton("Analyze Imports...")
+        self.analyze_btn.clicked.connect(self.analyze_imports)
+        self.import_time_btn = QPushButton("Profile Import Time")
+        self.import_time_btn.clicked.connect(self.profile_import_time)
+        self.import_time_check = QCheckBox("Profile before each build")
+
         additional_layout.addWidget(QLabel("Include Files:"), 0, 0)
         additional_layout.addWidget(self.files_list, 1, 0)
         additional_layout.addWidget(add_file_btn, 2, 0)
@@ -233,19 +811,94 @@ class MainWindow(QMainWindow):
         additional_layout.addWidget(add_module_btn, 2, 2)
         additional_layout.addWidget(remove_module_btn, 3, 2)
 
+        additional_layout.addWidget(QLabel("Exclude Modules:"), 0, 3)
+        additional_layout.addWidget(self.excludes_list, 1, 3)
+        additional_layout.addWidget(add_exclude_btn, 2, 3)
+        additional_layout.addWidget(remove_exclude_btn, 3, 3)
+        additional_layout.addWidget(self.analyze_btn, 4, 2, 1, 2)
+
+        additional_layout.addWidget(QLabel("Import Cost (startup):"), 0, 4)
+        additional_layout.addWidget(self.import_cost_list, 1, 4)
+        additional_layout.addWidget(self.import_time_btn, 2, 4)
+        additional_layout.addWidget(self.import_time_check, 3, 4)
+
+        # --- Build Queue Section ---
+        queue_group = QGroupBox("Build Queue")
+        queue_layout = QGridLayout(queue_group)
+        self.queue_list = QListWidget()
+        self.queue_list.setMaximumHeight(110)
+        self.priority_combo = QComboBox()
+        self.priority_combo.addItems(["High", "Normal", "Low"])
+        self.priority_combo.setCurrentText("Normal")
+        cancel_job_btn = QPushButton("Cancel Job")
+        cancel_job_btn.clicked.connect(self.cancel_job)
+        raise_job_btn = QPushButton("Raise Priority")
+        raise_job_btn.clicked.connect(lambda: self.change_job_priority(1))
+        lower_job_btn = QPushButton("Lower Priority")
+        lower_job_btn.clicked.connect(lambda: self.change_job_priority(-1))
+        clear_jobs_btn = QPushButton("Clear Finished")
+        clear_jobs_btn.clicked.connect(self.clear_finished_jobs)
+
+        queue_layout.addWidget(self.queue_list, 0, 0, 5, 1)
+        queue_layout.addWidget(QLabel("New Job Priority:"), 0, 1)
+        queue_layout.addWidget(self.priority_combo, 0, 2)
+        queue_layout.addWidget(cancel_job_btn, 1, 1, 1, 2)
+        queue_layout.addWidget(raise_job_btn, 2, 1)
+        queue_layout.addWidget(lower_job_btn, 2, 2)
+        queue_layout.addWidget(clear_jobs_btn, 3, 1, 1, 2)
+
         # --- Compilation Log Section ---
         log_group = QGroupBox("Compilation Log")
         log_layout = QVBoxLayout(log_group)
 
         log_header_layout = QHBoxLayout()
         self.elapsed_time_label = QLabel("Elapsed Time: 00:00:00")
+        self.log_limit_combo = QComboBox()
+        self.log_limit_combo.addItems(["Unlimited", "100000", "1000000", "5000000"])
+        self.log_limit_combo.setCurrentText("1000000")
+        self.log_limit_combo.currentTextChanged.connect(self.set_log_limit)
+        self.log_filter_combo = QComboBox()
+        self.log_filter_combo.addItems(list(LOG_FILTERS))
+        self.log_filter_combo.currentTextChanged.connect(self.apply_log_filter)
+        self.log_find_input = QLineEdit()
+        self.log_find_input.setPlaceholderText("Find in log (Enter: next match)")
+        self.log_find_input.returnPressed.connect(lambda: self.jump_log(forward=True))
+        self.log_find_input.textChanged.connect(self.log_find_changed)
+        prev_issue_btn = QPushButton("Previous")
+        prev_issue_btn.setToolTip("Previous match, or previous warning/error when the find box is empty")
+        prev_issue_btn.clicked.connect(lambda: self.jump_log(forward=False))
+        next_issue_btn = QPushButton("Next")
+        next_issue_btn.setToolTip("Next match, or next warning/error when the find box is empty")
+        next_issue_btn.clicked.connect(lambda: self.jump_log(forward=True))
+        self.log_counts_label = QLabel()
+        log_header_layout.addWidget(QLabel("Keep Log Lines:"))
+        log_header_layout.addWidget(self.log_limit_combo)
+        log_header_layout.addWidget(QLabel("Show:"))
+        log_header_layout.addWidget(self.log_filter_combo)
+        log_header_layout.addWidget(self.log_find_input, 1)
+        log_header_layout.addWidget(prev_issue_btn)
+        log_header_layout.addWidget(next_issue_btn)
+        log_header_layout.addWidget(self.log_counts_label)
         log_header_layout.addStretch()
         log_header_layout.addWidget(self.elapsed_time_label)
 
-        self.log_output = QTextEdit()
-        self.log_output.setReadOnly(True)
+        # Lines live in a compact store; the view only renders the rows on screen.
+        # A table with fixed row heights needs no per-row layout, unlike QListView.
+        self.log_model = LogModel()
+        self.log_output = QTableView()
+        self.log_output.setModel(self.log_model)
         self.log_output.setFont(QFont("Courier", 9))
-        self.log_output.setLineWrapMode(QTextEdit.NoWrap)
+        self.log_output.setShowGrid(False)
+        self.log_output.setWordWrap(False)
+        self.log_output.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.log_output.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.log_output.horizontalHeader().hide()
+        self.log_output.horizontalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.log_output.verticalHeader().hide()
+        self.log_output.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.log_output.verticalHeader().setDefaultSectionSize(self.log_output.fontMetrics().height() + 2)
+        QShortcut(QKeySequence.Copy, self.log_output, self.copy_log_selection)
+        self.set_log_limit(self.log_limit_combo.currentText())
 
         log_layout.addLayout(log_header_layout)
         log_layout.addWidget(self.log_output)
@@ -254,31 +907,47 @@ class MainWindow(QMainWindow):
         bottom_buttons_layout = QHBoxLayout()
         self.load_profile_btn = QPushButton("Load Profile")
         self.load_profile_btn.clicked.connect(self.load_profile)
+        self.library_btn = QPushButton("Profile Library...")
+        self.library_btn.clicked.connect(self.show_profile_library)
         self.save_profile_btn = QPushButton("Save Profile")
         self.save_profile_btn.clicked.connect(self.save_profile)
         self.reload_ui_btn = QPushButton("Reload UI")
         self.reload_ui_btn.clicked.connect(self.reset_ui)
         self.preview_cmd_btn = QPushButton("Preview Command")
         self.preview_cmd_btn.clicked.connect(self.preview_command)
+        self.history_btn = QPushButton("Build History")
+        self.history_btn.clicked.connect(self.show_build_history)
         clear_log_btn = QPushButton("Clear Log")
-        clear_log_btn.clicked.connect(self.log_output.clear)
+        clear_log_btn.clicked.connect(self.clear_log)
         self.start_btn = QPushButton("Start Compilation")
         self.start_btn.setStyleSheet("background-color: #4CAF50; color: white; padding: 8px;")
         self.start_btn.clicked.connect(self.start_build)
+        self.batch_btn = QPushButton("Batch Build...")
+        self.batch_btn.clicked.connect(self.start_batch_build)
+        self.watch_btn = QPushButton("Watch && Rebuild")
+        self.watch_btn.setCheckable(True)
+        self.watch_btn.setToolTip("Rebuild automatically when the script, its local imports "
+                                  "or the included files change")
+        self.watch_btn.toggled.connect(self.toggle_watch)
         
         bottom_buttons_layout.addWidget(self.load_profile_btn)
         bottom_buttons_layout.addWidget(self.save_profile_btn)
+        bottom_buttons_layout.addWidget(self.library_btn)
         bottom_buttons_layout.addStretch(1)
         bottom_buttons_layout.addWidget(self.reload_ui_btn)
         bottom_buttons_layout.addWidget(self.preview_cmd_btn)
+        bottom_buttons_layout.addWidget(self.history_btn)
         bottom_buttons_layout.addWidget(clear_log_btn)
         bottom_buttons_layout.addStretch(1)
+        bottom_buttons_layout.addWidget(self.batch_btn)
+        bottom_buttons_layout.addWidget(self.watch_btn)
         bottom_buttons_layout.addWidget(self.start_btn)
 
         # --- Add all groups to the main layout ---
         main_layout.addWidget(input_group)
         main_layout.addLayout(options_version_layout)
         main_layout.addWidget(additional_group)
+        main_layout.addWidget(queue_group)
         main_layout.addWidget(log_group)
         main_layout.addLayout(bottom_buttons_layout)
 
@@ -302,6 +971,11 @@ class MainWindow(QMainWindow):
         if file_path:
             self.icon_input.setText(file_path)
     
+    def update_core_budget(self, text):
+        """ Resize the core budget shared by builds started from this window """
+        if text:
+            default_budget().resize(int(text))
+    
     def add_files(self):
         files, _ = QFileDialog.getOpenFileNames(self, "Add Additional Files", "", "All Files (*)")
         if files:
@@ -317,7 +991,95 @@ class MainWindow(QMainWindow):
         module_name, ok = QInputDialog.getText(self, "Add Hidden Module", "Enter module name (e.g., 'PySide6.QtXml'):")
         if ok and module_name:
             self.modules_list.addItem(module_name)
+
+    def add_exclude(self):
+        module_name, ok = QInputDialog.getText(self, "Add Excluded Module", "Enter module name (e.g., 'tkinter'):")
+        if ok and module_name:
+            self.excludes_list.addItem(module_name)
+
+    def list_values(self, list_widget):
+        return [list_widget.item(i).text() for i in range(list_widget.count())]
+
+    def analyze_imports(self):
+        """ Scan the script's import graph and offer hidden imports / excludes """
+        script_path = self.script_input.text()
+        if not script_path:
+            self.show_error("Python script not selected!", "Please select a Python script file to analyze.")
+            return
+        if self.analyze_thread and self.analyze_thread.isRunning():
+            return
+
+        self.update_log(f"Analyzing imports of {script_path}...")
+        self.analyze_btn.setEnabled(False)
+        self.analyze_thread = AnalyzeThread(script_path, self.list_values(self.modules_list),
+                                            self.list_values(self.excludes_list))
+        self.analyze_thread.finished.connect(self.analysis_finished)
+        self.analyze_thread.failed.connect(self.analysis_failed)
+        self.analyze_thread.start()
+
+    def analysis_finished(self, suggestions):
+        self.analyze_btn.setEnabled(True)
+        self.update_log(f"Import analysis: {len(suggestions['hidden_imports'])} hidden import and "
+                        f"{len(suggestions['excludes'])} exclude suggestions.")
+        if not suggestions['hidden_imports'] and not suggestions['excludes']:
+            return
+        dialog = ImportSuggestionsDialog(self, suggestions)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        for name in dialog.checked_values(dialog.hidden_list):
+            self.modules_list.addItem(name)
+        for name in dialog.checked_values(dialog.excludes_list):
+            self.excludes_list.addItem(name)
+
+    def analysis_failed(self, message):
+        self.analyze_btn.setEnabled(True)
+        self.show_error("Analysis Error", f"Failed to analyze imports: {message}")
     
+    def profile_import_time(self):
+        """ Run the script's imports under -X importtime and list the cost per package """
+        script_path = self.script_input.text()
+        if not script_path:
+            self.show_error("Python script not selected!", "Please select a Python script file to profile.")
+            return
+        if self.import_time_thread and self.import_time_thread.isRunning():
+            return
+
+        self.update_log(f"Profiling the imports of {script_path}...")
+        self.import_time_btn.setEnabled(False)
+        self.import_time_thread = ImportTimeThread(script_path)
+        self.import_time_thread.finished.connect(self.import_time_finished)
+        self.import_time_thread.failed.connect(self.import_time_failed)
+        self.import_time_thread.start()
+
+    def import_time_finished(self, result):
+        self.import_time_btn.setEnabled(True)
+        self.import_cost_list.clear()
+        hidden = set(self.list_values(self.modules_list))
+        for package in result.packages:
+            item = QListWidgetItem(f"{package['name']}  {package['cumulative_ms']:.0f} ms"
+                                   f"{'  (import lazily)' if package['lazy'] else ''}")
+            details = [f"{package['modules']} modules, {package['self_ms']:.1f} ms in its own code"]
+            if package['lazy']:
+                details.append("Only used inside functions in: " +
+                               ", ".join(os.path.basename(path) for path in package['lazy']))
+                item.setForeground(QColor('#b36b00'))
+            if any(name.split('.')[0] == package['name'] for name in hidden):
+                details.append("Listed as a hidden import")
+            item.setToolTip("\n".join(details))
+            self.import_cost_list.addItem(item)
+        summary = f"Import time: {result.total_ms:.0f} ms over {len(result.packages)} packages"
+        if result.lazy_candidates:
+            summary += f", {len(result.lazy_candidates)} could be imported lazily"
+        self.update_log(summary + ".")
+        if result.timed_out:
+            self.update_log("Warning: the script kept running at import time; results are partial.")
+        if result.error:
+            self.update_log(f"Warning: the script failed while importing: {result.error}")
+
+    def import_time_failed(self, message):
+        self.import_time_btn.setEnabled(True)
+        self.show_error("Import Profiling Error", f"Failed to profile imports: {message}")
+
     def remove_selected(self, list_widget):
         for item in list_widget.selectedItems():
             list_widget.takeItem(list_widget.row(item))
@@ -325,110 +1087,337 @@ class MainWindow(QMainWindow):
     # --- FUNCTIONS FOR BUILD PROCESS ---
     def get_pyinstaller_command(self):
         """ Build the PyInstaller command list based on UI inputs """
-        script_path = self.script_input.text()
-        if not script_path:
+        if not self.script_input.text():
             self.show_error("Python script not selected!", "Please select a Python script file to compile.")
             return None
-
-        command = ['pyinstaller', '--noconfirm']
-        
-        # Basic options
-        if self.onefile_check.isChecked():
-            command.append('--onefile')
-        if self.noconsole_check.isChecked():
-            command.append('--windowed') # or --noconsole
-        
-        # Cores
-        command.extend(['--nproc', self.cores_combo.currentText()])
-
-        # Icon
-        if self.icon_input.text():
-            command.extend(['--icon', self.icon_input.text()])
-            
-        # Output directory
-        output_dir = self.output_dir_input.text() or os.path.dirname(script_path)
-        command.extend(['--distpath', os.path.join(output_dir, 'dist')])
-        command.extend(['--workpath', os.path.join(output_dir, 'build')])
-        command.extend(['--specpath', output_dir])
-
-        # Files, Folders, Modules
-        for i in range(self.files_list.count()):
-            file_path = self.files_list.item(i).text()
-            # Format: 'source;destination_folder'
-            # We place it in the root (.)
-            command.extend(['--add-data', f'{file_path}{os.pathsep}.'])
-
-        for i in range(self.folders_list.count()):
-            folder_path = self.folders_list.item(i).text()
-            folder_name = os.path.basename(folder_path)
-            command.extend(['--add-data', f'{folder_path}{os.pathsep}{folder_name}'])
-        
-        for i in range(self.modules_list.count()):
-            command.extend(['--hidden-import', self.modules_list.item(i).text()])
-
-        # Add the main script at the end
-        command.append(script_path)
-        
-        return command
+        return build_command(self.get_profile_data())
 
     def preview_command(self):
         command = self.get_pyinstaller_command()
         if command:
             # Use subprocess.list2cmdline to show an 'executable' command string
             cmd_string = subprocess.list2cmdline(command)
-            self.log_output.append("--- PREVIEW COMMAND ---\n" + cmd_string + "\n-----------------------\n")
-            self.log_output.moveCursor(QTextCursor.End)
+            self.update_log("--- PREVIEW COMMAND ---\n" + cmd_string + "\n-----------------------\n")
+
+    def show_build_history(self):
+        """ Show phase timings and peak memory of previous builds of this profile """
+        if not self.script_input.text():
+            self.show_error("Python script not selected!", "Please select a Python script file first.")
+            return
+        BuildHistoryDialog(self, load_history(self.get_profile_data())).exec()
 
     def start_build(self):
         command = self.get_pyinstaller_command()
         if not command:
             return
 
-        if self.build_thread and self.build_thread.isRunning():
+        if self.batch_thread and self.batch_thread.isRunning():
+            self.show_error("Build in Progress", "A batch build is running. Please wait.")
+            return
+
+        priority = {"High": 1, "Normal": 0, "Low": -1}[self.priority_combo.currentText()]
+        job = self.build_queue.submit(self.get_profile_data(), priority=priority)
+        if self.is_queue_running():
+            self.update_log(f"Queued build of {job.name} ({job.id}).")
+        self.refresh_queue()
+        self.start_queue()
+
+    def toggle_watch(self, checked):
+        """ Start or stop rebuilding the current profile whenever its inputs change """
+        if not checked:
+            if self.watch_thread:
+                self.watch_thread.stop()
+                self.watch_thread = None
+                self.update_log("Stopped watching for changes.")
+            return
+        if not self.script_input.text():
+            self.show_error("Python script not selected!", "Please select a Python script file to watch.")
+            self.watch_btn.setChecked(False)
+            return
+        try:
+            self.watch_thread = WatchThread(self.get_profile_data(), self.build_queue)
+        except OSError as e:
+            self.show_error("Watch Error", f"Failed to watch the profile's files: {e}")
+            self.watch_btn.setChecked(False)
+            return
+        self.watch_thread.cancelled.connect(self.watch_cancelled)
+        self.watch_thread.changed.connect(self.watch_changed)
+        self.watch_thread.start()
+        watcher = self.watch_thread.watcher
+        self.update_log(f"Watching {len(watcher.files)} files and {len(watcher.folders)} folders "
+                        f"for changes ({watcher.backend.name}).")
+
+    def watch_cancelled(self, paths):
+        self.update_log(f"Changed: {describe_changes(paths)}, stopping the outdated build...")
+
+    def watch_changed(self, paths):
+        if not self.watch_thread:
+            return
+        if self.batch_thread and self.batch_thread.isRunning():
+            self.update_log(f"Changed: {describe_changes(paths)} (not rebuilt during a batch build)")
+            return
+        profile = self.get_profile_data()
+        # Local imports may have been added or removed by the edit
+        self.watch_thread.watcher.set_profile(profile)
+        job = self.build_queue.submit(profile, priority=1)
+        self.watch_thread.job_id = job.id
+        self.refresh_queue()
+        self.start_queue()
+        self.update_log(f"Changed: {describe_changes(paths)}, rebuilding ({job.id}).")
+
+    def is_queue_running(self):
+        return bool(self.queue_thread and self.queue_thread.isRunning())
+
+    def is_building(self):
+        return self.is_queue_running() or bool(self.batch_thread and self.batch_thread.isRunning())
+
+    def start_queue(self):
+        """ Start working through the build queue unless already doing so """
+        if self.is_queue_running():
+            return
+        self.clear_log()
+        self.queue_results = []
+        self.log_sink = LogSink()
+        self.queue_thread = QueueThread(self.build_queue, self.log_sink)
+        self.queue_thread.job_started.connect(self.job_started)
+        self.queue_thread.job_finished.connect(self.job_finished)
+        self.queue_thread.finished.connect(self.queue_finished)
+        self.log_timer.start()
+        self.queue_thread.start()
+        self.set_queue_state(running=True)
+
+    def resume_queue(self):
+        """ Continue builds left queued or running when the app was last closed """
+        recovered = self.build_queue.recover()
+        pending = self.build_queue.pending_count()
+        if pending:
+            self.start_queue()
+            self.update_log(f"Resuming {pending} queued build(s)"
+                            + (f", restarting {len(recovered)} interrupted." if recovered else "."))
+
+    def job_started(self, job):
+        self.flush_log()
+        self.update_log(f"\n=== Building {job.name} ({job.id}), attempt {job.attempts} ===")
+        self.start_time = time.time()
+        self.timer.start(1000) # Update every 1 second
+        self.refresh_queue()
+
+    def job_finished(self, job):
+        self.timer.stop()
+        self.flush_log() # Display whatever is still buffered
+        self.update_elapsed_time() # Final update
+
+        if job.state == SUCCEEDED:
+            self.update_log(f"\n--- COMPILATION SUCCESSFUL! ({job.name}) ---")
+        elif job.state == CANCELLED:
+            self.update_log(f"\n--- COMPILATION CANCELLED ({job.name}) ---")
+        elif job.state == QUEUED:
+            self.update_log(f"\n--- COMPILATION INTERRUPTED ({job.name}), will resume ---")
+        else:
+            self.update_log(f"\n--- COMPILATION FAILED! ({job.name}) ---")
+        if job.state in FINISHED_STATES:
+            self.queue_results.append(job.state)
+        self.refresh_queue()
+
+    def queue_finished(self):
+        self.timer.stop()
+        self.log_timer.stop()
+        self.flush_log()
+        if self.build_queue.pending_count() and not self.closing:
+            # Submitted while the runner was winding down
+            self.queue_thread = None
+            self.start_queue()
+            return
+        self.set_queue_state(running=False)
+        self.refresh_queue()
+        succeeded = self.queue_results and all(state == SUCCEEDED for state in self.queue_results)
+        if succeeded and self.shutdown_check.isChecked() and not self.closing:
+            self.close()
+
+    def refresh_queue(self):
+        """ Show the current queue, keeping the selected job selected """
+        selected = self.selected_job_id()
+        self.queue_list.clear()
+        for job in self.build_queue.jobs():
+            text = f"[{job.state}] {job.name}"
+            if job.priority:
+                text += f"  (priority {job.priority:+d})"
+            if job.started:
+                text += f"  {job.elapsed:.0f}s"
+            item = QListWidgetItem(text)
+            item.setData(Qt.UserRole, job.id)
+            item.setToolTip(job.log_path)
+            self.queue_list.addItem(item)
+            if job.id == selected:
+                item.setSelected(True)
+
+    def selected_job_id(self):
+        items = self.queue_list.selectedItems()
+        return items[0].data(Qt.UserRole) if items else None
+
+    def cancel_job(self):
+        job_id = self.selected_job_id()
+        if job_id and self.build_queue.cancel(job_id):
+            self.update_log(f"Cancelled job {job_id}.")
+        self.refresh_queue()
+
+    def change_job_priority(self, delta):
+        job_id = self.selected_job_id()
+        job = next((j for j in self.build_queue.jobs() if j.id == job_id), None)
+        if job and job.state == QUEUED:
+            self.build_queue.set_priority(job_id, job.priority + delta)
+        self.refresh_queue()
+
+    def clear_finished_jobs(self):
+        self.build_queue.clear_finished()
+        self.refresh_queue()
+
+    def start_batch_build(self):
+        """ Build several saved profiles in parallel """
+        if self.is_building():
             self.show_error("Build in Progress", "A build is already running. Please wait.")
             return
+        profile_paths, _ = QFileDialog.getOpenFileNames(self, "Select Profiles to Build", "", "Macan Profile Builder (*.mpb)")
+        if not profile_paths:
+            return
 
-        self.log_output.clear()
-        self.log_output.append("Starting compilation...\n")
+        self.clear_log()
+        self.batch_thread = BatchThread(profile_paths)
+        self.update_log(f"Starting batch build of {len(profile_paths)} profiles "
+                               f"with {self.batch_thread.batch.max_workers} workers...\n")
+        self.batch_thread.progress.connect(self.update_log)
+        self.batch_thread.finished.connect(self.batch_finished)
 
-        self.build_thread = BuildThread(command)
-        self.build_thread.progress.connect(self.update_log)
-        self.build_thread.finished.connect(self.build_finished)
-        
         self.start_time = time.time()
-        self.timer.start(1000) # Update every 1 second
-        
-        self.build_thread.start()
+        self.timer.start(1000)
+
+        self.batch_thread.start()
         self.set_ui_state(enabled=False)
 
+    def batch_finished(self, summary):
+        self.timer.stop()
+        self.update_elapsed_time()
+        if summary:
+            self.update_log("\n--- BATCH SUMMARY ---")
+            for line in format_summary(summary):
+                self.update_log(line)
+        self.set_ui_state(enabled=True)
+
     def update_log(self, text):
-        self.log_output.append(text)
-        self.log_output.moveCursor(QTextCursor.End)
+        self.append_log_lines(text.split("\n"))
+
+    def flush_log(self):
+        """ Append every buffered build line in a single model update """
+        self.append_log_lines(self.log_sink.drain())
+
+    def append_log_lines(self, lines):
+        if not lines:
+            return
+        scrollbar = self.log_output.verticalScrollBar()
+        # Follow the end of the log unless the user scrolled up to read
+        following = scrollbar.value() >= scrollbar.maximum()
+        self.log_model.append_lines(lines)
+        # Wide enough for the longest line: column widths are not measured from the rows
+        width = (self.log_model.longest + 2) * self.log_output.fontMetrics().horizontalAdvance('M')
+        if width > self.log_output.columnWidth(0):
+            self.log_output.setColumnWidth(0, width)
+        if following:
+            self.log_output.scrollToBottom()
+        self.update_log_counts()
+
+    def update_log_counts(self):
+        store = self.log_model.store
+        counts = [f"{len(store.index[kind])} {KIND_NAMES[kind]}" for kind in (ERROR, WARNING, MISSING)
+                  if store.index[kind]]
+        self.log_counts_label.setText(", ".join(counts))
+
+    def clear_log(self):
+        self.log_model.clear()
+        self.update_log_counts()
+
+    def set_log_limit(self, text):
+        """ Limit the number of lines kept in the log view (0 = unlimited) """
+        self.log_model.store.max_lines = None if text == "Unlimited" else int(text)
+        self.log_model.trim()
+
+    def apply_log_filter(self, text=None):
+        """ Show all lines, only warnings/errors/missing modules, or only find matches """
+        kinds = LOG_FILTERS[self.log_filter_combo.currentText()]
+        if kinds == 'search':
+            self.log_model.set_filter(text=self.log_find_input.text())
+        else:
+            self.log_model.set_filter(kinds)
+        self.log_output.scrollToBottom()
+
+    def log_find_changed(self, text):
+        if LOG_FILTERS[self.log_filter_combo.currentText()] == 'search':
+            self.apply_log_filter()
+
+    def jump_log(self, forward=True):
+        """ Select the next (or previous) find match, or warning/error if the find box is empty """
+        store = self.log_model.store
+        text = self.log_find_input.text()
+        key = (text, store.version)
+        if self._log_targets_key != key:
+            # Reused until the log changes, so stepping through matches does not search again
+            self._log_targets = store.search(text) if text else store.issues()
+            self._log_targets_key = key
+        targets = self._log_targets
+        if not len(targets):
+            return
+        current = self.log_output.currentIndex()
+        if current.isValid():
+            number = self.log_model.line_number(current.row())
+        else:
+            number = store.first - 1 if forward else store.count
+        if forward:
+            target = store.next_line(targets, number)
+            target = targets[0] if target is None else target # Wrap around
+        else:
+            target = store.previous_line(targets, number)
+            target = targets[-1] if target is None else target
+        row = self.log_model.row_of(target)
+        if row is None:
+            # Hidden by the current filter: show everything again
+            self.log_filter_combo.setCurrentText("All Lines")
+            row = self.log_model.row_of(target)
+        if row is None:
+            return # Trimmed meanwhile
+        index = self.log_model.index(row)
+        self.log_output.setCurrentIndex(index)
+        self.log_output.scrollTo(index, QAbstractItemView.PositionAtCenter)
+
+    def copy_log_selection(self):
+        rows = sorted(index.row() for index in self.log_output.selectionModel().selectedIndexes())
+        store = self.log_model.store
+        QApplication.clipboard().setText("\n".join(store.line(self.log_model.line_number(row)) for row in rows))
 
     def update_elapsed_time(self):
         elapsed = int(time.time() - self.start_time)
         hours, remainder = divmod(elapsed, 3600)
         minutes, seconds = divmod(remainder, 60)
-        self.elapsed_time_label.setText(f"Elapsed Time: {hours:02}:{minutes:02}:{seconds:02}")
-
-    def build_finished(self, return_code):
-        self.timer.stop()
-        self.update_elapsed_time() # Final update
-        
-        if return_code == 0:
-            self.log_output.append("\n--- COMPILATION SUCCESSFUL! ---")
-            if self.shutdown_check.isChecked():
-                self.close()
+        text = f"Elapsed Time: {hours:02}:{minutes:02}:{seconds:02}"
+        phase = self.queue_thread.current_phase() if self.is_queue_running() else None
+        if phase:
+            text += f" ({phase})"
+        self.elapsed_time_label.setText(text)
+
+    def set_queue_state(self, running):
+        """ Builds can still be queued while the queue runs; only batch builds wait """
+        self.batch_btn.setEnabled(not running)
+        if running:
+            self.start_btn.setText("Add to Queue")
+            self.start_btn.setStyleSheet("background-color: #f44336; color: white; padding: 8px;")
         else:
-            self.log_output.append("\n--- COMPILATION FAILED! ---")
-        
-        self.log_output.moveCursor(QTextCursor.End)
-        self.set_ui_state(enabled=True)
+            self.start_btn.setText("Start Compilation")
+            self.start_btn.setStyleSheet("background-color: #4CAF50; color: white; padding: 8px;")
 
     def set_ui_state(self, enabled):
         """ Enable/Disable UI controls during the build process """
         self.start_btn.setEnabled(enabled)
+        self.batch_btn.setEnabled(enabled)
         self.preview_cmd_btn.setEnabled(enabled)
+        self.watch_btn.setEnabled(enabled)
         self.load_profile_btn.setEnabled(enabled)
         self.save_profile_btn.setEnabled(enabled)
         self.reload_ui_btn.setEnabled(enabled)
@@ -442,20 +1431,28 @@ class MainWindow(QMainWindow):
 
     # --- PROFILE SAVE/LOAD AND UI RESET ---
 
-    def save_profile(self):
-        """Saves the current UI configuration to a .mpb file."""
-        file_path, _ = QFileDialog.getSaveFileName(self, "Save Profile", "", "Macan Profile Builder (*.mpb)")
-        if not file_path:
-            return
-
-        profile_data = {
+    def get_profile_data(self):
+        """ Collect the current UI configuration into a profile dict """
+        return {
             'script_path': self.script_input.text(),
             'output_dir': self.output_dir_input.text(),
             'icon_path': self.icon_input.text(),
             'one_file': self.onefile_check.isChecked(),
             'no_console': self.noconsole_check.isChecked(),
             'shutdown': self.shutdown_check.isChecked(),
+            'use_cache': self.cache_check.isChecked(),
+            'incremental': self.incremental_check.isChecked(),
+            'dedupe_data': self.dedupe_check.isChecked(),
+            'use_upx': self.upx_check.isChecked(),
+            'profile_imports': self.import_time_check.isChecked(),
+            'deploy_zip': self.zip_check.isChecked(),
+            'zip_method': self.zip_method_combo.currentText(),
+            'zip_level': int(self.zip_level_combo.currentText()),
+            'build_timeout': BUILD_TIMEOUTS[self.timeout_combo.currentText()],
             'cores': self.cores_combo.currentText(),
+            'nice': CPU_PRIORITIES[self.cpu_priority_combo.currentText()],
+            'io_priority': self.io_priority_combo.currentText(),
+            'memory_limit_mb': MEMORY_LIMITS[self.memory_limit_combo.currentText()],
             'product_name': self.product_name_input.text(),
             'product_version': self.product_version_input.text(),
             'file_version': self.file_version_input.text(),
@@ -464,11 +1461,70 @@ class MainWindow(QMainWindow):
             'included_files': [self.files_list.item(i).text() for i in range(self.files_list.count())],
             'included_folders': [self.folders_list.item(i).text() for i in range(self.folders_list.count())],
             'included_modules': [self.modules_list.item(i).text() for i in range(self.modules_list.count())],
+            'excluded_modules': [self.excludes_list.item(i).text() for i in range(self.excludes_list.count())],
         }
 
+    def apply_profile_data(self, profile_data):
+        """ Apply a profile dict to the UI """
+        # The core budget is shared by every build of the window: loading a
+        # profile shows its cores setting but leaves the budget alone
+        with QSignalBlocker(self.cores_combo):
+            self.reset_ui() # Clear existing settings first
+        self.script_input.setText(profile_data['script_path'])
+        self.output_dir_input.setText(profile_data['output_dir'])
+        self.icon_input.setText(profile_data['icon_path'])
+        self.onefile_check.setChecked(profile_data['one_file'])
+        self.noconsole_check.setChecked(profile_data['no_console'])
+        self.shutdown_check.setChecked(profile_data['shutdown'])
+        self.cache_check.setChecked(profile_data['use_cache'])
+        self.incremental_check.setChecked(profile_data['incremental'])
+        self.dedupe_check.setChecked(profile_data['dedupe_data'])
+        self.upx_check.setChecked(profile_data['use_upx'])
+        self.import_time_check.setChecked(profile_data['profile_imports'])
+        self.zip_check.setChecked(profile_data['deploy_zip'])
+        self.zip_method_combo.setCurrentText(profile_data['zip_method'])
+        self.zip_level_combo.setCurrentText(str(profile_data['zip_level']))
+        timeout = profile_data['build_timeout']
+        if timeout not in BUILD_TIMEOUTS.values():
+            # A custom value from a hand-edited profile
+            BUILD_TIMEOUTS[f"{timeout} s"] = timeout
+            self.timeout_combo.addItem(f"{timeout} s")
+        self.timeout_combo.setCurrentText(next(k for k, v in BUILD_TIMEOUTS.items() if v == timeout))
+        with QSignalBlocker(self.cores_combo):
+            self.cores_combo.setCurrentText(str(profile_data['cores']))
+        nice = profile_data['nice']
+        if nice not in CPU_PRIORITIES.values():
+            CPU_PRIORITIES[f"Nice {nice}"] = nice
+            self.cpu_priority_combo.addItem(f"Nice {nice}")
+        self.cpu_priority_combo.setCurrentText(next(k for k, v in CPU_PRIORITIES.items() if v == nice))
+        self.io_priority_combo.setCurrentText(profile_data['io_priority'])
+        memory_limit = profile_data['memory_limit_mb']
+        if memory_limit not in MEMORY_LIMITS.values():
+            MEMORY_LIMITS[f"{memory_limit} MB"] = memory_limit
+            self.memory_limit_combo.addItem(f"{memory_limit} MB")
+        self.memory_limit_combo.setCurrentText(next(k for k, v in MEMORY_LIMITS.items() if v == memory_limit))
+        self.product_name_input.setText(profile_data['product_name'])
+        self.product_version_input.setText(profile_data['product_version'])
+        self.file_version_input.setText(profile_data['file_version'])
+        self.file_description_input.setText(profile_data['file_description'])
+        self.copyright_input.setText(profile_data['copyright'])
+        
+        for file in profile_data['included_files']: self.files_list.addItem(file)
+        for folder in profile_data['included_folders']: self.folders_list.addItem(folder)
+        for module in profile_data['included_modules']: self.modules_list.addItem(module)
+        for module in profile_data['excluded_modules']: self.excludes_list.addItem(module)
+
+    def save_profile(self):
+        """Saves the current UI configuration to a .mpb file."""
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Profile", "", "Macan Profile Builder (*.mpb)")
+        if not file_path:
+            return
+
         try:
-            with open(file_path, 'w') as f:
-                json.dump(profile_data, f, indent=4)
+            # Saving over the loaded profile keeps its base and appends
+            same_file = self.profile_path and os.path.abspath(file_path) == os.path.abspath(self.profile_path)
+            save_profile_file(file_path, self.get_profile_data(), update=bool(same_file))
+            self.profile_path = file_path
             self.update_log(f"Profile saved to: {file_path}")
         except Exception as e:
             self.show_error("Save Error", f"Failed to save profile: {e}")
@@ -480,33 +1536,48 @@ class MainWindow(QMainWindow):
             return
 
         try:
-            with open(file_path, 'r') as f:
-                profile_data = json.load(f)
+            profile_data = load_profile_file(file_path)
         except Exception as e:
             self.show_error("Load Error", f"Failed to load or parse profile file: {e}")
             return
 
         # Apply the loaded data to the UI
-        self.reset_ui() # Clear existing settings first
-        self.script_input.setText(profile_data.get('script_path', ''))
-        self.output_dir_input.setText(profile_data.get('output_dir', ''))
-        self.icon_input.setText(profile_data.get('icon_path', ''))
-        self.onefile_check.setChecked(profile_data.get('one_file', False))
-        self.noconsole_check.setChecked(profile_data.get('no_console', False))
-        self.shutdown_check.setChecked(profile_data.get('shutdown', False))
-        self.cores_combo.setCurrentText(profile_data.get('cores', str(os.cpu_count())))
-        self.product_name_input.setText(profile_data.get('product_name', ''))
-        self.product_version_input.setText(profile_data.get('product_version', ''))
-        self.file_version_input.setText(profile_data.get('file_version', ''))
-        self.file_description_input.setText(profile_data.get('file_description', ''))
-        self.copyright_input.setText(profile_data.get('copyright', ''))
-        
-        for file in profile_data.get('included_files', []): self.files_list.addItem(file)
-        for folder in profile_data.get('included_folders', []): self.folders_list.addItem(folder)
-        for module in profile_data.get('included_modules', []): self.modules_list.addItem(module)
-        
+        self.apply_profile_data(profile_data)
+        self.profile_path = file_path
         self.update_log(f"Profile loaded from: {file_path}")
 
+    def show_profile_library(self):
+        """ Search indexed profiles, then load one or queue several """
+        dialog = ProfileLibraryDialog(self)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        paths = dialog.selected_paths()
+        try:
+            profiles = [(path, load_profile_file(path)) for path in paths]
+        except Exception as e:
+            self.show_error("Load Error", f"Failed to load or parse profile file: {e}")
+            return
+
+        if dialog.action == 'load':
+            path, profile_data = profiles[0]
+            self.apply_profile_data(profile_data)
+            self.profile_path = path
+            self.update_log(f"Profile loaded from: {path}")
+            return
+
+        if self.batch_thread and self.batch_thread.isRunning():
+            self.show_error("Build in Progress", "A batch build is running. Please wait.")
+            return
+        priority = {"High": 1, "Normal": 0, "Low": -1}[self.priority_combo.currentText()]
+        for path, profile_data in profiles:
+            if not profile_data['script_path']:
+                self.update_log(f"Skipped {path}: profile has no script.")
+                continue
+            job = self.build_queue.submit(profile_data, priority=priority, name=profile_name(profile_data, path))
+            self.update_log(f"Queued build of {job.name} ({job.id}).")
+        self.refresh_queue()
+        self.start_queue()
+
     def reset_ui(self):
         """Resets all UI fields to their default state."""
         self.script_input.clear()
@@ -516,8 +1587,20 @@ class MainWindow(QMainWindow):
         self.onefile_check.setChecked(False)
         self.noconsole_check.setChecked(False)
         self.shutdown_check.setChecked(False)
+        self.cache_check.setChecked(True)
+        self.incremental_check.setChecked(True)
+        self.dedupe_check.setChecked(False)
+        self.upx_check.setChecked(True)
+        self.import_time_check.setChecked(False)
+        self.zip_check.setChecked(False)
+        self.zip_method_combo.setCurrentText('lzma')
+        self.zip_level_combo.setCurrentText('6')
+        self.timeout_combo.setCurrentText("None")
         
         self.cores_combo.setCurrentText(str(os.cpu_count()))
+        self.cpu_priority_combo.setCurrentText("Normal")
+        self.io_priority_combo.setCurrentText("normal")
+        self.memory_limit_combo.setCurrentText("None")
         
         self.product_name_input.clear()
         self.product_version_input.clear()
@@ -528,6 +1611,8 @@ class MainWindow(QMainWindow):
         self.files_list.clear()
         self.folders_list.clear()
         self.modules_list.clear()
+        self.excludes_list.clear()
+        self.import_cost_list.clear()
         
         self.update_log("UI has been reset to default values.")
 
@@ -536,19 +1621,28 @@ class MainWindow(QMainWindow):
         QMessageBox.critical(self, title, message)
 
     def closeEvent(self, event):
-        if self.build_thread and self.build_thread.isRunning():
-            reply = QMessageBox.question(self, 'Confirm Exit', 
-                                         "A build is currently in progress. Are you sure you want to exit?",
+        if self.is_building() and not self.closing:
+            message = "A build is currently in progress. Are you sure you want to exit?"
+            if self.is_queue_running():
+                message += "\nQueued and running builds will resume the next time Python Builder starts."
+            reply = QMessageBox.question(self, 'Confirm Exit', message,
                                          QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
 
             if reply == QMessageBox.Yes:
-                if self.build_thread.process:
-                    self.build_thread.process.terminate() # Forcefully stop the subprocess
-                self.build_thread.terminate() # Terminate the thread
+                self.closing = True
+                self.watch_btn.setChecked(False)
+                if self.batch_thread and self.batch_thread.isRunning():
+                    self.batch_thread.batch.cancel() # Stop queued and running batch builds
+                    self.batch_thread.wait(5000)
+                if self.is_queue_running():
+                    # Kill the running build's process tree and keep it queued
+                    self.build_queue.stop(requeue=True)
+                    self.queue_thread.wait(10000)
                 event.accept()
             else:
                 event.ignore()
         else:
+            self.watch_btn.setChecked(False)
             event.accept()
 
 
@@ -0,0 +1,716 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Command Line
+# Description: Headless entry point for build agents. Loads .mpb profiles and
+#              runs the same PyInstaller command the GUI would, without
+#              importing Qt.
+#
+# Usage:
+#   python -m python_builder_cli build profile.mpb
+#   python -m python_builder_cli command profile.mpb
+#   python -m python_builder_cli watch profile.mpb
+#   python -m python_builder_cli batch a.mpb b.mpb --workers 4 --cores 8
+#   python -m python_builder_cli analyze profile.mpb
+#   python -m python_builder_cli imports profile.mpb --top 20
+#   python -m python_builder_cli report profile.mpb --diff
+#   python -m python_builder_cli deploy profile.mpb --method lzma --level 9
+#   python -m python_builder_cli history profile.mpb
+#   python -m python_builder_cli logs grep "ModuleNotFoundError" --profile profile.mpb
+#   python -m python_builder_cli logs diff --profile profile.mpb
+#   python -m python_builder_cli queue add a.mpb b.mpb --priority 1
+#   python -m python_builder_cli queue run
+#   python -m python_builder_cli worker serve --listen 0.0.0.0:7321 --token SECRET
+#   python -m python_builder_cli distribute *.mpb --worker build1:7321 --worker build2:7321
+#   python -m python_builder_cli library scan ~/projects
+#   python -m python_builder_cli library search gui --module PySide6* --status failed
+#   python -m python_builder_cli stale tools/*.mpb --run
+#   python -m python_builder_cli stage profile.mpb
+#   python -m python_builder_cli bench profile.mpb --matrix --args=--version
+
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+from builder_core import load_profile_file, save_profile_file, build_command, profile_name
+
+
+def _load_command(profile_path):
+    profile = load_profile_file(profile_path)
+    command = build_command(profile)
+    if not command:
+        raise ValueError(f"{profile_path}: profile has no script_path")
+    return profile, command
+
+
+def _apply_cores(args):
+    """ Size the core budget shared by concurrent builds and their stages """
+    if args.cores:
+        from core_budget import default_budget
+        default_budget().resize(args.cores)
+
+
+def cmd_command(args):
+    """ Print the PyInstaller command for a profile """
+    from version_resource import write_version_file
+    profile, command = _load_command(args.profile)
+    # The command may be run by hand: make the version file it names exist
+    write_version_file(profile)
+    print(subprocess.list2cmdline(command))
+    return 0
+
+
+def cmd_build(args):
+    """ Build a single profile, streaming PyInstaller output to stdout """
+    # Imported here: asyncio and the build pipeline take ~120 ms to load
+    from build_engine import run_build
+    profile = load_profile_file(args.profile)
+    result = run_build(profile, on_line=lambda line: print(line, flush=True),
+                       use_cache=not args.no_cache, timeout=args.timeout)
+    if result.cached:
+        return 0
+
+    if result.error.startswith("'pyinstaller' not found"):
+        print("Please make sure PyInstaller is installed and in your system's PATH.", file=sys.stderr)
+    status = 'SUCCESSFUL' if result.succeeded else ('TIMED OUT' if result.timed_out else 'FAILED')
+    print(f"\n--- COMPILATION {status} ({result.elapsed:.1f}s) ---")
+    if result.log_id:
+        print(f"Log archived as {result.log_id}")
+    return 0 if result.succeeded else max(result.return_code, 1)
+
+
+def cmd_watch(args):
+    """ Build a profile, then rebuild it whenever its inputs or the profile change """
+    from file_watch import watch_builds
+
+    def load():
+        profile = load_profile_file(args.profile)
+        if not profile['script_path']:
+            raise ValueError(f"{args.profile}: profile has no script_path")
+        return profile
+
+    def status(message):
+        print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+    watch_builds(load, args.profile, on_line=None if args.quiet else (lambda line: print(line, flush=True)),
+                 on_status=status, polling=args.poll)
+    return 0
+
+
+def cmd_batch(args):
+    """ Build several profiles in parallel and print the summary """
+    # Imported here so 'command' stays as light as possible
+    from batch_builder import BatchBuilder, LOG_DIR, format_summary
+
+    _apply_cores(args)
+    batch = BatchBuilder(
+        args.profiles,
+        max_workers=args.workers,
+        log_dir=args.log_dir or LOG_DIR,
+        use_cache=not args.no_cache,
+        timeout=args.timeout,
+        on_progress=lambda name, message: print(f"[{name}] {message}", flush=True),
+    )
+    print(f"Building {len(args.profiles)} profiles with {batch.max_workers} workers...")
+    summary = batch.run()
+    print()
+    for line in format_summary(summary):
+        print(line)
+    return 0 if summary['failed'] == 0 else 1
+
+
+def cmd_analyze(args):
+    """ Print hidden-import and exclude suggestions for a profile's script """
+    from import_graph import suggest, format_size
+
+    profile = load_profile_file(args.profile)
+    if not profile['script_path']:
+        raise ValueError(f"{args.profile}: profile has no script_path")
+    suggestions = suggest(profile['script_path'], profile['included_modules'],
+                          profile['excluded_modules'], workers=args.workers)
+
+    print(f"Third-party packages: {', '.join(suggestions['external']) or '-'}")
+    print("Suggested hidden imports:")
+    for name in suggestions['hidden_imports']:
+        print(f"  --hidden-import {name}")
+    print("Possible excludes (reached only through optional imports):")
+    for name, size in suggestions['excludes']:
+        print(f"  --exclude-module {name:<20} collects {format_size(size)}")
+
+    suggested_excludes = [name for name, _ in suggestions['excludes']]
+    unknown = [name for name in args.exclude if name not in suggested_excludes]
+    if unknown:
+        raise ValueError(f"not among the suggested excludes: {', '.join(unknown)}")
+    if args.apply:
+        # Excludes are never applied wholesale; each one is opted into with --exclude
+        profile['included_modules'].extend(suggestions['hidden_imports'])
+        profile['excluded_modules'].extend(args.exclude)
+        save_profile_file(args.profile, profile, update=True)
+        print(f"Suggestions applied to {args.profile}")
+    return 0
+
+
+def cmd_imports(args):
+    """ Print what importing a profile's script costs, per top-level package """
+    import json
+    from import_profile import profile_imports, format_import_profile
+
+    profile = load_profile_file(args.profile)
+    if not profile['script_path']:
+        raise ValueError(f"{args.profile}: profile has no script_path")
+    result = profile_imports(profile['script_path'], python=args.python, timeout=args.timeout)
+    if args.json:
+        print(json.dumps(result.to_dict(), indent=4))
+    else:
+        for line in format_import_profile(result, top=args.top):
+            print(line)
+    return 0
+
+
+def cmd_report(args):
+    """ Print the size report of a profile's current build output """
+    import json
+    from bundle_report import find_artifact, analyze_artifact, load_previous_report, format_report
+
+    profile, command = _load_command(args.profile)
+    artifact = find_artifact(command)
+    if artifact is None:
+        raise ValueError(f"{args.profile}: no build output found, build the profile first")
+    report = analyze_artifact(artifact).to_dict()
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return 0
+    previous = load_previous_report(profile) if args.diff else None
+    for line in format_report(report, previous, top=args.top):
+        print(line)
+    return 0
+
+
+def cmd_deploy(args):
+    """ Pack a profile's current build output into a ZIP archive """
+    from bundle_report import find_artifact
+    from zip_deploy import deploy_zip, DEFAULT_LEVELS
+
+    profile, command = _load_command(args.profile)
+    artifact = find_artifact(command)
+    if artifact is None:
+        raise ValueError(f"{args.profile}: no build output found, build the profile first")
+    method = args.method or profile['zip_method']
+    level = args.level
+    if level is None:
+        level = profile['zip_level'] if method == profile['zip_method'] else DEFAULT_LEVELS.get(method)
+    zip_path = args.output or os.path.join(os.path.dirname(os.path.dirname(artifact)),
+                                           os.path.splitext(os.path.basename(artifact))[0] + '.zip')
+
+    result = deploy_zip(artifact, zip_path, method=method, level=level, workers=args.workers)
+    ratio = result['output_size'] / result['input_size'] * 100 if result['input_size'] else 100
+    print(f"{result['archive']}: {result['members']} members, {result['input_size']} -> "
+          f"{result['output_size']} bytes ({ratio:.0f}%), {result['method']} level {result['level']}, "
+          f"{result['elapsed']:.1f}s on {result['workers']} threads")
+    return 0
+
+
+def cmd_history(args):
+    """ Print the phase timings of previous builds and flag regressions """
+    import json
+    from build_timing import load_history, format_history
+
+    history = load_history(load_profile_file(args.profile))
+    if args.json:
+        print(json.dumps(history[-args.last:], indent=4))
+        return 0
+    for line in format_history(history, last=args.last):
+        print(line)
+    return 0
+
+
+def _archived_logs(args):
+    """ Archived logs, oldest first, of --profile (a .mpb file or a profile name) """
+    from log_archive import list_logs, log_state
+
+    entries = list_logs()
+    if args.profile:
+        if os.path.isfile(args.profile):
+            from builder_core import profile_id
+            identity = profile_id(load_profile_file(args.profile))
+            entries = [e for e in entries if e['profile_id'] == identity]
+        else:
+            entries = [e for e in entries if e['profile'] == args.profile]
+    if getattr(args, 'failed', False):
+        entries = [e for e in entries if log_state(e) in ('failed', 'timed out')]
+    return entries
+
+
+def cmd_logs(args):
+    """ List, show, search and compare the archived output of previous builds """
+    from log_archive import find_log, format_logs, read_lines, grep_logs, diff_logs, log_state
+
+    entries = _archived_logs(args)
+    if args.logs_action == 'list':
+        for line in format_logs(entries[-args.last:]):
+            print(line)
+    elif args.logs_action == 'show':
+        for line in read_lines(find_log(args.log, entries)['path']):
+            print(line)
+    elif args.logs_action == 'grep':
+        selected = [find_log(reference, entries) for reference in args.logs] or entries[-args.last:]
+        found = False
+        # Newest first: the latest builds are usually the interesting ones
+        for entry, line_number, line in grep_logs(args.pattern, reversed(selected),
+                                                  ignore_case=args.ignore_case, fixed=args.fixed):
+            found = True
+            print(f"{entry['id']} {entry['profile']}:{line_number}: {line}")
+        return 0 if found else 1
+    elif args.logs_action == 'diff':
+        finished = [e for e in entries if e['finished']]
+        new = find_log(args.new, entries) if args.new else (finished[-1] if finished else None)
+        if new is None:
+            raise ValueError("No archived builds to compare")
+        if args.old:
+            old = find_log(args.old, entries)
+        else:
+            # The last successful build of the same profile before the new one
+            passed = [e for e in finished if e['profile_id'] == new['profile_id'] and
+                      e['started'] < new['started'] and log_state(e) == 'ok']
+            if not passed:
+                raise ValueError(f"No successful build of {new['profile']} before {new['id']} to compare with")
+            old = passed[-1]
+        print(f"Comparing {old['id']} ({log_state(old)}) with {new['id']} ({log_state(new)})")
+        for line in diff_logs(old, new, context=args.context, normalize=not args.exact):
+            print(line)
+    return 0
+
+
+def cmd_queue(args):
+    """ Manage the persistent build queue shared with the window """
+    from build_queue import BuildQueue, FAILED, format_jobs
+
+    build_queue = BuildQueue()
+    if args.queue_action == 'add':
+        for profile_path in args.profiles:
+            profile = load_profile_file(profile_path)
+            if not profile['script_path']:
+                raise ValueError(f"{profile_path}: profile has no script_path")
+            job = build_queue.submit(profile, priority=args.priority,
+                                     name=profile_name(profile, profile_path))
+            print(f"Queued {job.name} as {job.id}")
+    elif args.queue_action == 'list':
+        for line in format_jobs(build_queue.jobs()):
+            print(line)
+    elif args.queue_action == 'cancel':
+        for job_id in args.jobs:
+            print(f"{job_id}: {'cancelled' if build_queue.cancel(job_id, wait=True) else 'not queued or running'}")
+    elif args.queue_action == 'priority':
+        if build_queue.set_priority(args.job, args.priority) is None:
+            raise ValueError(f"No job {args.job}")
+    elif args.queue_action == 'clear':
+        build_queue.clear_finished()
+    elif args.queue_action == 'run':
+        _apply_cores(args)
+
+        def report(job):
+            print(f"[{job.name}] {job.state}" + (f" ({job.elapsed:.1f}s)" if job.finished else ""), flush=True)
+
+        start_time = time.time()
+        try:
+            build_queue.run(on_line=(lambda line: print(line, flush=True)) if args.verbose else None,
+                            on_event=report, wait=args.wait)
+        except KeyboardInterrupt:
+            # Keep the interrupted job for the next run
+            build_queue.stop(requeue=True)
+            raise
+        jobs = build_queue.jobs()
+        failed = [job for job in jobs if job.state == FAILED and job.finished and job.finished >= start_time]
+        return 1 if failed else 0
+    return 0
+
+
+def _token(args):
+    from build_workers import TOKEN_ENV
+    return args.token or os.environ.get(TOKEN_ENV) or None
+
+
+def cmd_worker(args):
+    """ Run a build worker daemon, or show the status of workers """
+    from build_workers import serve, worker_status
+
+    if args.worker_action == 'serve':
+        def log(message):
+            print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+        serve(args.listen, token=_token(args), slots=args.slots, log=log)
+        return 0
+    workers = worker_status(args.workers, token=_token(args))
+    for worker in workers:
+        print(worker.describe())
+    return 0 if all(worker.available for worker in workers) else 1
+
+
+def cmd_distribute(args):
+    """ Build several profiles on remote build workers """
+    from build_workers import Coordinator, REMOTE_LOG_DIR, format_distribution
+    from batch_builder import format_summary
+
+    def progress(name, message):
+        print(f"[{name}] {message}", flush=True)
+
+    coordinator = Coordinator(args.worker, token=_token(args), log_dir=args.log_dir or REMOTE_LOG_DIR,
+                              use_cache=not args.no_cache, timeout=args.timeout, on_progress=progress)
+    summary = coordinator.run(args.profiles)
+    print()
+    for line in format_summary(summary):
+        print(line)
+    for line in format_distribution(summary):
+        print(line)
+    return 0 if summary['failed'] == 0 else 1
+
+
+def cmd_library(args):
+    """ Index profiles below directory trees and search the index """
+    import json
+    from profile_library import ProfileLibrary, format_build_status
+
+    with ProfileLibrary() as library:
+        if args.library_action == 'scan':
+            for root in args.roots:
+                if not os.path.isdir(root):
+                    raise ValueError(f"{root}: not a directory")
+                stats = library.refresh(root)
+                print(f"{os.path.abspath(root)}: {stats['files']} profiles, {stats['updated']} updated, "
+                      f"{stats['removed']} removed ({stats['elapsed']:.2f}s)")
+        elif args.library_action == 'roots':
+            for root in library.roots():
+                print(root)
+        elif args.library_action == 'forget':
+            for root in args.roots:
+                library.remove_root(root)
+        elif args.library_action == 'search':
+            if args.refresh:
+                for root in library.roots():
+                    if os.path.isdir(root):
+                        library.refresh(root)
+            rows = library.search(args.text, module=args.module, script=args.script, output=args.output,
+                                  status=args.status, limit=args.limit)
+            if args.json:
+                for row in rows:
+                    row['modules'] = library.modules(row['path'])
+                print(json.dumps(rows, indent=4))
+                return 0
+            for row in rows:
+                print(f"{row['name']:<24} {format_build_status(row):<24} {row['path']}")
+            print(f"{len(rows)} profile(s)")
+    return 0
+
+
+def cmd_stale(args):
+    """ Queue builds of the profiles whose inputs changed since their last successful build """
+    from profile_model import load_profiles
+    from freshness import check_profiles
+
+    paths = list(args.profiles)
+    if args.library:
+        from profile_library import ProfileLibrary
+        with ProfileLibrary() as library:
+            for root in library.roots():
+                if os.path.isdir(root):
+                    library.refresh(root)
+            paths += [row['path'] for row in library.search() if row['script_path']]
+    if not paths:
+        raise ValueError("No profiles given (pass .mpb files or --library)")
+
+    start_time = time.time()
+    profiles = []
+    for path, profile in zip(paths, load_profiles(paths)):
+        if isinstance(profile, Exception):
+            print(f"Skipping {profile}", file=sys.stderr)
+        else:
+            profiles.append((path, profile.to_dict()))
+    results = check_profiles([(profile_name(profile, path), profile) for path, profile in profiles],
+                             workers=args.workers)
+    stale = []
+    for (path, profile), result in zip(profiles, results):
+        print(f"{result.name:<24} {result.describe()}")
+        if result.stale:
+            stale.append((path, profile))
+    print(f"{len(stale)} of {len(results)} profiles need a build ({time.time() - start_time:.2f}s)")
+    if args.dry_run or not stale:
+        return 0
+
+    from build_queue import BuildQueue
+    build_queue = BuildQueue()
+    for path, profile in stale:
+        job = build_queue.submit(profile, priority=args.priority, name=profile_name(profile, path))
+        print(f"Queued {job.name} as {job.id}")
+    if args.run:
+        return cmd_queue(argparse.Namespace(queue_action='run', verbose=False, wait=False, cores=None))
+    return 0
+
+
+def cmd_stage(args):
+    """ Build the deduplicated data staging tree of a profile and report the savings """
+    from data_staging import stage_data, staging_root, format_staging_report
+
+    profile = load_profile_file(args.profile)
+    if not (profile['included_files'] or profile['included_folders']):
+        raise ValueError(f"{args.profile}: profile includes no data files")
+    for line in format_staging_report(stage_data(profile)):
+        print(line)
+    print(f"Staging tree: {staging_root(profile)}")
+    if not profile['dedupe_data']:
+        print("Note: 'dedupe_data' is off for this profile, so builds do not use the staging tree yet.")
+    return 0
+
+
+def cmd_bench(args):
+    """ Measure startup time and memory of a profile's executable, optionally per build mode """
+    import json
+    import shlex
+    from startup_bench import (
+        bench_artifact, build_variant, available_variants, save_result, format_results, VARIANTS,
+        BenchmarkError
+    )
+    from bundle_report import find_artifact
+
+    profile, command = _load_command(args.profile)
+    launch_args = shlex.split(args.args or '')
+    variants = list(VARIANTS) if args.matrix else args.variant
+    if variants:
+        missing = [v for v in variants if v not in available_variants()]
+        if missing and not args.matrix:
+            raise ValueError(f"Cannot build {', '.join(missing)}: upx is not on PATH")
+        variants = [v for v in variants if v not in missing]
+        if missing:
+            print(f"Skipping {', '.join(missing)}: upx is not on PATH")
+        targets = []
+        for variant in variants:
+            print(f"Building {variant}...", flush=True)
+            try:
+                targets.append((variant, build_variant(profile, variant, on_line=print if args.verbose else None)))
+            except BenchmarkError as e:
+                print(f"Error: {e}", file=sys.stderr)
+                return 1
+    else:
+        artifact = find_artifact(command)
+        if artifact is None:
+            raise ValueError(f"{args.profile}: no build output found, build the profile first")
+        targets = [(None, artifact)]
+
+    results = []
+    for variant, artifact in targets:
+        print(f"Launching {os.path.basename(artifact)}{f' ({variant})' if variant else ''} "
+              f"{args.cold_runs} cold + {args.runs} warm times...", flush=True)
+        try:
+            result = bench_artifact(artifact, runs=args.runs, cold_runs=args.cold_runs, args=launch_args,
+                                    ready=args.ready, timeout=args.timeout)
+        except BenchmarkError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        result['variant'] = variant
+        save_result(profile, result)
+        results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+    else:
+        for line in format_results(results):
+            print(line)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python_builder_cli',
+        description="Headless Python Builder: build .mpb profiles with PyInstaller."
+    )
+    subparsers = parser.add_subparsers(dest='action', required=True)
+
+    p = subparsers.add_parser('command', help="print the PyInstaller command for a profile")
+    p.add_argument('profile')
+    p.set_defaults(func=cmd_command)
+
+    p = subparsers.add_parser('build', help="build a single profile")
+    p.add_argument('profile')
+    p.add_argument('--no-cache', action='store_true', help="always run PyInstaller")
+    p.add_argument('--timeout', type=float, default=None, help="stop the build after this many seconds")
+    p.set_defaults(func=cmd_build)
+
+    p = subparsers.add_parser('watch', help="rebuild a profile whenever its script, imports or data change")
+    p.add_argument('profile')
+    p.add_argument('--quiet', '-q', action='store_true', help="only show status lines, not build output")
+    p.add_argument('--poll', action='store_true', help="poll for changes instead of using inotify")
+    p.set_defaults(func=cmd_watch)
+
+    p = subparsers.add_parser('batch', help="build several profiles in parallel")
+    p.add_argument('profiles', nargs='+')
+    p.add_argument('--workers', type=int, default=None, help="worker count (default: sized to cores and memory)")
+    p.add_argument('--cores', type=int, default=None,
+                   help="cores shared by the builds and their stages (default: all, or $PYTHON_BUILDER_CORES)")
+    p.add_argument('--log-dir', default=None, help="directory for per-build logs")
+    p.add_argument('--no-cache', action='store_true', help="always run PyInstaller")
+    p.add_argument('--timeout', type=float, default=None, help="stop each build after this many seconds")
+    p.set_defaults(func=cmd_batch)
+
+    p = subparsers.add_parser('analyze', help="suggest hidden imports and excludes for a profile")
+    p.add_argument('profile')
+    p.add_argument('--workers', type=int, default=None, help="scanner processes (default: all cores)")
+    p.add_argument('--apply', action='store_true',
+                   help="write the suggested hidden imports (and any --exclude) into the profile")
+    p.add_argument('--exclude', action='append', default=[], metavar='NAME',
+                   help="with --apply, also exclude this suggested package (repeatable)")
+    p.set_defaults(func=cmd_analyze)
+
+    p = subparsers.add_parser('imports', help="measure the import time of a profile's script per package")
+    p.add_argument('profile')
+    p.add_argument('--top', type=int, default=25, help="packages to show")
+    p.add_argument('--python', default=None, help="interpreter to run the script with (default: this one)")
+    p.add_argument('--timeout', type=float, default=30.0, help="seconds allowed for the script's imports")
+    p.add_argument('--json', action='store_true', help="print every package as JSON")
+    p.set_defaults(func=cmd_imports)
+
+    p = subparsers.add_parser('report', help="show what went into a profile's build output")
+    p.add_argument('profile')
+    p.add_argument('--top', type=int, default=25, help="entries to show per section")
+    p.add_argument('--diff', action='store_true', help="compare with the last recorded build")
+    p.add_argument('--json', action='store_true', help="print the full report as JSON")
+    p.set_defaults(func=cmd_report)
+
+    p = subparsers.add_parser('deploy', help="pack a profile's build output into a ZIP archive")
+    p.add_argument('profile')
+    p.add_argument('--method', choices=['stored', 'deflated', 'bzip2', 'lzma'], default=None,
+                   help="compression method (default: from the profile)")
+    p.add_argument('--level', type=int, default=None, help="compression level")
+    p.add_argument('--workers', type=int, default=None, help="compression threads (default: all cores)")
+    p.add_argument('--output', default=None, help="archive path (default: <output>/<name>.zip)")
+    p.set_defaults(func=cmd_deploy)
+
+    p = subparsers.add_parser('history', help="show phase timings and peak memory of previous builds")
+    p.add_argument('profile')
+    p.add_argument('--last', type=int, default=15, help="number of builds to show")
+    p.add_argument('--json', action='store_true', help="print the raw records as JSON")
+    p.set_defaults(func=cmd_history)
+
+    p = subparsers.add_parser('logs', help="list, show, search and compare archived build logs")
+    logs_actions = p.add_subparsers(dest='logs_action', required=True)
+    q = logs_actions.add_parser('list', help="show archived builds, newest last")
+    q.add_argument('--last', type=int, default=25, help="number of builds to show")
+    q.add_argument('--failed', action='store_true', help="only failed or timed out builds")
+    q = logs_actions.add_parser('show', help="print an archived log")
+    q.add_argument('log', help="log id, or the start of one")
+    q = logs_actions.add_parser('grep', help="search archived logs, newest first")
+    q.add_argument('pattern', help="regular expression")
+    q.add_argument('logs', nargs='*', help="log ids to search (default: the --last builds)")
+    q.add_argument('--last', type=int, default=50, help="number of builds to search")
+    q.add_argument('--failed', action='store_true', help="only failed or timed out builds")
+    q.add_argument('--ignore-case', '-i', action='store_true')
+    q.add_argument('--fixed', '-F', action='store_true', help="pattern is plain text, not a regex")
+    q = logs_actions.add_parser('diff', help="compare two archived logs")
+    q.add_argument('old', nargs='?', help="default: the last successful build before the new one")
+    q.add_argument('new', nargs='?', help="default: the latest build")
+    q.add_argument('--context', '-U', type=int, default=3, help="unchanged lines around changes")
+    q.add_argument('--exact', action='store_true', help="also report changes in PyInstaller's timestamps")
+    for q in logs_actions.choices.values():
+        q.add_argument('--profile', default=None, help="only builds of this .mpb file or profile name")
+    p.set_defaults(func=cmd_logs)
+
+    p = subparsers.add_parser('queue', help="manage the persistent build queue")
+    queue_actions = p.add_subparsers(dest='queue_action', required=True)
+    q = queue_actions.add_parser('add', help="queue builds of one or more profiles")
+    q.add_argument('profiles', nargs='+')
+    q.add_argument('--priority', type=int, default=0, help="higher runs first (default: 0)")
+    queue_actions.add_parser('list', help="show queued, running and finished jobs")
+    q = queue_actions.add_parser('cancel', help="cancel queued or running jobs")
+    q.add_argument('jobs', nargs='+')
+    q = queue_actions.add_parser('priority', help="change the priority of a queued job")
+    q.add_argument('job')
+    q.add_argument('priority', type=int)
+    queue_actions.add_parser('clear', help="forget finished jobs")
+    q = queue_actions.add_parser('run', help="build queued jobs until the queue is empty")
+    q.add_argument('--wait', action='store_true', help="keep waiting for new jobs")
+    q.add_argument('--verbose', '-v', action='store_true', help="stream build output")
+    q.add_argument('--cores', type=int, default=None, help="cores the builds may use (default: all)")
+    p.set_defaults(func=cmd_queue)
+
+    p = subparsers.add_parser('worker', help="run a build worker for other machines, or check workers")
+    worker_actions = p.add_subparsers(dest='worker_action', required=True)
+    q = worker_actions.add_parser('serve', help="accept builds from coordinators until interrupted")
+    q.add_argument('--listen', default='127.0.0.1:7321', help="host:port or Unix socket path (default: 127.0.0.1:7321)")
+    q.add_argument('--slots', type=int, default=None, help="concurrent builds (default: sized to cores and memory)")
+    q.add_argument('--token', default=None, help="shared secret coordinators must send (or set PYTHON_BUILDER_TOKEN)")
+    q = worker_actions.add_parser('status', help="show the cores, load and builds of workers")
+    q.add_argument('workers', nargs='+', help="host:port or Unix socket path")
+    q.add_argument('--token', default=None)
+    p.set_defaults(func=cmd_worker)
+
+    p = subparsers.add_parser('distribute', help="build several profiles on build workers")
+    p.add_argument('profiles', nargs='+')
+    p.add_argument('--worker', action='append', required=True, help="host:port or Unix socket path (repeatable)")
+    p.add_argument('--token', default=None, help="shared secret of the workers (or set PYTHON_BUILDER_TOKEN)")
+    p.add_argument('--log-dir', default=None, help="directory for per-build logs")
+    p.add_argument('--no-cache', action='store_true', help="always run PyInstaller on the workers")
+    p.add_argument('--timeout', type=float, default=None, help="stop each build after this many seconds")
+    p.set_defaults(func=cmd_distribute)
+
+    p = subparsers.add_parser('library', help="index and search profiles in directory trees")
+    library_actions = p.add_subparsers(dest='library_action', required=True)
+    q = library_actions.add_parser('scan', help="add directory trees to the index or refresh them")
+    q.add_argument('roots', nargs='+')
+    library_actions.add_parser('roots', help="list the indexed directory trees")
+    q = library_actions.add_parser('forget', help="remove directory trees from the index")
+    q.add_argument('roots', nargs='+')
+    q = library_actions.add_parser('search', help="find indexed profiles")
+    q.add_argument('text', nargs='?', default='', help="part of the name, path, script or output folder")
+    q.add_argument('--module', default=None, help="hidden or excluded module (trailing * for a prefix)")
+    q.add_argument('--script', default=None, help="part of the script path")
+    q.add_argument('--output', default=None, help="part of the output folder")
+    q.add_argument('--status', choices=['ok', 'failed', 'never'], default=None, help="last build result")
+    q.add_argument('--refresh', action='store_true', help="rescan the indexed trees first")
+    q.add_argument('--limit', type=int, default=500)
+    q.add_argument('--json', action='store_true', help="print full entries as JSON")
+    p.set_defaults(func=cmd_library)
+
+    p = subparsers.add_parser('stale', help="queue builds of profiles whose inputs changed")
+    p.add_argument('profiles', nargs='*')
+    p.add_argument('--library', action='store_true', help="also check every profile in the profile library")
+    p.add_argument('--workers', type=int, default=None, help="stat/hash threads")
+    p.add_argument('--priority', type=int, default=0, help="queue priority (default: 0)")
+    p.add_argument('--dry-run', action='store_true', help="only report what is stale")
+    p.add_argument('--run', action='store_true', help="build the queue right away")
+    p.set_defaults(func=cmd_stale)
+
+    p = subparsers.add_parser('stage', help="stage a profile's data files with duplicates stored once")
+    p.add_argument('profile')
+    p.set_defaults(func=cmd_stage)
+
+    p = subparsers.add_parser('bench', help="measure startup time and memory of a profile's executable")
+    p.add_argument('profile')
+    p.add_argument('--matrix', action='store_true', help="rebuild as onefile/onedir with UPX on/off and compare")
+    p.add_argument('--variant', action='append', choices=['onefile', 'onefile+upx', 'onedir', 'onedir+upx'],
+                   help="rebuild and measure one variant (repeatable)")
+    p.add_argument('--runs', type=int, default=10, help="warm launches (default: 10)")
+    p.add_argument('--cold-runs', type=int, default=3, help="launches after evicting the page cache (default: 3)")
+    p.add_argument('--args', default='', help="arguments for the executable, e.g. --args=--version")
+    p.add_argument('--ready', default=None, help="regex for the output line that marks startup as done")
+    p.add_argument('--timeout', type=float, default=60.0, help="seconds allowed per launch")
+    p.add_argument('--verbose', '-v', action='store_true', help="stream variant build output")
+    p.add_argument('--json', action='store_true', help="print the results as JSON")
+    p.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == '__main__':
+    sys.exit(main())
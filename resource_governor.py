@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Resource Governor
+# Description: Per-profile CPU, I/O and memory limits for PyInstaller runs,
+#              and an admission controller that holds new builds back while
+#              the host is short of memory. Builds start behind a launcher
+#              (process_launcher) that takes the limits on and then
+#              executes PyInstaller, so everything PyInstaller spawns
+#              inherits them. On Linux the memory limit is a cgroup v2 limit
+#              on the whole tree when a delegated cgroup is configured;
+#              otherwise each process gets an RLIMIT_DATA cap. A watchdog
+#              also stops the build once the tree as a whole goes over the
+#              limit. Either way an oversized build fails on its own, with a
+#              clear message, instead of the kernel OOM killer picking a
+#              victim.
+
+
+import os
+import sys
+import time
+import asyncio
+import threading
+
+from builder_core import kill_process_tree
+from build_timing import linux_tree_rss
+from bundle_report import format_size
+from process_launcher import LAUNCHER_PATH, IOPRIO_WHO_PGRP, set_io_priority
+
+
+NICE_RANGE = (0, 19)
+IO_PRIORITIES = ('normal', 'low', 'idle')
+MB = 1024 * 1024
+
+# A delegated cgroup v2 directory, without processes of its own, to create
+# build cgroups in
+CGROUP_ENV = 'PYTHON_BUILDER_CGROUP'
+CGROUP_ROOT = '/sys/fs/cgroup'
+# memory.high below memory.max: the kernel reclaims and slows the build down
+# before the hard limit is reached
+HIGH_FRACTION = 0.9
+WATCHDOG_INTERVAL = 0.5
+
+# Admission: new builds wait while processes stalled on memory for this share
+# of the last ten seconds (PSI "some avg10"), or less than this share of RAM
+# is available
+PRESSURE_THRESHOLD = 10.0
+MIN_AVAILABLE_FRACTION = 0.10
+ADMISSION_POLL = 1.0
+# When none of our builds is running, waiting cannot free memory: give up on
+# waiting after this long
+MAX_LONE_WAIT = 120.0
+
+# Windows priority classes for a positive nice value
+BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+IDLE_PRIORITY_CLASS = 0x40
+
+
+class ResourcePolicy:
+    """ The limits one build runs under; the defaults change nothing """
+
+    def __init__(self, nice=0, io_priority='normal', memory_limit=0):
+        self.nice = nice
+        self.io_priority = io_priority
+        self.memory_limit = memory_limit # bytes, 0 = no limit
+
+    @classmethod
+    def from_profile(cls, profile):
+        return cls(profile.get('nice', 0), profile.get('io_priority', 'normal'),
+                   profile.get('memory_limit_mb', 0) * MB)
+
+    @property
+    def limited(self):
+        return bool(self.nice or self.io_priority != 'normal' or self.memory_limit)
+
+    def describe(self):
+        parts = []
+        if self.nice:
+            parts.append(f"nice {self.nice}")
+        if self.io_priority != 'normal':
+            parts.append(f"I/O {self.io_priority}")
+        if self.memory_limit:
+            parts.append(f"memory {format_size(self.memory_limit)}")
+        return ', '.join(parts) or 'none'
+
+
+# --- HOST MEMORY ---
+
+def memory_pressure():
+    """ Share of the last ten seconds some task stalled on memory (Linux PSI), or None """
+    try:
+        with open('/proc/pressure/memory', 'r') as f:
+            for line in f:
+                if line.startswith('some '):
+                    return float(line.split()[1].split('=')[1])
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def memory_available():
+    """ (available, total) bytes of RAM from /proc/meminfo, or (None, None) """
+    values = {}
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in ('MemTotal', 'MemAvailable'):
+                    values[name] = int(value.split()[0]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return values.get('MemAvailable'), values.get('MemTotal')
+
+
+class AdmissionController:
+    """
+    Delays the start of PyInstaller runs while the host is short of memory.
+    A waiting build starts as soon as pressure drops; if none of this
+    process's builds is running, it starts after MAX_LONE_WAIT regardless,
+    as there is nothing of ours to wait for.
+    """
+
+    def __init__(self, pressure_threshold=PRESSURE_THRESHOLD, min_available_fraction=MIN_AVAILABLE_FRACTION,
+                 max_lone_wait=MAX_LONE_WAIT):
+        self.pressure_threshold = pressure_threshold
+        self.min_available_fraction = min_available_fraction
+        self.max_lone_wait = max_lone_wait
+        self.running = 0
+        self._lock = threading.Lock()
+
+    def blocked(self):
+        """ Why a new build should wait, or None """
+        pressure = memory_pressure()
+        if pressure is not None and pressure >= self.pressure_threshold:
+            return f"memory pressure is {pressure:.0f}%"
+        available, total = memory_available()
+        if available is not None and total and available < total * self.min_available_fraction:
+            return f"only {format_size(available)} of memory available"
+        return None
+
+    async def admit(self, cancelled=None, log=None):
+        """
+        Wait until a build may start, then count it as running until
+        release(). cancelled() ends the wait early; log(message) is a
+        coroutine function told why the build waits.
+        """
+        started = time.time()
+        told = False
+        while not (cancelled and cancelled()):
+            reason = self.blocked()
+            if reason is None:
+                break
+            if self.running == 0 and time.time() - started >= self.max_lone_wait:
+                if log:
+                    await log(f"Starting anyway after waiting {self.max_lone_wait:.0f}s: {reason}")
+                break
+            if log and not told:
+                await log(f"Waiting to start: {reason}")
+                told = True
+            await asyncio.sleep(ADMISSION_POLL)
+        with self._lock:
+            self.running += 1
+
+    def release(self):
+        with self._lock:
+            self.running = max(0, self.running - 1)
+
+
+_default_admission = None
+_default_lock = threading.Lock()
+
+
+def default_admission():
+    """ The controller shared by every build engine in this process """
+    global _default_admission
+    with _default_lock:
+        if _default_admission is None:
+            _default_admission = AdmissionController()
+        return _default_admission
+
+
+# --- LIMITS ---
+
+_cgroup_base = None
+_cgroup_checked = False
+_cgroup_lock = threading.Lock()
+_cgroup_count = 0
+
+
+def cgroup_base():
+    """
+    The cgroup v2 directory build cgroups are created in, from
+    $PYTHON_BUILDER_CGROUP (absolute, or relative to /sys/fs/cgroup). It must
+    be delegated to this user and hold no processes itself: a cgroup with
+    processes of its own cannot hand its memory controller to child cgroups,
+    so this process's own cgroup is never used. None when unset or unusable.
+    """
+    global _cgroup_base, _cgroup_checked
+    with _cgroup_lock:
+        if _cgroup_checked:
+            return _cgroup_base
+        _cgroup_checked = True
+        base = os.environ.get(CGROUP_ENV)
+        if not base or not sys.platform.startswith('linux'):
+            return None
+        if not os.path.isabs(base):
+            base = os.path.join(CGROUP_ROOT, base)
+        try:
+            with open(os.path.join(base, 'cgroup.subtree_control'), 'r') as f:
+                enabled = f.read().split()
+            if 'memory' not in enabled:
+                with open(os.path.join(base, 'cgroup.subtree_control'), 'w') as f:
+                    f.write('+memory')
+        except OSError:
+            return None
+        _cgroup_base = base
+        return base
+
+
+def _write(path, value):
+    with open(path, 'w') as f:
+        f.write(str(value))
+
+
+def _launcher_available():
+    # A frozen builder has no interpreter to run this module with
+    return sys.platform != 'win32' and not getattr(sys, 'frozen', False)
+
+
+class ProcessLimits:
+    """
+    Applies a ResourcePolicy to a build's process tree. prepare() runs before
+    the build starts and wrap() puts the command behind this module's
+    launcher, which takes the limits on itself and then executes PyInstaller,
+    so nothing PyInstaller spawns can escape them (Windows starts the process
+    with a lower priority class instead). started(pid) then enforces the
+    memory limit until release().
+    """
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.pid = None
+        self.cgroup = None
+        self.exceeded = None # Memory use that stopped the build, if it did
+        self._launcher_args = []
+        self._creationflags = 0
+        self._watchdog = None
+        self._stop_event = threading.Event()
+
+    def prepare(self):
+        """ Get the limits ready; returns log lines saying how they are enforced """
+        policy = self.policy
+        notes = [f"Resource limits: {policy.describe()}"]
+        if policy.nice:
+            if sys.platform == 'win32':
+                self._creationflags = IDLE_PRIORITY_CLASS if policy.nice >= 15 else BELOW_NORMAL_PRIORITY_CLASS
+            else:
+                self._launcher_args += ['--nice', str(policy.nice)]
+        if policy.io_priority != 'normal':
+            if sys.platform.startswith('linux'):
+                self._launcher_args += ['--io-priority', policy.io_priority]
+            else:
+                notes.append("Could not lower the I/O priority: only supported on Linux")
+        if policy.memory_limit:
+            notes.append(self._prepare_memory())
+        return notes
+
+    def _prepare_memory(self):
+        limit = self.policy.memory_limit
+        if not sys.platform.startswith('linux'):
+            return "The memory limit is only enforced on Linux"
+        # The watchdog also covers a build that failed to join its cgroup
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+        base = cgroup_base()
+        if base:
+            global _cgroup_count
+            with _cgroup_lock:
+                _cgroup_count += 1
+                name = f"python-builder-{os.getpid()}-{_cgroup_count}"
+            path = os.path.join(base, name)
+            try:
+                os.mkdir(path)
+                _write(os.path.join(path, 'memory.max'), limit)
+                _write(os.path.join(path, 'memory.high'), int(limit * HIGH_FRACTION))
+                try:
+                    # Out of memory, the whole build goes, not one of its processes
+                    _write(os.path.join(path, 'memory.oom.group'), 1)
+                except OSError:
+                    pass
+                self.cgroup = path
+                self._launcher_args += ['--cgroup', path]
+                return f"Memory limited to {format_size(limit)} for the whole build (cgroup {name})"
+            except OSError:
+                self._remove_cgroup(path)
+
+        # Each process is capped at the build's limit, the tree by the watchdog
+        self._launcher_args += ['--memory-limit', str(limit)]
+        return (f"Memory limited to {format_size(limit)} per process and for the whole build "
+                f"(set {CGROUP_ENV} to a delegated cgroup v2 to limit the build as one)")
+
+    def wrap(self, command):
+        """ The command to start instead of command so that it runs under the limits """
+        if not self._launcher_args or not _launcher_available():
+            return list(command)
+        return [sys.executable, LAUNCHER_PATH] + self._launcher_args + ['--'] + list(command)
+
+    def popen_kwargs(self, kwargs):
+        """ Return Popen keyword arguments extended with the Windows priority class """
+        kwargs = dict(kwargs)
+        if self._creationflags:
+            kwargs['creationflags'] = kwargs.get('creationflags', 0) | self._creationflags
+        return kwargs
+
+    def started(self, pid):
+        """ Start enforcing for the running process; returns log lines for limits that did not apply """
+        self.pid = pid
+        notes = []
+        if self._launcher_args and not _launcher_available():
+            notes = self._apply_late()
+        if self._watchdog:
+            self._watchdog.start()
+        return notes
+
+    def _apply_late(self):
+        """ Without the launcher: limit the process group once it runs, which can miss early children """
+        notes = ["Limits applied after PyInstaller started (no interpreter to launch it under them)"]
+        if self.policy.nice:
+            try:
+                os.setpriority(os.PRIO_PGRP, self.pid, self.policy.nice)
+            except OSError as e:
+                notes.append(f"Could not lower the CPU priority: {e}")
+        if self.policy.io_priority != 'normal':
+            try:
+                set_io_priority(IOPRIO_WHO_PGRP, self.pid, self.policy.io_priority)
+            except OSError as e:
+                notes.append(f"Could not lower the I/O priority: {e}")
+        if self.policy.memory_limit:
+            try:
+                if self.cgroup:
+                    _write(os.path.join(self.cgroup, 'cgroup.procs'), self.pid)
+                else:
+                    import resource
+                    limit = self.policy.memory_limit
+                    resource.prlimit(self.pid, resource.RLIMIT_DATA, (limit, limit))
+            except (OSError, ValueError) as e:
+                notes.append(f"Could not apply the memory limit to the process: {e}")
+        return notes
+
+    def _watch(self):
+        while not self._stop_event.wait(WATCHDOG_INTERVAL):
+            used = linux_tree_rss(self.pid)
+            if used > self.policy.memory_limit:
+                self.exceeded = used
+                kill_process_tree(self.pid)
+                return
+
+    def _remove_cgroup(self, path):
+        # The cgroup can only go once its processes have exited
+        for _ in range(20):
+            try:
+                os.rmdir(path)
+                return
+            except FileNotFoundError:
+                return
+            except OSError:
+                time.sleep(0.05)
+
+    def release(self):
+        """ Stop enforcing; call once the build's processes have exited, or if it failed to start """
+        self._stop_event.set()
+        if self._watchdog and self._watchdog.is_alive():
+            self._watchdog.join()
+        if self.cgroup:
+            try:
+                with open(os.path.join(self.cgroup, 'memory.events'), 'r') as f:
+                    events = dict(line.split() for line in f)
+                if int(events.get('oom_kill', 0)):
+                    self.exceeded = self.policy.memory_limit
+            except (OSError, ValueError):
+                pass
+            self._remove_cgroup(self.cgroup)
+
+    def error(self):
+        """ Why the build failed because of its limits, or '' """
+        if self.exceeded is None:
+            return ''
+        return (f"The build needed more than its memory limit of {format_size(self.policy.memory_limit)} "
+                f"and was stopped")
+
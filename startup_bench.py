@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Startup Benchmark
+# Description: Launches a built executable repeatedly and measures how long it
+#              takes to start (until it exits, or until it prints a "ready"
+#              line) and how much memory it peaks at. Cold runs evict the
+#              artifact from the page cache first; warm runs follow each
+#              other. A profile can be rebuilt as onefile/onedir with UPX on
+#              and off to compare the modes, and results are kept next to
+#              the build timing history.
+
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import statistics
+import subprocess
+import threading
+
+from builder_core import STATE_DIR, profile_id, build_command, process_group_kwargs, kill_process_tree
+from bundle_report import find_artifact
+from build_timing import TIMING_DIR, RssSampler, format_rss
+
+
+BENCH_DIR = os.path.join(STATE_DIR, 'bench_builds')
+MAX_RESULTS_PER_PROFILE = 200
+
+DEFAULT_RUNS = 10
+DEFAULT_COLD_RUNS = 3
+DEFAULT_TIMEOUT = 60.0
+PERCENTILES = [50, 90, 95, 99]
+# VmHWM only grows, so sampling it often loses at most the last interval
+HWM_INTERVAL = 0.005
+
+
+class BenchmarkError(RuntimeError):
+    """ The executable could not be benchmarked (missing, crashed or never ready) """
+
+
+def executable_path(artifact):
+    """ The program inside a build artifact (onedir folders contain it) """
+    if os.path.isdir(artifact) and not artifact.endswith('.app'):
+        name = os.path.basename(artifact)
+        for candidate in (name + '.exe', name):
+            path = os.path.join(artifact, candidate)
+            if os.path.isfile(path):
+                return path
+        raise BenchmarkError(f"No executable found in {artifact}")
+    if artifact.endswith('.app'):
+        name = os.path.splitext(os.path.basename(artifact))[0]
+        return os.path.join(artifact, 'Contents', 'MacOS', name)
+    return artifact
+
+
+def check_platform(executable):
+    """ Refuse to run a Windows build on another OS and vice versa """
+    if executable.lower().endswith('.exe') != (sys.platform == 'win32'):
+        raise BenchmarkError(f"{os.path.basename(executable)} was not built for this platform ({sys.platform})")
+
+
+def evict_page_cache(artifact):
+    """
+    Ask the kernel to drop the artifact's files from the page cache, so the
+    next launch reads them from disk. Returns False where this is unsupported.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    paths = [artifact] if os.path.isfile(artifact) else \
+        [os.path.join(d, f) for d, _, files in os.walk(artifact) for f in files]
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+class HwmSampler(threading.Thread):
+    """
+    Tracks the high-water RSS (VmHWM) of a process tree on Linux. Unlike
+    wait4()'s ru_maxrss, VmHWM is not inflated by the RSS of the Python
+    process that forked the program.
+    """
+
+    def __init__(self, pid, interval=HWM_INTERVAL):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peaks = {}
+        self._stop_event = threading.Event()
+
+    @property
+    def peak(self):
+        # onefile: the bootloader and the app it unpacked run side by side
+        return sum(self.peaks.values())
+
+    def sample(self):
+        pending = [self.pid]
+        while pending:
+            pid = pending.pop()
+            try:
+                with open(f'/proc/{pid}/status', 'rb') as f:
+                    for line in f:
+                        if line.startswith(b'VmHWM:'):
+                            self.peaks[pid] = max(self.peaks.get(pid, 0), int(line.split()[1]) * 1024)
+                            break
+                with open(f'/proc/{pid}/task/{pid}/children', 'rb') as f:
+                    pending.extend(int(child) for child in f.read().split())
+            except (OSError, ValueError):
+                pass
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+
+
+def launch_once(executable, args=(), ready=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Start the executable once. Returns (seconds, peak_rss_bytes or None).
+    Without ready, the run ends when the program exits; with a regex, it ends
+    when a matching output line appears and the program is then stopped.
+    """
+    pattern = re.compile(ready) if ready else None
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [executable] + list(args),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE if pattern else subprocess.DEVNULL,
+        stderr=subprocess.STDOUT if pattern else subprocess.DEVNULL,
+        **process_group_kwargs()
+    )
+    # Linux: VmHWM of the tree. macOS: wait4()'s ru_maxrss, which covers the
+    # children the onefile bootloader reaped. Windows: sampled working set.
+    if sys.platform.startswith('linux'):
+        sampler = HwmSampler(process.pid)
+        sampler.start()
+    elif not hasattr(os, 'wait4'):
+        sampler = RssSampler(process.pid, interval=0.05)
+        if sampler.supported:
+            sampler.start()
+    else:
+        sampler = None
+
+    timer = threading.Timer(timeout, kill_process_tree, (process.pid,))
+    timer.start()
+    elapsed = None
+    matched = False
+    try:
+        if pattern:
+            for raw in process.stdout:
+                if pattern.search(raw.decode('utf-8', errors='replace')):
+                    elapsed = time.perf_counter() - start
+                    matched = True
+                    kill_process_tree(process.pid)
+                    break
+            process.stdout.close()
+        peak = None
+        if sampler is None:
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            peak = usage.ru_maxrss # bytes on macOS
+        else:
+            process.wait()
+        if elapsed is None:
+            elapsed = time.perf_counter() - start
+    finally:
+        timer.cancel()
+        if sampler is not None:
+            sampler.stop()
+            peak = sampler.peak or None
+
+    if elapsed >= timeout:
+        raise BenchmarkError(f"{os.path.basename(executable)} did not finish within {timeout:.0f}s "
+                             "(pass arguments that make it exit, or a ready pattern)")
+    if pattern is None and process.returncode != 0:
+        raise BenchmarkError(f"{os.path.basename(executable)} exited with code {process.returncode}")
+    if pattern and not matched:
+        raise BenchmarkError(f"{os.path.basename(executable)} exited without printing a ready line")
+    return elapsed, peak
+
+
+def summarize(samples):
+    """ min/mean/max and percentiles of a list of seconds """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    summary = {'runs': len(ordered), 'min': ordered[0], 'mean': statistics.fmean(ordered), 'max': ordered[-1]}
+    for p in PERCENTILES:
+        # Nearest-rank percentile: exact for the small run counts used here
+        rank = max(1, -(-p * len(ordered) // 100))
+        summary[f"p{p}"] = ordered[rank - 1]
+    return summary
+
+
+def bench_artifact(artifact, runs=DEFAULT_RUNS, cold_runs=DEFAULT_COLD_RUNS, args=(), ready=None,
+                   timeout=DEFAULT_TIMEOUT, on_run=None):
+    """
+    Benchmark one artifact. Returns a result dict with 'cold' and 'warm'
+    summaries, 'peak_rss' and the artifact size. on_run(kind, index, seconds)
+    is called after every launch.
+    """
+    executable = executable_path(artifact)
+    check_platform(executable)
+    cold, warm, peaks = [], [], []
+
+    cold_supported = True
+    for index in range(cold_runs):
+        cold_supported = evict_page_cache(artifact)
+        if not cold_supported:
+            break
+        seconds, peak = launch_once(executable, args, ready, timeout)
+        cold.append(seconds)
+        peaks.append(peak)
+        if on_run:
+            on_run('cold', index, seconds)
+
+    launch_once(executable, args, ready, timeout) # Warm-up, not recorded
+    for index in range(runs):
+        seconds, peak = launch_once(executable, args, ready, timeout)
+        warm.append(seconds)
+        peaks.append(peak)
+        if on_run:
+            on_run('warm', index, seconds)
+
+    known_peaks = [p for p in peaks if p]
+    if os.path.isfile(artifact):
+        size = os.path.getsize(artifact)
+    else:
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(artifact) for f in files)
+    return {
+        'created': time.time(),
+        'artifact': artifact,
+        'mode': 'onedir' if os.path.isdir(artifact) else 'onefile',
+        'size': size,
+        'args': list(args),
+        'ready': ready,
+        'cold': summarize(cold) if cold_supported else None,
+        'warm': summarize(warm),
+        'peak_rss': statistics.median(known_peaks) if known_peaks else None,
+        'max_rss': max(known_peaks) if known_peaks else None,
+    }
+
+
+# --- VARIANTS ---
+
+VARIANTS = {
+    'onefile': {'one_file': True, 'use_upx': False},
+    'onefile+upx': {'one_file': True, 'use_upx': True},
+    'onedir': {'one_file': False, 'use_upx': False},
+    'onedir+upx': {'one_file': False, 'use_upx': True},
+}
+
+
+def available_variants():
+    """ Variants that can be built here (UPX ones need upx on PATH) """
+    upx = shutil.which('upx') is not None
+    return [name for name, overrides in VARIANTS.items() if upx or not overrides['use_upx']]
+
+
+def variant_profile(profile, variant):
+    """ Copy of a profile that builds the given variant into its own output folder """
+    variant_profile = dict(profile)
+    variant_profile.update(VARIANTS[variant])
+    variant_profile['output_dir'] = os.path.join(BENCH_DIR, profile_id(profile), variant)
+    variant_profile['deploy_zip'] = False
+    return variant_profile
+
+
+def build_variant(profile, variant, on_line=None):
+    """ Build one variant (cached builds are reused) and return its artifact """
+    # Imported lazily: the engine is only needed when variants are rebuilt
+    from build_engine import run_build
+    target = variant_profile(profile, variant)
+    result = run_build(target, on_line=on_line)
+    if not result.succeeded:
+        raise BenchmarkError(f"Building the {variant} variant failed (exit code {result.return_code})")
+    artifact = find_artifact(build_command(target))
+    if artifact is None:
+        raise BenchmarkError(f"The {variant} build produced no artifact")
+    return artifact
+
+
+# --- RESULTS ---
+
+def _results_path(profile):
+    return os.path.join(TIMING_DIR, f"{profile_id(profile)}.startup.jsonl")
+
+
+def load_results(profile):
+    """ Return stored benchmark results of a profile, oldest first """
+    try:
+        with open(_results_path(profile), 'r') as f:
+            lines = f.readlines()
+    except OSError:
+        return []
+    results = []
+    for line in lines:
+        try:
+            results.append(json.loads(line))
+        except ValueError:
+            pass
+    return results
+
+
+def save_result(profile, result):
+    path = _results_path(profile)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(result) + "\n")
+    results = load_results(profile)
+    if len(results) > MAX_RESULTS_PER_PROFILE:
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for entry in results[-MAX_RESULTS_PER_PROFILE:]:
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, path)
+    return path
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.0f} ms" if seconds is not None else '-'
+
+
+def format_results(results):
+    """ Render results (one per variant) as a comparison table """
+    header = (f"{'Variant':<14}{'Size':>10}{'Cold p50':>11}{'Cold p90':>11}{'Warm p50':>11}"
+              f"{'Warm p90':>11}{'Warm p99':>11}{'Peak RSS':>10}")
+    lines = [header]
+    for result in results:
+        cold = result['cold'] or {}
+        warm = result['warm']
+        lines.append(f"{result.get('variant') or result['mode']:<14}"
+                     f"{result['size'] / (1024 * 1024):>8.1f}MB"
+                     f"{_ms(cold.get('p50')):>11}{_ms(cold.get('p90')):>11}"
+                     f"{_ms(warm['p50']):>11}{_ms(warm['p90']):>11}{_ms(warm['p99']):>11}"
+                     f"{format_rss(result['peak_rss']):>10}")
+    if any(result['cold'] is None for result in results):
+        lines.append("Cold runs need posix_fadvise (Linux); only warm runs were measured.")
+    return lines
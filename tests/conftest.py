@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Test Configuration
+# Description: Makes the builder modules in the repository root importable
+#              from the tests, which run without installing anything, and
+#              points their state directory (~/.python_builder) at a
+#              throwaway home so builds in the tests leave the real one alone.
+
+
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+
+# Set before any builder module computes STATE_DIR from the home directory
+_home = tempfile.mkdtemp(prefix='python_builder_tests_')
+atexit.register(shutil.rmtree, _home, ignore_errors=True)
+os.environ['HOME'] = os.environ['USERPROFILE'] = _home
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
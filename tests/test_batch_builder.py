@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Batch Builder Tests
+# Description: Batches of profiles built by a stand-in pyinstaller: per-build
+#              logs and exit codes, the aggregate summary, profiles that fail
+#              to load, and cancelling a running batch.
+
+
+import os
+import sys
+import json
+import time
+import threading
+
+import pytest
+
+from batch_builder import BatchBuilder, default_worker_count, format_summary
+
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="the stand-in pyinstaller is a shell script")
+
+# Prints its arguments, then fails for scripts named broken*, hangs for
+# slow*, and otherwise writes dist/<name> like a onefile build
+FAKE_PYINSTALLER = """#!/bin/sh
+echo "fake pyinstaller $*"
+for last; do :; done
+case "$(basename "$last")" in
+    broken*) echo "ERROR: build failed"; exit 3 ;;
+    slow*) sleep 30 ;;
+esac
+dist=""; prev=""
+for arg; do [ "$prev" = "--distpath" ] && dist="$arg"; prev="$arg"; done
+mkdir -p "$dist" && echo binary > "$dist/$(basename "$last" .py)"
+echo "Build complete!"
+"""
+
+
+@pytest.fixture
+def fake_pyinstaller(tmp_path, monkeypatch):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    tool = bin_dir / 'pyinstaller'
+    tool.write_text(FAKE_PYINSTALLER)
+    tool.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+def _profile(tmp_path, name):
+    script = tmp_path / 'src' / f'{name}.py'
+    script.parent.mkdir(exist_ok=True)
+    script.write_text("print('hello')\n")
+    path = tmp_path / f'{name}.mpb'
+    path.write_text(json.dumps({
+        'version': 2,
+        'script_path': str(script),
+        'output_dir': str(tmp_path / 'out' / name),
+        'incremental': False,
+        'use_cache': False,
+    }))
+    return str(path)
+
+
+def test_batch_summary_and_logs(tmp_path, fake_pyinstaller):
+    paths = [_profile(tmp_path, 'app'), _profile(tmp_path, 'broken'), str(tmp_path / 'missing.mpb')]
+    progress = []
+    batch = BatchBuilder(paths, max_workers=2, log_dir=str(tmp_path / 'logs'),
+                         on_progress=lambda name, message: progress.append((name, message)))
+    summary = batch.run()
+
+    assert (summary['total'], summary['succeeded'], summary['failed']) == (3, 1, 2)
+    app, broken, missing = summary['results']
+    assert app['return_code'] == 0 and app['error'] is None
+    assert os.path.isfile(tmp_path / 'out' / 'app' / 'dist' / 'app')
+    assert broken['return_code'] == 3
+    assert missing['return_code'] == 1 and missing['error']
+
+    # Each build has its own log, named after its position and profile
+    assert os.path.basename(app['log']) == '000_app.log'
+    with open(app['log'], encoding='utf-8') as f:
+        log = f.read()
+    assert 'fake pyinstaller' in log and 'Build complete!' in log
+    with open(broken['log'], encoding='utf-8') as f:
+        assert 'ERROR: build failed' in f.read()
+    with open(missing['log'], encoding='utf-8') as f:
+        assert f.read().startswith('An error occurred:')
+
+    assert ('app', 'succeeded') in progress
+    assert ('broken', 'failed (exit code 3)') in progress
+    lines = format_summary(summary)
+    assert any(line.startswith('app') for line in lines)
+
+
+def test_cancel_stops_running_builds(tmp_path, fake_pyinstaller):
+    paths = [_profile(tmp_path, 'slow1'), _profile(tmp_path, 'slow2'), _profile(tmp_path, 'slow3')]
+    batch = BatchBuilder(paths, max_workers=2, log_dir=str(tmp_path / 'logs'))
+    # Cancelled from another thread, like the window does, once two builds run
+    timer = threading.Timer(1.0, batch.cancel)
+    timer.start()
+    started = time.time()
+    summary = batch.run()
+    timer.join()
+
+    assert time.time() - started < 20
+    assert summary['succeeded'] == 0
+    assert [r['error'] for r in summary['results']] == ['Batch cancelled'] * 3
+    with open(summary['results'][0]['log'], encoding='utf-8') as f:
+        assert 'fake pyinstaller' in f.read()
+
+
+def test_default_worker_count_respects_memory(monkeypatch):
+    monkeypatch.setattr('batch_builder.available_memory', lambda: 3 * 1024 ** 3)
+    assert default_worker_count(memory_per_build=1024 ** 3) <= 3
+    assert default_worker_count(memory_per_build=16 * 1024 ** 3) == 1
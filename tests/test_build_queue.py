@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Build Queue Tests
+# Description: Jobs persisted across queue instances and run in priority
+#              order, recovery of jobs whose runner died, and cancelling
+#              queued jobs and jobs running here or in another process.
+
+
+import os
+import sys
+import time
+import threading
+import subprocess
+
+import pytest
+
+from builder_core import process_group_kwargs
+from build_queue import BuildQueue, QUEUED, RUNNING, CANCELLED
+
+
+def _queue(tmp_path):
+    return BuildQueue(str(tmp_path / 'queue.json'), str(tmp_path / 'logs'))
+
+
+def _profile(name):
+    return {'script_path': f'/src/{name}.py'}
+
+
+def _mark_running(queue, job_id, owner, pid=None):
+    queue._update(job_id, state=RUNNING, owner=owner, pid=pid, started=time.time())
+
+
+# --- PERSISTENCE ---
+
+def test_jobs_persist_and_run_in_priority_order(tmp_path):
+    queue = _queue(tmp_path)
+    low = queue.submit(_profile('low'))
+    high = queue.submit(_profile('high'), priority=5)
+    later = queue.submit(_profile('later'))
+
+    reopened = _queue(tmp_path)
+    assert [job.id for job in reopened.jobs()] == [high.id, low.id, later.id]
+    assert reopened.pending_count() == 3
+    assert reopened.jobs()[0].profile == _profile('high')
+
+    reopened.set_priority(later.id, 9)
+    assert reopened._claim_next().id == later.id
+    assert [job.state for job in queue.jobs()] == [RUNNING, QUEUED, QUEUED]
+
+
+# --- RECOVERY ---
+
+def test_recover_requeues_jobs_of_dead_runners_only(tmp_path):
+    queue = _queue(tmp_path)
+    orphan = queue.submit(_profile('orphan'))
+    alive = queue.submit(_profile('alive'))
+    _mark_running(queue, orphan.id, owner=os.getpid())
+    # The parent process stands in for another live runner
+    _mark_running(queue, alive.id, owner=os.getppid())
+
+    recovered = queue.recover()
+    assert [job.id for job in recovered] == [orphan.id]
+    states = {job.id: job for job in queue.jobs()}
+    assert states[orphan.id].state == QUEUED
+    assert states[orphan.id].owner is None
+    assert states[alive.id].state == RUNNING
+
+
+# --- CANCELLING ---
+
+def test_cancel_queued_job(tmp_path):
+    queue = _queue(tmp_path)
+    job = queue.submit(_profile('app'))
+    assert queue.cancel(job.id)
+    assert queue.jobs()[0].state == CANCELLED
+    assert queue._claim_next() is None
+    assert not queue.cancel(job.id)
+    assert not queue.cancel('missing')
+
+
+def test_cancel_own_job_goes_through_the_engine(tmp_path, monkeypatch):
+    queue = _queue(tmp_path)
+    job = queue.submit(_profile('app'))
+    _mark_running(queue, job.id, owner=os.getpid(), pid=1)
+    cancelled = []
+    monkeypatch.setattr(queue.engine, 'cancel', cancelled.append)
+    monkeypatch.setattr('build_queue.kill_process_tree', lambda pid: pytest.fail("killed twice"))
+
+    assert queue.cancel(job.id)
+    assert cancelled == [job.id]
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="uses a POSIX process group")
+@pytest.mark.parametrize('wait', [False, True])
+def test_cancel_job_of_another_runner_kills_its_group(tmp_path, wait):
+    queue = _queue(tmp_path)
+    job = queue.submit(_profile('app'))
+    process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'], **process_group_kwargs())
+    # Reaps the process like its runner would, so the group disappears
+    reaper = threading.Thread(target=process.wait, daemon=True)
+    reaper.start()
+    try:
+        _mark_running(queue, job.id, owner=os.getppid(), pid=process.pid)
+        started = time.time()
+        assert queue.cancel(job.id, wait=wait)
+        assert time.time() - started < 2.0
+        reaper.join(5)
+        assert process.returncode not in (None, 0)
+        assert queue.jobs()[0].state == CANCELLED
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
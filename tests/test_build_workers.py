@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Build Worker Tests
+# Description: Path checks on received inputs and artifacts, profile
+#              localization, and token checks of a worker served on a Unix
+#              socket and on localhost.
+
+
+import io
+import os
+import sys
+import asyncio
+import tarfile
+
+import pytest
+
+from builder_core import PROFILE_DEFAULTS
+from build_workers import (PROTOCOL_VERSION, BuildWorker, Coordinator, RemoteBuildError, WorkerInfo,
+                           _job_path, localize_profile, unpack_artifact)
+
+
+# --- PATHS ---
+
+def test_job_path_stays_below_root(tmp_path):
+    root = str(tmp_path)
+    assert _job_path(root, 'pkg/mod.py') == os.path.join(root, 'pkg', 'mod.py')
+    assert _job_path(root, 'pkg/../main.py') == os.path.join(root, 'main.py')
+    for relative in ('../outside.py', 'pkg/../../outside.py', '/etc/passwd', '..'):
+        with pytest.raises(RemoteBuildError):
+            _job_path(root, relative)
+
+
+def _command(tmp_path):
+    return ['pyinstaller', '--distpath', str(tmp_path / 'dist'), '--name', 'app', 'app.py']
+
+
+def _write_tar(path, entries):
+    """ entries: (name, data) for files, (name, None, linkname) for symlinks """
+    with tarfile.open(path, 'w') as tar:
+        for entry in entries:
+            info = tarfile.TarInfo(entry[0])
+            if entry[1] is None:
+                info.type = tarfile.SYMTYPE
+                info.linkname = entry[2]
+                tar.addfile(info)
+            else:
+                info.size = len(entry[1])
+                tar.addfile(info, io.BytesIO(entry[1]))
+
+
+def test_unpack_artifact_replaces_the_old_one(tmp_path):
+    command = _command(tmp_path)
+    old = tmp_path / 'dist' / 'app'
+    old.mkdir(parents=True)
+    (old / 'stale.txt').write_text('old')
+    tar_path = str(tmp_path / 'artifact.tar')
+    _write_tar(tar_path, [('app/app', b'binary'), ('app/lib.so', b'lib'),
+                          ('app/current', None, 'lib.so')])
+
+    assert unpack_artifact(tar_path, command) == str(old)
+    assert sorted(os.listdir(old)) == ['app', 'current', 'lib.so']
+    assert os.readlink(old / 'current') == 'lib.so'
+    assert [name for name in os.listdir(tmp_path / 'dist') if name.startswith('.remote-')] == []
+
+
+@pytest.mark.parametrize('entries', [
+    [('app/../../evil', b'x')],
+    [('other/file', b'x')],
+    [('/app/abs', b'x')],
+    [('app/link', None, '../../outside')],
+    [('app/link', None, '/etc/passwd')],
+    [('app/sub/link', None, '../../elsewhere')],
+])
+def test_unpack_artifact_rejects_escaping_entries(tmp_path, entries):
+    tar_path = str(tmp_path / 'artifact.tar')
+    _write_tar(tar_path, entries)
+    with pytest.raises(RemoteBuildError):
+        unpack_artifact(tar_path, _command(tmp_path))
+    assert not (tmp_path / 'evil').exists()
+    assert os.listdir(tmp_path / 'dist') == []
+
+
+def test_localize_profile_uses_the_workers_limits(tmp_path):
+    remote = {'script_path': 'src/app.py', 'included_files': ['data/a.txt'], 'cores': '16',
+              'nice': 15, 'io_priority': 'idle', 'memory_limit_mb': 4096,
+              'shutdown': True, 'deploy_zip': True}
+    job_root = str(tmp_path)
+    profile = localize_profile(remote, job_root)
+    assert profile['script_path'] == os.path.join(job_root, 'src', 'src', 'app.py')
+    assert profile['included_files'] == [os.path.join(job_root, 'src', 'data', 'a.txt')]
+    assert profile['output_dir'] == os.path.join(job_root, 'output')
+    for field in ('cores', 'nice', 'io_priority', 'memory_limit_mb'):
+        assert profile[field] == PROFILE_DEFAULTS[field]
+    assert not profile['shutdown'] and not profile['deploy_zip']
+
+    with pytest.raises(RemoteBuildError):
+        localize_profile({'script_path': '../app.py'}, job_root)
+
+
+# --- TOKENS ---
+
+async def _serve(worker, kind, tmp_path):
+    if kind == 'unix':
+        path = str(tmp_path / 'worker.sock')
+        server = await asyncio.start_unix_server(worker.handle, path)
+        return server, f"unix:{path}"
+    server = await asyncio.start_server(worker.handle, '127.0.0.1', 0)
+    return server, f"127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+
+def _kinds():
+    return ['tcp', 'unix'] if hasattr(asyncio, 'start_unix_server') else ['tcp']
+
+
+@pytest.mark.parametrize('kind', _kinds())
+def test_worker_checks_the_token(tmp_path, kind):
+    logged = []
+
+    async def run():
+        worker = BuildWorker(slots=2, token='secret', log=logged.append)
+        server, address = await _serve(worker, kind, tmp_path)
+        async with server:
+            infos = {token: WorkerInfo(address) for token in ('secret', 'wrong', None)}
+            for token, info in infos.items():
+                await Coordinator([address], token).probe(info)
+            return infos
+
+    infos = asyncio.run(run())
+    assert infos['secret'].available
+    assert infos['secret'].status['slots'] == 2
+    assert infos['secret'].status['version'] == PROTOCOL_VERSION
+    assert infos['secret'].status['platform'] == sys.platform
+    for token in ('wrong', None):
+        assert not infos[token].available
+        assert infos[token].error == "Invalid token"
+    assert sum('invalid token' in line for line in logged) == 2
+
+
+def test_worker_refuses_other_protocol_versions(tmp_path):
+    from build_workers import read_message, send_message, open_connection
+
+    async def run():
+        worker = BuildWorker(slots=1, log=lambda line: None)
+        server, address = await _serve(worker, 'tcp', tmp_path)
+        async with server:
+            reader, writer = await open_connection(address)
+            await send_message(writer, {'type': 'hello', 'version': PROTOCOL_VERSION + 1})
+            reply = await read_message(reader)
+            writer.close()
+            return reply
+
+    reply = asyncio.run(run())
+    assert reply['type'] == 'error'
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Core Budget Tests
+# Description: First-come-first-served grants from threads and asyncio tasks,
+#              resizing while requests wait, cancelled waits, and nested
+#              stage pools sharing their parent's cores.
+
+
+import asyncio
+import threading
+
+import pytest
+
+import core_budget
+from core_budget import CoreBudget, core_limit, profile_cores, stage_threads
+
+
+def _start(budget, cores):
+    """ Acquire on a thread; returns (thread, [granted]) """
+    granted = []
+    thread = threading.Thread(target=lambda: granted.append(budget.acquire(cores)), daemon=True)
+    thread.start()
+    return thread, granted
+
+
+def _wait_for_waiters(budget, count):
+    for _ in range(500):
+        if len(budget._waiters) == count:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError(f"expected {count} waiting requests, found {len(budget._waiters)}")
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    """ A 4-core budget installed as the process-wide one """
+    budget = CoreBudget(4)
+    monkeypatch.setattr(core_budget, '_default_budget', budget)
+    return budget
+
+
+# --- GRANTS ---
+
+def test_acquire_takes_what_is_free_above_the_minimum(budget):
+    assert budget.acquire(3) == 3
+    assert budget.acquire(4, minimum=1) == 1
+    assert budget.available == 0
+    budget.release(4)
+    assert budget.in_use == 0
+    # Requests are clamped to the budget
+    assert budget.acquire(100) == 4
+
+
+def test_waiters_are_served_in_arrival_order(budget):
+    budget.acquire(4)
+    large, large_granted = _start(budget, 3)
+    _wait_for_waiters(budget, 1)
+    small, small_granted = _start(budget, 1)
+    _wait_for_waiters(budget, 2)
+
+    # One free core would fit the small request, but it queues behind the large one
+    budget.release(1)
+    assert not large_granted and not small_granted
+    budget.release(2)
+    large.join(1)
+    assert large_granted == [3]
+    assert not small_granted
+    budget.release(1)
+    small.join(1)
+    assert small_granted == [1]
+
+
+def test_resize_while_requests_wait(budget):
+    budget.acquire(4)
+    grown, grown_granted = _start(budget, 2)
+    _wait_for_waiters(budget, 1)
+    # Growing the budget serves the waiter at once
+    budget.resize(6)
+    grown.join(1)
+    assert grown_granted == [2]
+    assert budget.in_use == 6
+
+    shrunk, shrunk_granted = _start(budget, 6)
+    _wait_for_waiters(budget, 1)
+    # Shrinking clamps the waiting request to the new size; cores handed out stay out
+    budget.resize(3)
+    assert budget._waiters[0].minimum == 3
+    budget.release(2)
+    assert not shrunk_granted
+    budget.release(4)
+    shrunk.join(1)
+    assert shrunk_granted == [3]
+    assert budget.available == 0
+
+
+def test_acquire_async_in_arrival_order(budget):
+    order = []
+
+    async def build(name, cores):
+        granted = await budget.acquire_async(cores)
+        order.append((name, granted))
+        await asyncio.sleep(0.01)
+        budget.release(granted)
+
+    async def main():
+        budget.acquire(4)
+        tasks = [asyncio.ensure_future(build(name, cores)) for name, cores in (('a', 2), ('b', 4), ('c', 1))]
+        await asyncio.sleep(0.01)
+        assert order == []
+        budget.release(4)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == [('a', 2), ('b', 4), ('c', 1)]
+    assert budget.in_use == 0
+
+
+def test_cancelled_async_wait_takes_nothing(budget):
+    async def main():
+        budget.acquire(4)
+        waiting = asyncio.ensure_future(budget.acquire_async(2))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert not budget._waiters
+        budget.release(4)
+
+    asyncio.run(main())
+    assert budget.in_use == 0
+
+
+# --- STAGES ---
+
+def test_nested_stages_share_the_outer_allowance(budget):
+    budget.acquire(1)
+    with stage_threads() as outer:
+        assert outer == 3
+        assert budget.in_use == 4
+        with stage_threads(8) as inner:
+            # Does not ask the exhausted budget again
+            assert inner == 3
+        with stage_threads(2) as inner:
+            assert inner == 2
+    assert budget.in_use == 1
+
+
+def test_core_limit_caps_stages(budget):
+    with core_limit(profile_cores({'cores': '2'})):
+        with stage_threads() as threads:
+            assert threads == 2
+        with stage_threads(8) as threads:
+            assert threads == 2
+    assert profile_cores({'cores': '64'}) == 4
+    assert profile_cores({'cores': 'all'}) == 4
+    assert budget.in_use == 0
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Hash Engine Tests
+# Description: Digests of small and memory-mapped files, and invalidation of
+#              the persisted digest cache when a file's size, mtime or inode
+#              changes.
+
+
+import os
+import time
+import hashlib
+
+import pytest
+
+import hash_engine
+from hash_engine import HashEngine
+
+
+def _write(path, data, age=60):
+    """ Write a file old enough to leave the racy window """
+    path.write_bytes(data)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return HashEngine(str(tmp_path / 'cache' / 'hash_cache.bin'), workers=4)
+
+
+def test_digests_and_tree(tmp_path, engine, monkeypatch):
+    monkeypatch.setattr(hash_engine, 'MMAP_THRESHOLD', 1024)
+    (tmp_path / 'src' / 'pkg').mkdir(parents=True)
+    small = b'print("hi")\n'
+    large = os.urandom(8192)
+    _write(tmp_path / 'src' / 'main.py', small)
+    _write(tmp_path / 'src' / 'pkg' / 'data.bin', large)
+
+    assert engine.hash_tree(str(tmp_path / 'src')) == {
+        'main.py': _sha256(small),
+        os.path.join('pkg', 'data.bin'): _sha256(large),
+    }
+    digests = engine.hash_files([str(tmp_path / 'src' / 'main.py'), str(tmp_path / 'missing')])
+    assert digests[str(tmp_path / 'missing')] is None
+
+
+def test_cache_persists_across_engines(tmp_path, engine):
+    path = _write(tmp_path / 'a.py', b'one')
+    engine.hash_file(path)
+    engine.save()
+
+    reopened = HashEngine(engine.cache_path)
+    assert reopened.hash_file(path) == _sha256(b'one')
+    assert (reopened.hits, reopened.misses) == (1, 0)
+
+
+def test_same_size_edit_with_new_mtime_is_rehashed(tmp_path, engine):
+    path = _write(tmp_path / 'a.py', b'one', age=120)
+    assert engine.hash_file(path) == _sha256(b'one')
+    _write(tmp_path / 'a.py', b'two', age=60)
+    assert engine.hash_file(path) == _sha256(b'two')
+    assert engine.misses == 2
+
+
+def test_size_change_with_same_mtime_is_rehashed(tmp_path, engine):
+    path = _write(tmp_path / 'a.py', b'one')
+    mtime_ns = os.stat(path).st_mtime_ns
+    engine.hash_file(path)
+    (tmp_path / 'a.py').write_bytes(b'longer')
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    assert engine.hash_file(path) == _sha256(b'longer')
+    assert engine.misses == 2
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="inodes are not compared on Windows")
+def test_replaced_file_with_same_size_and_mtime_is_rehashed(tmp_path, engine):
+    path = _write(tmp_path / 'a.py', b'one')
+    mtime_ns = os.stat(path).st_mtime_ns
+    engine.hash_file(path)
+    # An atomic replace (editor save, checkout) gives the path a new inode
+    replacement = _write(tmp_path / 'a.py.new', b'two')
+    os.utime(replacement, ns=(mtime_ns, mtime_ns))
+    os.replace(replacement, path)
+    assert engine.hash_file(path) == _sha256(b'two')
+    assert engine.misses == 2
+
+
+def test_recent_files_are_not_cached(tmp_path, engine):
+    path = _write(tmp_path / 'a.py', b'one', age=0)
+    engine.hash_file(path)
+    engine.hash_file(path)
+    assert (engine.hits, engine.misses) == (0, 2)
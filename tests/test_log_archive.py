@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Log Archive Tests
+# Description: Logs written frame by frame and read back (also while still
+#              open or cut short), oversized logs keeping their tail,
+#              retention by age, count and size, and streaming search.
+
+
+import os
+import json
+import time
+
+import pytest
+
+import log_archive
+from log_archive import BuildLog, find_log, grep_logs, list_logs, prune, read_lines
+
+
+class _Result:
+    return_code = 0
+    cached = False
+    cancelled = False
+    timed_out = False
+    error = ''
+
+
+def _profile(name):
+    return {'script_path': f'/src/{name}.py'}
+
+
+def _write_log(archive_dir, name, lines, close=True):
+    log = BuildLog(_profile(name), archive_dir=str(archive_dir))
+    for line in lines:
+        log.write(line)
+    if close:
+        log.close(_Result(), prune_archive=False)
+    return log
+
+
+def _set_meta(archive_dir, log, **changes):
+    path = os.path.join(str(archive_dir), log.id + '.json')
+    with open(path) as f:
+        meta = json.load(f)
+    meta.update(changes)
+    with open(path, 'w') as f:
+        json.dump(meta, f)
+
+
+# --- WRITING AND READING ---
+
+def test_round_trip_over_many_frames(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_archive, 'FRAME_BYTES', 64)
+    lines = [f"{i * 7} INFO: line {i} – ünïcode" for i in range(500)]
+    log = _write_log(tmp_path, 'app', lines)
+
+    assert list(read_lines(log.path)) == lines
+    entry, = list_logs(str(tmp_path))
+    assert (entry['lines'], entry['profile'], entry['return_code']) == (500, 'app', 0)
+    assert entry['finished'] is not None
+
+
+def test_unfinished_and_truncated_logs_stay_readable(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_archive, 'FRAME_BYTES', 64)
+    lines = [f"line {i}" for i in range(100)]
+    log = _write_log(tmp_path, 'app', lines, close=False)
+    written = list(read_lines(log.path))
+    assert written and written == lines[:len(written)]
+    assert list_logs(str(tmp_path))[0]['finished'] is None
+
+    # A build killed while a frame was half written: what was complete is kept,
+    # followed by whatever of the cut line could be decoded
+    frame = log.codec.compress(b'partial line\n')
+    log._file.write(frame[:len(frame) // 2])
+    log._file.flush()
+    read = list(read_lines(log.path))
+    assert read[:len(written)] == written
+    assert len(read) - len(written) <= 1
+    assert all('partial line'.startswith(line) for line in read[len(written):])
+
+
+def test_oversized_log_keeps_its_tail(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_archive, 'FRAME_BYTES', 64)
+    monkeypatch.setattr(log_archive, 'MAX_LOG_BYTES', 256)
+    monkeypatch.setattr(log_archive, 'TAIL_LINES', 10)
+    lines = [f"{i:08d} {os.urandom(16).hex()}" for i in range(1000)]
+    log = _write_log(tmp_path, 'app', lines)
+
+    read = list(read_lines(log.path))
+    assert read[-10:] == lines[-10:]
+    assert read[0] == lines[0]
+    marker = read[-11]
+    assert marker.startswith(f"... {log.meta['omitted']} lines omitted")
+    assert log.meta['lines'] == 1000
+    assert len(read) - 1 + log.meta['omitted'] == 1000
+
+
+# --- RETENTION ---
+
+def test_prune_by_count_per_profile(tmp_path):
+    logs = [_write_log(tmp_path, 'app', [f"build {i}"]) for i in range(5)]
+    other = _write_log(tmp_path, 'other', ["build"])
+    for i, log in enumerate(logs):
+        _set_meta(tmp_path, log, started=1000 + i + time.time())
+
+    assert prune(str(tmp_path), max_per_profile=2, keep=(logs[0].id,)) == 2
+    remaining = {entry['id'] for entry in list_logs(str(tmp_path))}
+    assert remaining == {logs[0].id, logs[3].id, logs[4].id, other.id}
+    assert not os.path.exists(logs[1].path)
+
+
+def test_prune_by_age_and_size(tmp_path):
+    old = _write_log(tmp_path, 'old', ["old build"])
+    _set_meta(tmp_path, old, started=time.time() - 100 * 86400)
+    running = _write_log(tmp_path, 'running', ["still building"], close=False)
+    finished = [_write_log(tmp_path, f'app{i}', [f"build {i} " + 'a1b2' * 256]) for i in range(3)]
+    size = os.path.getsize(finished[0].path)
+
+    # Room for two finished logs: the oldest goes, the unfinished one stays
+    removed = prune(str(tmp_path), max_bytes=2 * size + os.path.getsize(running.path), max_age_days=90)
+    assert removed == 2
+    remaining = {entry['id'] for entry in list_logs(str(tmp_path))}
+    assert remaining == {running.id, finished[1].id, finished[2].id}
+
+
+def test_find_log_by_prefix(tmp_path):
+    log = _write_log(tmp_path, 'app', ["x"])
+    entries = list_logs(str(tmp_path))
+    assert find_log(log.id, entries)['id'] == log.id
+    assert find_log(log.id[:-3], entries)['id'] == log.id
+    with pytest.raises(ValueError):
+        find_log('19990101', entries)
+
+
+# --- SEARCH ---
+
+def test_grep_line_numbers_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_archive, 'FRAME_BYTES', 100)
+    monkeypatch.setattr(log_archive, 'READ_CHUNK', 50)
+    lines = [f"{i} INFO: step {i}" for i in range(300)]
+    lines[123] = "123 ERROR: ModuleNotFoundError: No module named 'requests'"
+    lines[250] = "250 WARNING: hidden import 'Requests' not found"
+    log = _write_log(tmp_path, 'app', lines)
+    entries = list_logs(str(tmp_path))
+
+    assert [(n, line) for _, n, line in grep_logs(r'ERROR: \w+', entries)] == [(124, lines[123])]
+    assert [n for _, n, _ in grep_logs('requests', entries, ignore_case=True)] == [124, 251]
+    assert [n for _, n, _ in grep_logs("'requests'", entries, fixed=True)] == [124]
+    # A match never spans two lines
+    assert list(grep_logs(r'step 1\n1', entries)) == []
+    assert all(entry['id'] == log.id for entry, _, _ in grep_logs('step', entries))
+    with pytest.raises(ValueError):
+        list(grep_logs('(', entries))
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Process Launcher Tests
+# Description: The launcher applies limits before the command runs and
+#              reports the ones it could not apply.
+
+
+import os
+import sys
+import subprocess
+
+import pytest
+
+from process_launcher import LAUNCHER_PATH
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="the launcher is POSIX only")
+
+
+def _launch(*args):
+    return subprocess.run([sys.executable, LAUNCHER_PATH, *args], capture_output=True, text=True, timeout=30)
+
+
+def test_command_inherits_the_limits():
+    code = ("import os, resource; print(os.getpriority(os.PRIO_PROCESS, 0), "
+            "resource.getrlimit(resource.RLIMIT_DATA)[0])")
+    current = os.getpriority(os.PRIO_PROCESS, 0)
+    result = _launch('--nice', str(current + 3), '--memory-limit', str(512 * 1024 * 1024),
+                     '--', sys.executable, '-c', code)
+    assert result.returncode == 0
+    assert result.stdout.split() == [str(current + 3), str(512 * 1024 * 1024)]
+
+
+def test_failed_limits_are_reported(tmp_path):
+    result = _launch('--cgroup', str(tmp_path / 'missing'), '--', sys.executable, '-c', 'print("ran")')
+    lines = result.stdout.splitlines()
+    assert lines[0].startswith("Could not join the build's cgroup")
+    assert lines[-1] == 'ran'
+
+
+def test_missing_command():
+    result = _launch('--', 'no-such-command-python-builder')
+    assert result.returncode == 127
+    assert "Could not start" in result.stdout
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Version Resource Tests
+# Description: Round-trips generated version files through a reader of the
+#              literal subset of Python they are written in (PyInstaller's
+#              own reader needs pefile).
+
+
+import os
+import ast
+
+import pytest
+
+from builder_core import build_command
+from version_resource import CODE_PAGE, LANGUAGE_ID, render_version_file, version_file_for, write_version_file
+
+
+# --- READER ---
+
+def _evaluate(node):
+    """ Evaluate the literal subset of Python a version file is written in """
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name):
+            raise ValueError(f"Unexpected call at line {node.lineno}")
+        args = [_evaluate(arg) for arg in node.args]
+        kwargs = {kw.arg: _evaluate(kw.value) for kw in node.keywords}
+        return {'type': node.func.id, 'args': args, 'kwargs': kwargs}
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_evaluate(element) for element in node.elts]
+    return ast.literal_eval(node)
+
+
+def read_version_file(path):
+    """
+    Parse a version file without PyInstaller (its own reader needs pefile)
+    and return {'filevers', 'prodvers', 'strings', 'translation'}.
+    Raises ValueError when the file is malformed.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    try:
+        root = _evaluate(ast.parse(source, mode='eval').body)
+    except SyntaxError as e:
+        raise ValueError(f"{path}: {e}")
+    if not isinstance(root, dict) or root['type'] != 'VSVersionInfo':
+        raise ValueError(f"{path}: not a VSVersionInfo file")
+
+    ffi = root['kwargs']['ffi']['kwargs']
+    result = {
+        'filevers': tuple(ffi['filevers']),
+        'prodvers': tuple(ffi['prodvers']),
+        'strings': {},
+        'translation': None,
+    }
+    for kid in root['kwargs']['kids']:
+        if kid['type'] == 'StringFileInfo':
+            for table in kid['args'][0]:
+                for entry in table['args'][1]:
+                    key, value = entry['args']
+                    result['strings'][key] = value
+        elif kid['type'] == 'VarFileInfo':
+            result['translation'] = kid['args'][0][0]['args'][1]
+    return result
+
+
+# --- VERSION FILES ---
+
+def test_round_trip(tmp_path):
+    profile = {
+        'script_path': '/src/my_app.py',
+        'product_name': 'My "Quoted" App',
+        'product_version': 'v2.1-beta',
+        'file_version': '2024.3.1.7',
+        'file_description': "Viewer for O'Brien's files – édition",
+        'copyright': '',
+    }
+    path = write_version_file(profile, str(tmp_path))
+    info = read_version_file(path)
+
+    assert info['filevers'] == (2024, 3, 1, 7)
+    assert info['prodvers'] == (2, 1, 0, 0)
+    assert info['translation'] == [LANGUAGE_ID, CODE_PAGE]
+    assert info['strings'] == {
+        'FileDescription': profile['file_description'],
+        'FileVersion': '2024.3.1.7',
+        'InternalName': 'my_app',
+        'OriginalFilename': 'my_app.exe',
+        'ProductName': profile['product_name'],
+        'ProductVersion': 'v2.1-beta',
+    }
+
+
+def test_same_fields_same_file(tmp_path):
+    profile = {'script_path': 'a.py', 'product_version': '1.0'}
+    assert write_version_file(profile, str(tmp_path)) == write_version_file(dict(profile), str(tmp_path))
+    assert write_version_file({'script_path': 'a.py'}, str(tmp_path)) is None
+
+
+def test_command_names_the_file_without_writing_it(tmp_path):
+    profile = {'script_path': 'a.py', 'product_version': '1.0'}
+    path = version_file_for(profile, str(tmp_path))
+    assert not os.path.exists(path)
+    assert write_version_file(profile, str(tmp_path)) == path
+    assert os.path.isfile(path)
+
+    command = build_command(profile)
+    assert command[command.index('--version-file') + 1] == version_file_for(profile)
+    assert '--version-file' not in build_command({'script_path': 'a.py'})
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'version.txt'
+    path.write_text(render_version_file({'product_version': '1'}).replace('VSVersionInfo(', 'Other(', 1))
+    with pytest.raises(ValueError):
+        read_version_file(str(path))
+    path.write_text('VSVersionInfo(')
+    with pytest.raises(ValueError):
+        read_version_file(str(path))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - ZIP Deployment Tests
+# Description: Archives written with every method (and with ZIP64 records
+#              forced by a low threshold) are read back and verified by
+#              zipfile, including symlinked files and folders.
+
+
+import os
+import sys
+import stat
+import zipfile
+
+import pytest
+
+import zip_deploy
+from zip_deploy import METHODS, deploy_zip
+
+
+def _make_tree(root):
+    """ A small dist folder; returns {arcname: content} for its regular files """
+    (root / 'lib' / 'sub').mkdir(parents=True)
+    files = {
+        'app/app': os.urandom(4096) + b'\0' * 100000,
+        'app/lib/base_library.zip': b'base library ' * 5000,
+        'app/lib/sub/empty.txt': b'',
+        'app/lib/sub/naïve.txt': 'unicode name'.encode('utf-8'),
+    }
+    for arcname, data in files.items():
+        (root.parent / arcname).write_bytes(data)
+    return files
+
+
+def _check_archive(zip_path, files):
+    with zipfile.ZipFile(zip_path) as archive:
+        assert archive.testzip() is None
+        for arcname, data in files.items():
+            assert archive.read(arcname) == data
+        return {info.filename: info for info in archive.infolist()}
+
+
+@pytest.mark.parametrize('method', sorted(METHODS))
+def test_methods_pass_testzip(tmp_path, method):
+    files = _make_tree(tmp_path / 'app')
+    zip_path = str(tmp_path / 'app.zip')
+    result = deploy_zip(str(tmp_path / 'app'), zip_path, method=method, workers=2)
+
+    infos = _check_archive(zip_path, files)
+    assert result['members'] == len(infos)
+    assert result['input_size'] == sum(len(data) for data in files.values())
+    assert 'app/lib/sub/' in infos and infos['app/lib/sub/'].is_dir()
+    assert {info.compress_type for info in infos.values() if not info.is_dir() and info.file_size} \
+        == {METHODS[method]}
+
+
+@pytest.mark.parametrize('level', range(10))
+def test_lzma_filter_without_private_helpers(monkeypatch, level):
+    filter_with_helpers, props = zip_deploy._lzma_filter(level)
+    monkeypatch.delattr(zip_deploy.lzma, '_encode_filter_properties')
+    lzma_filter, fallback_props = zip_deploy._lzma_filter(level)
+    assert fallback_props == props
+    assert lzma_filter['dict_size'] == filter_with_helpers['dict_size']
+
+
+def test_lzma_fallback_pass_testzip(tmp_path, monkeypatch):
+    monkeypatch.delattr(zip_deploy.lzma, '_encode_filter_properties')
+    files = _make_tree(tmp_path / 'app')
+    deploy_zip(str(tmp_path / 'app'), str(tmp_path / 'app.zip'), method='lzma')
+    _check_archive(str(tmp_path / 'app.zip'), files)
+
+
+def test_zip64_records(tmp_path, monkeypatch):
+    # Every size and offset above 1 KiB takes the ZIP64 path
+    monkeypatch.setattr(zip_deploy, '_ZIP64_LIMIT', 1024)
+    files = _make_tree(tmp_path / 'app')
+    zip_path = str(tmp_path / 'app.zip')
+    deploy_zip(str(tmp_path / 'app'), zip_path, method='deflated')
+
+    infos = _check_archive(zip_path, files)
+    assert infos['app/app'].file_size == len(files['app/app'])
+    assert infos['app/app'].extract_version >= 45
+    with open(zip_path, 'rb') as f:
+        data = f.read()
+    assert b'PK\006\006' in data and b'PK\006\007' in data
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="needs symlink privileges")
+def test_symlinks_are_stored_as_links(tmp_path):
+    files = _make_tree(tmp_path / 'app')
+    os.symlink('base_library.zip', tmp_path / 'app' / 'lib' / 'current.zip')
+    os.symlink('sub', tmp_path / 'app' / 'lib' / 'linked')
+    zip_path = str(tmp_path / 'app.zip')
+    deploy_zip(str(tmp_path / 'app'), zip_path, method='lzma')
+
+    infos = _check_archive(zip_path, files)
+    with zipfile.ZipFile(zip_path) as archive:
+        for arcname, target in (('app/lib/current.zip', b'base_library.zip'), ('app/lib/linked', b'sub')):
+            assert stat.S_ISLNK(infos[arcname].external_attr >> 16)
+            assert archive.read(arcname) == target
+    # The linked folder is not walked into: its files are stored once
+    assert not any(name.startswith('app/lib/linked/') for name in infos)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Windows Version Resource
+# Description: Turns the "Windows Version Information" fields of a profile
+#              into the VSVersionInfo text file PyInstaller's --version-file
+#              expects. Files are stored by content, so an unchanged set of
+#              fields always yields the same path and the same command, and
+#              cached or incremental builds stay valid. Everything here is
+#              plain text handling and works on any platform.
+
+
+import os
+import re
+import hashlib
+
+from builder_core import STATE_DIR
+
+
+VERSION_DIR = os.path.join(STATE_DIR, 'version_files')
+
+VERSION_FIELDS = ['product_name', 'product_version', 'file_version', 'file_description', 'copyright']
+
+# U.S. English, Unicode (the code page PyInstaller's own examples use)
+LANGUAGE_ID = 0x0409
+CODE_PAGE = 1200
+
+
+def has_version_info(profile):
+    return any((profile.get(field) or '').strip() for field in VERSION_FIELDS)
+
+
+def parse_version(text):
+    """
+    Turn a free-form version string ('1.2', 'v2.0.1-beta', '2024.3.1.7') into
+    the four 16-bit numbers of a FIXEDFILEINFO version.
+    """
+    numbers = [min(int(n), 0xFFFF) for n in re.findall(r'\d+', text or '')][:4]
+    return tuple(numbers + [0] * (4 - len(numbers)))
+
+
+def version_strings(profile):
+    """ Return the ordered (key, value) string table entries for a profile """
+    script_path = profile.get('script_path') or ''
+    name = os.path.splitext(os.path.basename(script_path))[0]
+    product_version = (profile.get('product_version') or '').strip()
+    file_version = (profile.get('file_version') or '').strip() or product_version
+    entries = [
+        ('FileDescription', (profile.get('file_description') or '').strip() or name),
+        ('FileVersion', file_version or '0.0.0.0'),
+        ('InternalName', name),
+        ('LegalCopyright', (profile.get('copyright') or '').strip()),
+        ('OriginalFilename', f"{name}.exe"),
+        ('ProductName', (profile.get('product_name') or '').strip() or name),
+        ('ProductVersion', product_version or file_version or '0.0.0.0'),
+    ]
+    return [(key, value) for key, value in entries if value]
+
+
+def render_version_file(profile):
+    """ Return the VSVersionInfo text for a profile """
+    product_version = (profile.get('product_version') or '').strip()
+    file_version = (profile.get('file_version') or '').strip() or product_version
+    filevers = parse_version(file_version)
+    prodvers = parse_version(product_version or file_version)
+    # repr() gives a correctly escaped literal for PyInstaller's parser
+    strings = ",\n".join(f"        StringStruct({key!r}, {value!r})" for key, value in version_strings(profile))
+    return f"""# UTF-8
+# Generated by Python Builder from the profile's version information.
+VSVersionInfo(
+  ffi=FixedFileInfo(
+    filevers={filevers},
+    prodvers={prodvers},
+    mask=0x3f,
+    flags=0x0,
+    OS=0x40004,
+    fileType=0x1,
+    subtype=0x0,
+    date=(0, 0)
+    ),
+  kids=[
+    StringFileInfo(
+      [
+      StringTable(
+        '{LANGUAGE_ID:04X}{CODE_PAGE:04X}',
+        [
+{strings}
+        ])
+      ]),
+    VarFileInfo([VarStruct('Translation', [{LANGUAGE_ID}, {CODE_PAGE}])])
+  ]
+)
+"""
+
+
+def version_file_path(content, version_dir=VERSION_DIR):
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(version_dir, f"version_{digest}.txt")
+
+
+def version_file_for(profile, version_dir=VERSION_DIR):
+    """
+    Return the path of the version resource for a profile, without writing
+    it, or None when the profile has no version information.
+    """
+    if not has_version_info(profile):
+        return None
+    return version_file_path(render_version_file(profile), version_dir)
+
+
+def write_version_file(profile, version_dir=VERSION_DIR):
+    """
+    Write the version resource for a profile if it does not exist yet and
+    return its path (the one version_file_for() gives), or None when the
+    profile has no version information.
+    """
+    if not has_version_info(profile):
+        return None
+    content = render_version_file(profile)
+    path = version_file_path(content, version_dir)
+    if not os.path.isfile(path):
+        os.makedirs(version_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    return path
+
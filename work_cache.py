@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - Incremental Work Directory
+# Description: Keeps PyInstaller's work directory (Analysis/PYZ/PKG/EXE/COLLECT
+#              TOC caches) between builds and validates it against content
+#              hashes of each stage's inputs. Only the stages whose inputs
+#              changed, and the stages downstream of them, are invalidated.
+
+
+import os
+import glob
+import json
+import shutil
+import hashlib
+
+from builder_core import profile_workpath
+from hash_engine import default_engine, walk_files
+from import_graph import find_local_imports
+from version_resource import has_version_info, render_version_file
+
+
+MANIFEST_NAME = 'python_builder_manifest.json'
+MANIFEST_VERSION = 1
+
+# Stages in build order; invalidating one invalidates everything after it
+STAGE_ORDER = ['analysis', 'pyz', 'pkg', 'exe', 'collect']
+
+# Files PyInstaller keeps in <workpath>/<name>/ for each stage
+STAGE_FILES = {
+    'analysis': ['Analysis-*.toc', 'base_library.zip', 'warn-*.txt', 'xref-*.html', 'localpycs'],
+    'pyz': ['PYZ-*.toc', 'PYZ-*.pyz'],
+    'pkg': ['PKG-*.toc', '*.pkg'],
+    'exe': ['EXE-*.toc'],
+    'collect': ['COLLECT-*.toc'],
+}
+
+
+def _hash_paths(digest, paths):
+    paths = sorted(paths)
+    digests = default_engine().hash_files(paths)
+    for path in paths:
+        digest.update(path.encode('utf-8'))
+        digest.update(digests[path].encode('ascii') if digests[path] else b'<missing>')
+
+
+def _folder_files(folder):
+    for path, _ in walk_files(folder):
+        yield os.path.abspath(path)
+
+
+def _pyinstaller_identity():
+    """ Changes whenever the PyInstaller installation on PATH is replaced """
+    tool = shutil.which('pyinstaller')
+    if not tool:
+        return 'none'
+    stat = os.stat(tool)
+    return f"{os.path.realpath(tool)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def stage_hashes(profile):
+    """ Return {stage: digest} of the inputs each build stage depends on """
+    script_path = os.path.abspath(profile['script_path'])
+    hashes = {}
+
+    # Analysis: the code itself and everything that steers module discovery
+    digest = hashlib.sha256()
+    _hash_paths(digest, {script_path} | find_local_imports(script_path))
+    digest.update(json.dumps(sorted(profile.get('included_modules', []))).encode('utf-8'))
+    digest.update(json.dumps(sorted(profile.get('excluded_modules', []))).encode('utf-8'))
+    hashes['analysis'] = digest.hexdigest()
+
+    # PYZ is derived purely from the Analysis result
+    hashes['pyz'] = hashes['analysis']
+
+    # PKG: data files bundled next to the code
+    digest = hashlib.sha256()
+    data_files = {os.path.abspath(f) for f in profile.get('included_files', [])}
+    for folder in profile.get('included_folders', []):
+        data_files.update(_folder_files(folder))
+    _hash_paths(digest, data_files)
+    digest.update(str(bool(profile.get('one_file'))).encode('ascii'))
+    hashes['pkg'] = digest.hexdigest()
+
+    # EXE: bootloader options and resources
+    digest = hashlib.sha256()
+    if profile.get('icon_path'):
+        _hash_paths(digest, [os.path.abspath(profile['icon_path'])])
+    digest.update(str(bool(profile.get('no_console'))).encode('ascii'))
+    if has_version_info(profile):
+        digest.update(render_version_file(profile).encode('utf-8'))
+    hashes['exe'] = digest.hexdigest()
+
+    hashes['collect'] = hashes['pkg']
+    default_engine().save()
+    return hashes
+
+
+class WorkpathManager:
+    """
+    Validates a profile's persistent PyInstaller work directory before a build
+    and records the stage hashes after a successful one.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.workpath = profile_workpath(profile)
+        self.name = os.path.splitext(os.path.basename(profile['script_path']))[0]
+        self.target_dir = os.path.join(self.workpath, self.name)
+        self.manifest_path = os.path.join(self.workpath, MANIFEST_NAME)
+        self.hashes = None
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('version') != MANIFEST_VERSION:
+            return None
+        return manifest
+
+    def _remove_stage(self, stage):
+        for pattern in STAGE_FILES[stage]:
+            for path in glob.glob(os.path.join(self.target_dir, pattern)):
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+
+    def prepare(self):
+        """
+        Invalidate stale stages before a build. Returns the list of stages
+        that were invalidated (empty when the whole cache can be reused).
+        """
+        self.hashes = stage_hashes(self.profile)
+        manifest = self._read_manifest()
+
+        if manifest is None or manifest.get('pyinstaller') != _pyinstaller_identity():
+            # Unknown state (first build, failed build, new toolchain): start clean
+            invalid = list(STAGE_ORDER) if os.path.isdir(self.target_dir) else []
+            shutil.rmtree(self.target_dir, ignore_errors=True)
+        else:
+            invalid = []
+            previous = manifest.get('stages', {})
+            for index, stage in enumerate(STAGE_ORDER):
+                if previous.get(stage) != self.hashes[stage]:
+                    invalid = STAGE_ORDER[index:]
+                    break
+            for stage in invalid:
+                self._remove_stage(stage)
+
+        # The manifest only describes the directory after a successful build
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+        return invalid
+
+    def commit(self):
+        """ Record the stage hashes once PyInstaller finished successfully """
+        if self.hashes is None:
+            self.hashes = stage_hashes(self.profile)
+        os.makedirs(self.workpath, exist_ok=True)
+        with open(self.manifest_path, 'w') as f:
+            json.dump({
+                'version': MANIFEST_VERSION,
+                'pyinstaller': _pyinstaller_identity(),
+                'script_path': os.path.abspath(self.profile['script_path']),
+                'stages': self.hashes,
+            }, f, indent=4)
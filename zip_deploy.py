@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+
+
+# Python Builder - ZIP Deployment
+# Description: Packs a build output (dist/) into a ZIP archive. Members are
+#              compressed in parallel on a thread pool (zlib, bz2 and lzma
+#              release the GIL) into spooled temporary buffers, and written to
+#              the archive in order, so memory stays bounded even for
+#              multi-GB onedir outputs. Supports STORED, DEFLATED, BZIP2 and
+#              LZMA with configurable levels, and ZIP64 for large archives.
+
+
+import os
+import bz2
+import lzma
+import stat
+import time
+import zlib
+import struct
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from core_budget import stage_threads
+
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+ZIP_BZIP2 = 12
+ZIP_LZMA = 14
+
+METHODS = {
+    'stored': ZIP_STORED,
+    'deflated': ZIP_DEFLATED,
+    'bzip2': ZIP_BZIP2,
+    'lzma': ZIP_LZMA,
+}
+DEFAULT_LEVELS = {'stored': 0, 'deflated': 6, 'bzip2': 9, 'lzma': 6}
+LEVEL_RANGES = {'stored': (0, 0), 'deflated': (0, 9), 'bzip2': (1, 9), 'lzma': (0, 9)}
+
+_VERSION_NEEDED = {ZIP_STORED: 20, ZIP_DEFLATED: 20, ZIP_BZIP2: 46, ZIP_LZMA: 63}
+_ZIP64_VERSION = 45
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP64_SENTINEL = 0xFFFFFFFF
+_MADE_BY_UNIX = 3
+
+# Dictionary size of each LZMA preset (liblzma's lzma_lzma_preset())
+_LZMA_DICT_SIZES = [1 << 18, 1 << 20, 1 << 21, 1 << 22, 1 << 22, 1 << 23, 1 << 23, 1 << 24, 1 << 25, 1 << 26]
+
+READ_CHUNK_SIZE = 1024 * 1024
+# Compressed members larger than this spill from memory to a temporary file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+# --- COMPRESSORS ---
+
+class _StoredCompressor:
+    def compress(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+
+def _lzma_filter(level):
+    """ Return the LZMA1 filter for a preset level and its encoded properties """
+    lzma_filter = {'id': lzma.FILTER_LZMA1, 'preset': level}
+    try:
+        # Private helpers zipfile itself uses (CPython 3.3 and later)
+        props = lzma._encode_filter_properties(lzma_filter)
+        return lzma._decode_filter_properties(lzma.FILTER_LZMA1, props), props
+    except AttributeError:
+        # Spell the preset out: lc=3, lp=0, pb=2 and the preset's dictionary
+        lzma_filter.update(dict_size=_LZMA_DICT_SIZES[level], lc=3, lp=0, pb=2)
+        return lzma_filter, struct.pack('<BI', (2 * 5 + 0) * 9 + 3, lzma_filter['dict_size'])
+
+
+class _LZMACompressor:
+    """ Raw LZMA1 stream with the header the ZIP LZMA method requires """
+
+    def __init__(self, level):
+        # Same framing zipfile uses: version 9.4 followed by the filter properties
+        lzma_filter, props = _lzma_filter(level)
+        self._compressor = lzma.LZMACompressor(lzma.FORMAT_RAW, filters=[lzma_filter])
+        self._header = struct.pack('<BBH', 9, 4, len(props)) + props
+
+    def compress(self, data):
+        header, self._header = self._header, b''
+        return header + self._compressor.compress(data)
+
+    def flush(self):
+        header, self._header = self._header, b''
+        return header + self._compressor.flush()
+
+
+def _make_compressor(method, level):
+    if method == ZIP_STORED:
+        return _StoredCompressor()
+    if method == ZIP_DEFLATED:
+        return zlib.compressobj(level, zlib.DEFLATED, -15)
+    if method == ZIP_BZIP2:
+        return bz2.BZ2Compressor(level)
+    if method == ZIP_LZMA:
+        return _LZMACompressor(level)
+    raise ValueError(f"Unsupported compression method: {method}")
+
+
+# --- MEMBERS ---
+
+class _Member:
+    """ One compressed archive member waiting to be written """
+
+    def __init__(self, arcname, mode, mtime, method):
+        self.arcname = arcname
+        self.mode = mode
+        self.mtime = mtime
+        self.method = method
+        self.crc = 0
+        self.file_size = 0
+        self.compress_size = 0
+        self.data = None
+        self.header_offset = 0
+
+
+def _compress_member(path, arcname, method, level):
+    """ Compress one file (or symlink / directory) into a spooled buffer """
+    st = os.lstat(path)
+    is_dir = stat.S_ISDIR(st.st_mode)
+    is_link = stat.S_ISLNK(st.st_mode)
+    member = _Member(arcname + '/' if is_dir else arcname, st.st_mode, st.st_mtime,
+                     ZIP_STORED if (is_dir or is_link) else method)
+    member.data = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    if is_dir:
+        return member
+
+    compressor = _make_compressor(member.method, level)
+
+    def feed(chunk):
+        member.crc = zlib.crc32(chunk, member.crc)
+        member.file_size += len(chunk)
+        out = compressor.compress(chunk)
+        if out:
+            member.data.write(out)
+
+    if is_link:
+        feed(os.readlink(path).encode('utf-8'))
+    else:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+                feed(chunk)
+    member.data.write(compressor.flush())
+    member.compress_size = member.data.tell()
+    member.data.seek(0)
+    return member
+
+
+def _dos_datetime(timestamp):
+    t = time.localtime(max(timestamp, 315532800)) # ZIP cannot represent dates before 1980
+    dos_date = (t.tm_year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+    dos_time = t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+    return dos_date, dos_time
+
+
+# --- WRITER ---
+
+class ParallelZipWriter:
+    """
+    Writes a ZIP archive whose members are compressed on a thread pool.
+    At most max_inflight members are held (compressed) at any time. The
+    pool takes up to workers cores from the core budget (default: all).
+    """
+
+    def __init__(self, file_path, method=ZIP_LZMA, level=6, workers=None, max_inflight=None):
+        self.file_path = file_path
+        self.method = method
+        self.level = level
+        self.workers = workers
+        self.max_inflight = max_inflight
+        self.members = []
+        self._fp = None
+
+    def _write_local_header(self, member):
+        member.header_offset = self._fp.tell()
+        name = member.arcname.encode('utf-8')
+        flags = 0x800 if not member.arcname.isascii() else 0
+        if member.method == ZIP_LZMA:
+            flags |= 0x02 # End-of-stream marker present
+        dos_date, dos_time = _dos_datetime(member.mtime)
+
+        extra = b''
+        file_size, compress_size = member.file_size, member.compress_size
+        version = _VERSION_NEEDED[member.method]
+        if file_size >= _ZIP64_LIMIT or compress_size >= _ZIP64_LIMIT:
+            extra = struct.pack('<HHQQ', 0x0001, 16, file_size, compress_size)
+            file_size = compress_size = _ZIP64_SENTINEL
+            version = max(version, _ZIP64_VERSION)
+
+        self._fp.write(struct.pack(
+            '<4sHHHHHIIIHH', b'PK\003\004', version, flags, member.method,
+            dos_time, dos_date, member.crc, compress_size, file_size, len(name), len(extra)))
+        self._fp.write(name)
+        self._fp.write(extra)
+
+    def _write_member(self, member):
+        self._write_local_header(member)
+        with member.data:
+            for chunk in iter(lambda: member.data.read(READ_CHUNK_SIZE), b''):
+                self._fp.write(chunk)
+        member.data = None
+        self.members.append(member)
+
+    def _write_central_directory(self):
+        cd_offset = self._fp.tell()
+        for member in self.members:
+            name = member.arcname.encode('utf-8')
+            flags = 0x800 if not member.arcname.isascii() else 0
+            if member.method == ZIP_LZMA:
+                flags |= 0x02
+            dos_date, dos_time = _dos_datetime(member.mtime)
+
+            zip64_fields = []
+            file_size, compress_size, offset = member.file_size, member.compress_size, member.header_offset
+            if file_size >= _ZIP64_LIMIT:
+                zip64_fields.append(file_size)
+                file_size = _ZIP64_SENTINEL
+            if compress_size >= _ZIP64_LIMIT:
+                zip64_fields.append(compress_size)
+                compress_size = _ZIP64_SENTINEL
+            if offset >= _ZIP64_LIMIT:
+                zip64_fields.append(offset)
+                offset = _ZIP64_SENTINEL
+            extra = b''
+            version = _VERSION_NEEDED[member.method]
+            if zip64_fields:
+                extra = struct.pack(f'<HH{len(zip64_fields)}Q', 0x0001, 8 * len(zip64_fields), *zip64_fields)
+                version = max(version, _ZIP64_VERSION)
+
+            external_attr = (member.mode & 0xFFFF) << 16
+            if member.arcname.endswith('/'):
+                external_attr |= 0x10 # MS-DOS directory flag
+            self._fp.write(struct.pack(
+                '<4sBBHHHHHIIIHHHHHII', b'PK\001\002', version, _MADE_BY_UNIX, version, flags,
+                member.method, dos_time, dos_date, member.crc, compress_size, file_size,
+                len(name), len(extra), 0, 0, 0, external_attr, offset))
+            self._fp.write(name)
+            self._fp.write(extra)
+
+        cd_end = self._fp.tell()
+        count = len(self.members)
+        cd_size = cd_end - cd_offset
+        if count >= 0xFFFF or cd_size >= _ZIP64_LIMIT or cd_offset >= _ZIP64_LIMIT:
+            # ZIP64 end of central directory record and locator
+            self._fp.write(struct.pack('<4sQHHIIQQQQ', b'PK\006\006', 44, _ZIP64_VERSION, _ZIP64_VERSION,
+                                       0, 0, count, count, cd_size, cd_offset))
+            self._fp.write(struct.pack('<4sIQI', b'PK\006\007', 0, cd_end, 1))
+            count = min(count, 0xFFFF)
+            cd_size = min(cd_size, _ZIP64_SENTINEL)
+            cd_offset = min(cd_offset, _ZIP64_SENTINEL)
+        self._fp.write(struct.pack('<4sHHHHIIH', b'PK\005\006', 0, 0, count, count, cd_size, cd_offset, 0))
+
+    def write_tree(self, paths):
+        """
+        Write an iterable of (path, arcname) pairs. Compression runs ahead on
+        the pool while finished members are written out in order.
+        """
+        tmp_path = self.file_path + '.part'
+        try:
+            with stage_threads(self.workers) as threads, open(tmp_path, 'wb') as self._fp, \
+                    ThreadPoolExecutor(max_workers=threads) as pool:
+                self.workers = threads # What the budget granted, for the report
+                max_inflight = self.max_inflight or threads * 2
+                pending = deque()
+                for path, arcname in paths:
+                    if len(pending) >= max_inflight:
+                        self._write_member(pending.popleft().result())
+                    pending.append(pool.submit(_compress_member, path, arcname, self.method, self.level))
+                while pending:
+                    self._write_member(pending.popleft().result())
+                self._write_central_directory()
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            self._fp = None
+        os.replace(tmp_path, self.file_path)
+
+
+def iter_tree(root):
+    """ Yield (path, arcname) for a file, or for a folder and everything below it """
+    base = os.path.dirname(os.path.abspath(root))
+    if not os.path.isdir(root) or os.path.islink(root):
+        yield root, os.path.basename(root)
+        return
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        rel_dir = os.path.relpath(dirpath, base).replace(os.sep, '/')
+        yield dirpath, rel_dir
+        for dirname in dirnames:
+            # os.walk does not descend into symlinked folders; store them as links
+            full_path = os.path.join(dirpath, dirname)
+            if os.path.islink(full_path):
+                yield full_path, f"{rel_dir}/{dirname}"
+        for filename in sorted(filenames):
+            yield os.path.join(dirpath, filename), f"{rel_dir}/{filename}"
+
+
+def deploy_zip(source, zip_path, method='lzma', level=None, workers=None):
+    """
+    Pack a build output into zip_path. Returns a dict with the archive path,
+    input and output sizes, member count and elapsed time.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown compression method '{method}' (choose from {', '.join(METHODS)})")
+    low, high = LEVEL_RANGES[method]
+    level = DEFAULT_LEVELS[method] if level is None else min(max(int(level), low), high)
+
+    start_time = time.time()
+    writer = ParallelZipWriter(zip_path, METHODS[method], level, workers=workers)
+    writer.write_tree(iter_tree(source))
+    return {
+        'archive': zip_path,
+        'method': method,
+        'level': level,
+        'members': len(writer.members),
+        'input_size': sum(m.file_size for m in writer.members),
+        'output_size': os.path.getsize(zip_path),
+        'workers': writer.workers,
+        'elapsed': time.time() - start_time,
+    }